@@ -0,0 +1,226 @@
+# backend/aqi_grid.py
+#
+# National AQI snapshot, refreshed in the background from the AQICN map-bounds feed.
+# Each refresh builds, off the event loop:
+#   - a BallTree (haversine) over the reporting stations, for nearest-station lookups
+#   - an inverse-distance-weighted AQI raster over India (AQI_GRID_DEG cells, float32, NaN = no coverage)
+#   - station clusters for every map zoom level, so bbox queries are a mask over precomputed centroids
+# /air/aqi_at and /air/pollution_stations/clustered read the current snapshot and never call upstream;
+# the raw feed is also written to the "aqicn_stations" response cache for /air/pollution_stations.
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+from backend.cache import response_cache
+from backend.http_client import UpstreamError
+
+EARTH_RADIUS_KM = 6371
+STATION_BOUNDS = "6.74,68.03,35.50,97.39"  # south, west, north, east (India), as sent to AQICN
+GRID_BOUNDS = tuple(float(v) for v in STATION_BOUNDS.split(","))
+AQI_REFRESH_SECONDS = float(os.getenv("AQI_REFRESH_SECONDS", "600"))
+AQI_GRID_DEG = float(os.getenv("AQI_GRID_DEG", "0.1"))
+AQI_IDW_NEIGHBOURS = int(os.getenv("AQI_IDW_NEIGHBOURS", "8"))
+AQI_IDW_POWER = float(os.getenv("AQI_IDW_POWER", "2"))
+AQI_MAX_DISTANCE_KM = float(os.getenv("AQI_MAX_DISTANCE_KM", "150"))  # cells farther than this from any station stay NaN
+AQI_CLUSTER_MAX_ZOOM = int(os.getenv("AQI_CLUSTER_MAX_ZOOM", "12"))    # above this every station is returned on its own
+AQI_CLUSTER_CELLS_PER_TILE = int(os.getenv("AQI_CLUSTER_CELLS_PER_TILE", "4"))
+
+AQI_CATEGORIES = (
+    (50, "Good"), (100, "Moderate"), (150, "Unhealthy for Sensitive Groups"),
+    (200, "Unhealthy"), (300, "Very Unhealthy"), (float("inf"), "Hazardous"),
+)
+
+
+def aqi_category(aqi):
+    if aqi is None:
+        return None
+    for upper, label in AQI_CATEGORIES:
+        if aqi <= upper:
+            return label
+
+
+def parse_stations(feed):
+    """Keeps stations with a numeric AQI ("-" means no current reading). Returns (lats, lons, aqi, uids, names)."""
+    rows = []
+    for item in feed:
+        try:
+            rows.append((float(item["lat"]), float(item["lon"]), float(item["aqi"]), item.get("uid"),
+                         (item.get("station") or {}).get("name", "")))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if not rows:
+        raise ValueError("AQICN feed contains no stations with an AQI reading.")
+    lats, lons, aqi, uids, names = zip(*rows)
+    return np.array(lats), np.array(lons), np.array(aqi), list(uids), list(names)
+
+
+def cluster_cell_deg(zoom):
+    """Cluster cell size in degrees: AQI_CLUSTER_CELLS_PER_TILE cells across one web-map tile at `zoom`."""
+    return 360.0 / (2 ** zoom) / AQI_CLUSTER_CELLS_PER_TILE
+
+
+class AqiSnapshot:
+    """Immutable view of one feed refresh: station arrays, BallTree, IDW raster and per-zoom clusters."""
+
+    def __init__(self, feed, fetched_at=None):
+        from sklearn.neighbors import BallTree  # sklearn is heavy, so only imported when the snapshot is built
+        start = time.perf_counter()
+        self.lats, self.lons, self.aqi, self.uids, self.names = parse_stations(feed)
+        self.fetched_at = fetched_at or time.time()
+        self.tree = BallTree(np.radians(np.column_stack([self.lats, self.lons])), metric="haversine")
+
+        south, west, north, east = GRID_BOUNDS
+        self.origin = (south, west)
+        self.shape = (int(np.ceil((north - south) / AQI_GRID_DEG)), int(np.ceil((east - west) / AQI_GRID_DEG)))
+        self.raster = self._idw_raster()
+        self.clusters = {zoom: self._cluster(zoom) for zoom in range(AQI_CLUSTER_MAX_ZOOM + 1)}
+        self.clusters[AQI_CLUSTER_MAX_ZOOM + 1] = {
+            "lat": self.lats, "lon": self.lons, "items": [self._station(i) for i in range(len(self.aqi))]
+        }
+        self.build_seconds = time.perf_counter() - start
+
+    def _idw_raster(self):
+        rows, cols = self.shape
+        south, west = self.origin
+        cell_lats = south + (np.arange(rows) + 0.5) * AQI_GRID_DEG
+        cell_lons = west + (np.arange(cols) + 0.5) * AQI_GRID_DEG
+        grid = np.radians(np.column_stack([np.repeat(cell_lats, cols), np.tile(cell_lons, rows)]))
+        distances, indices = self.tree.query(grid, k=min(AQI_IDW_NEIGHBOURS, len(self.aqi)))
+        distances_km = np.maximum(distances * EARTH_RADIUS_KM, 1e-3)  # a station on a cell centre dominates, no div by 0
+        weights = 1.0 / distances_km ** AQI_IDW_POWER
+        values = (weights * self.aqi[indices]).sum(axis=1) / weights.sum(axis=1)
+        values[distances_km[:, 0] > AQI_MAX_DISTANCE_KM] = np.nan
+        return values.reshape(rows, cols).astype(np.float32)
+
+    def _cluster(self, zoom):
+        """Grid-based clusters for one zoom level: centroid arrays for the bbox mask plus the ready-made JSON items."""
+        cell = cluster_cell_deg(zoom)
+        keys = np.floor(np.column_stack([self.lats, self.lons]) / cell).astype(np.int64)
+        _, group, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        group = group.reshape(-1)
+        mean = lambda values: np.bincount(group, weights=values) / counts
+        aqi_max = np.full(len(counts), -np.inf)
+        np.maximum.at(aqi_max, group, self.aqi)
+        member = np.empty(len(counts), dtype=np.int64)
+        member[group] = np.arange(len(group))  # one station per cluster: the station itself for singletons
+        lats, lons, aqi_mean = mean(self.lats), mean(self.lons), mean(self.aqi)
+        items = [
+            self._station(int(member[c])) if counts[c] == 1 else
+            {"lat": round(float(lats[c]), 4), "lon": round(float(lons[c]), 4), "count": int(counts[c]),
+             "aqi": round(float(aqi_mean[c])), "aqi_max": int(aqi_max[c])}
+            for c in range(len(counts))
+        ]
+        return {"lat": lats, "lon": lons, "items": items}
+
+    def value_at(self, lat, lon):
+        """Interpolated AQI of the raster cell containing (lat, lon); None outside the grid or coverage."""
+        row = int((lat - self.origin[0]) // AQI_GRID_DEG)
+        col = int((lon - self.origin[1]) // AQI_GRID_DEG)
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            return None
+        value = self.raster[row, col]
+        return None if np.isnan(value) else float(value)
+
+    def nearest_station(self, lat, lon):
+        distances, indices = self.tree.query(np.radians([[lat, lon]]), k=1)
+        i = int(indices[0, 0])
+        return {"uid": self.uids[i], "name": self.names[i], "lat": float(self.lats[i]), "lon": float(self.lons[i]),
+                "aqi": float(self.aqi[i]), "distance_km": round(float(distances[0, 0]) * EARTH_RADIUS_KM, 2)}
+
+    def clusters_in(self, south, west, north, east, zoom):
+        """Clusters (or single stations above AQI_CLUSTER_MAX_ZOOM) whose centroid lies in the bbox."""
+        if south > north:
+            raise ValueError("south must not be greater than north.")
+        zoom = max(0, int(zoom))
+        level = self.clusters[min(zoom, AQI_CLUSTER_MAX_ZOOM + 1)]
+        mask = (level["lat"] >= south) & (level["lat"] <= north) & (level["lon"] >= west) & (level["lon"] <= east)
+        items = level["items"]
+        return [items[i] for i in np.flatnonzero(mask).tolist()]
+
+    def _station(self, i):
+        return {"lat": float(self.lats[i]), "lon": float(self.lons[i]), "count": 1, "aqi": int(self.aqi[i]),
+                "uid": self.uids[i], "name": self.names[i]}
+
+    def stats(self):
+        return {"stations": len(self.aqi), "grid_shape": list(self.shape), "grid_bytes": int(self.raster.nbytes),
+                "covered_cells": int(np.count_nonzero(~np.isnan(self.raster))),
+                "build_seconds": round(self.build_seconds, 3), "fetched_at": self.fetched_at}
+
+
+class AqiGrid:
+    """Holds the current snapshot and the background task that replaces it every AQI_REFRESH_SECONDS."""
+
+    def __init__(self, refresh_seconds=AQI_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.snapshot = None
+        self._task = None
+        self._lock = None
+        self._stats = {"refreshes": 0, "failures": 0, "last_error": None}
+
+    def _url(self):
+        api_key = os.getenv("AQICN_API_KEY")
+        if not api_key:
+            raise RuntimeError("AQICN API key not configured on server.")
+        return f"https://api.waqi.info/map/bounds/?latlng={STATION_BOUNDS}&token={api_key}"
+
+    async def refresh(self, http):
+        data = await http.get_json(self._url())
+        if data.get("status") != "ok":
+            raise UpstreamError(f"Error from AQICN API: {data.get('data')}")
+        feed = data.get("data", [])
+        await response_cache.aput("aqicn_stations", STATION_BOUNDS, feed)
+        self.snapshot = await asyncio.to_thread(AqiSnapshot, feed, time.time())
+        self._stats["refreshes"] += 1
+        return self.snapshot
+
+    async def get(self, http):
+        """Current snapshot; the first caller builds one if the refresher hasn't yet (or isn't running)."""
+        if self.snapshot is not None:
+            return self.snapshot
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.snapshot is None:
+                await self.refresh(http)
+        return self.snapshot
+
+    async def _run(self, http):
+        while True:
+            try:
+                snapshot = await self.refresh(http)
+                print(f"INFO: AQI grid refreshed: {len(snapshot.aqi)} stations in {snapshot.build_seconds:.2f}s.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the previous snapshot; try again next interval
+                self._stats["failures"] += 1
+                self._stats["last_error"] = str(e)
+                print(f"WARN: AQI grid refresh failed: {e}", file=sys.stderr)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self, http):
+        if not os.getenv("AQICN_API_KEY"):
+            print("WARN: AQICN_API_KEY is not set; the AQI grid refresher is disabled.", file=sys.stderr)
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(http))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {**self._stats, "running": self._task is not None,
+                **(self.snapshot.stats() if self.snapshot is not None else {"stations": 0})}
+
+
+aqi_grid = AqiGrid()
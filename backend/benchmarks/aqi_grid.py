@@ -0,0 +1,64 @@
+# backend/benchmarks/aqi_grid.py
+#
+# AQI snapshot: build time, point / nearest-station / clustered-bbox query latency, and the JSON
+# payload of the clustered station list vs the raw AQICN feed at a few zoom levels.
+# Uses a synthetic station feed (default 1,500 stations inside India).
+#
+#   python -m backend.benchmarks.aqi_grid [--stations 1500] [--queries 10000]
+
+import argparse
+import json
+import random
+import time
+
+from backend.aqi_grid import GRID_BOUNDS, AqiSnapshot
+
+
+def synthetic_feed(n, rng):
+    south, west, north, east = GRID_BOUNDS
+    return [{"lat": rng.uniform(south, north), "lon": rng.uniform(west, east), "uid": i, "aqi": str(rng.randint(5, 450)),
+             "station": {"name": f"Station {i}, Some City, India", "time": "2024-01-01T10:00:00+05:30"}}
+            for i in range(n)]
+
+
+def per_query_us(fn, points):
+    start = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    return round((time.perf_counter() - start) * 1e6 / len(points), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AQI grid build and query latency.")
+    parser.add_argument("--stations", type=int, default=1500)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    feed = synthetic_feed(args.stations, rng)
+    snapshot = AqiSnapshot(feed)
+    south, west, north, east = GRID_BOUNDS
+    points = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(args.queries)]
+    raw_bytes = len(json.dumps(feed))
+
+    payloads = []
+    for zoom in (4, 6, 8, 10):
+        start = time.perf_counter()
+        clusters = snapshot.clusters_in(south, west, north, east, zoom)
+        payloads.append({"zoom": zoom, "items": len(clusters), "query_us": round((time.perf_counter() - start) * 1e6, 1),
+                         "bytes": len(json.dumps(clusters)), "vs_raw": round(len(json.dumps(clusters)) / raw_bytes, 3)})
+
+    print(json.dumps({
+        "stations": args.stations,
+        "build_seconds": round(snapshot.build_seconds, 3),
+        "grid": snapshot.stats(),
+        "aqi_at_us": per_query_us(snapshot.value_at, points),
+        "nearest_station_us": per_query_us(snapshot.nearest_station, points[:1000]),
+        "raw_feed_bytes": raw_bytes,
+        "clustered": payloads,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
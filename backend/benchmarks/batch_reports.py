@@ -0,0 +1,61 @@
+# backend/benchmarks/batch_reports.py
+#
+# Batch report rendering throughput (reports/second) as the process pool grows.
+# Uses in-memory synthetic thumbnails and a throwaway report cache, so only rendering is measured.
+#
+#   python -m backend.benchmarks.batch_reports [--regions 64] [--workers 1,2,4,8]
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from backend import report_batch
+from backend.benchmarks.pdf_reports import report_args, synthetic_png
+from backend.disk_cache import DiskLRU
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch report throughput vs render workers.")
+    parser.add_argument("--regions", type=int, default=64)
+    parser.add_argument("--workers", default=",".join(str(w) for w in sorted({1, 2, 4, os.cpu_count() or 1})))
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    png = synthetic_png(rng, 256)
+    records = []
+    for i in range(args.regions):
+        stats, start_map, end_map, start_date, end_date = report_args(i)
+        records.append({"region": f"Region {i}", "stats": json.loads(stats), "start_map": start_map,
+                        "end_map": end_map, "start_date": start_date, "end_date": end_date})
+    images_by_url = {record[key]: png for record in records for key in ("start_map", "end_map")}
+
+    results = []
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        scratch = tempfile.mkdtemp(prefix="batch-bench-")
+        report_batch.report_cache = DiskLRU(scratch)  # empty cache: every region is rendered
+        try:
+            start = time.perf_counter()
+            rendered = report_batch.render_regions(records, images_by_url, workers=workers)
+            report_batch.build_zip(records, rendered)
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        throughput = args.regions / elapsed
+        baseline = baseline or throughput
+        results.append({
+            "workers": workers,
+            "seconds": round(elapsed, 2),
+            "reports_per_second": round(throughput, 2),
+            "speedup_vs_first": round(throughput / baseline, 2),
+        })
+    print(json.dumps({"regions": args.regions, "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# backend/benchmarks/flood_bulk.py
+#
+# Flood/drought risk for every city: looping get_risk_prediction_by_city vs one score_many() call.
+#
+#   python -m backend.benchmarks.flood_bulk [--repeat 5]
+
+import argparse
+import json
+import statistics
+import time
+
+from backend import risk_analyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-city risk scoring with the vectorized score_many().")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cities = [info["city"] for info in risk_analyzer.CITY_INDEX.by_name.values()]
+    # Build the station index and city -> station table outside the timed region
+    risk_analyzer.city_station_table.get()
+
+    def loop():
+        return [risk_analyzer.get_risk_prediction_by_city(city) for city in cities]
+
+    def bulk():
+        return risk_analyzer.score_many(seed=42)
+
+    timings = {}
+    for name, fn in (("loop", loop), ("score_many", bulk)):
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        timings[name] = statistics.median(samples)
+
+    print(json.dumps({
+        "cities": len(cities),
+        "loop_ms": round(timings["loop"] * 1000, 2),
+        "score_many_ms": round(timings["score_many"] * 1000, 2),
+        "speedup": round(timings["loop"] / timings["score_many"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
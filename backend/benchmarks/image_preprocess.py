@@ -0,0 +1,71 @@
+# backend/benchmarks/image_preprocess.py
+#
+# Upload preprocessing: the legacy PIL full decode + torchvision Resize / ToTensor / Normalize pipeline vs
+# the draft-mode decode + fused normalize in backend/image_preprocess.py, per photo size.
+# Reports latency, the size of the decoded RGB image each path materializes, and how far the outputs differ.
+#
+#   python -m backend.benchmarks.image_preprocess [--repeat 10] [--sizes 4032x3024,1600x1200,640x480]
+
+import argparse
+import io
+import json
+import time
+
+import torchvision.transforms as transforms
+from PIL import Image
+
+from backend.benchmarks.suite import synthetic_jpeg
+from backend.crop_disease.predictor import preprocess_image
+from backend.image_preprocess import INPUT_SIZE
+
+legacy_transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+])
+
+
+def legacy_preprocess(image_bytes):
+    return legacy_transform(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+
+
+def best_ms(fn, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) * 1000, 2)
+
+
+def decoded_mb(image_bytes, draft):
+    image = Image.open(io.BytesIO(image_bytes))
+    if draft:
+        image.draft("RGB", (INPUT_SIZE, INPUT_SIZE))
+    return round(image.size[0] * image.size[1] * 3 / 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy vs draft-mode image preprocessing.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--sizes", default="4032x3024,1600x1200,640x480")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes.split(","):
+        width, height = (int(v) for v in size.split("x"))
+        data = synthetic_jpeg(width, height)
+        legacy, fast = legacy_preprocess(data), preprocess_image(data)
+        diff = (legacy - fast).abs()
+        results.append({
+            "size": size, "jpeg_kb": len(data) // 1024,
+            "legacy_ms": best_ms(legacy_preprocess, data, args.repeat), "fast_ms": best_ms(preprocess_image, data, args.repeat),
+            "legacy_decoded_mb": decoded_mb(data, False), "fast_decoded_mb": decoded_mb(data, True),
+            "max_abs_diff": round(float(diff.max()), 4), "mean_abs_diff": round(float(diff.mean()), 5),
+        })
+        results[-1]["speedup"] = round(results[-1]["legacy_ms"] / max(results[-1]["fast_ms"], 1e-3), 1)
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# backend/benchmarks/import_time.py
+#
+# Cold-start benchmark: time and peak RSS of `import backend.main` (lazy, what uvicorn sees
+# before accepting connections) versus importing and loading every heavy model up front
+# (what the old eager module-level loading did).
+#
+#   python -m backend.benchmarks.import_time [--repeat 3]
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_SNIPPET = """
+import json, resource, sys, time
+start = time.perf_counter()
+import backend.main
+imported = time.perf_counter() - start
+if {warm!r}:
+    from backend.lazy import warm_up
+    warm_up({targets!r})
+total = time.perf_counter() - start
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{"import_s": imported, "total_s": total, "peak_rss_mb": rss_mb,
+                  "torch_loaded": "torch" in sys.modules, "sklearn_loaded": "sklearn" in sys.modules}}))
+"""
+
+EAGER_TARGETS = ["water_quality_model", "crop_disease_model"]
+
+
+def run_once(warm):
+    code = _SNIPPET.format(warm=warm, targets=EAGER_TARGETS)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    return {
+        "import_s": round(statistics.median(r["import_s"] for r in runs), 3),
+        "ready_s": round(statistics.median(r["total_s"] for r in runs), 3),
+        "peak_rss_mb": round(statistics.median(r["peak_rss_mb"] for r in runs), 1),
+        "torch_loaded": runs[-1]["torch_loaded"],
+        "sklearn_loaded": runs[-1]["sklearn_loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lazy vs eager cold-start cost of backend.main.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {
+        "lazy": summarize([run_once(False) for _ in range(args.repeat)]),
+        "eager": summarize([run_once(True) for _ in range(args.repeat)]),
+    }
+    results["speedup"] = round(results["eager"]["ready_s"] / results["lazy"]["import_s"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
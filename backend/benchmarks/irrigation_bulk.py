@@ -0,0 +1,80 @@
+# backend/benchmarks/irrigation_bulk.py
+#
+# Irrigation recommendations for N plots: one get_smart_recommendation call per plot vs one
+# get_bulk_recommendations call (weather grouped by grid cell, NumPy moisture model).
+# OpenWeather is replaced by an in-process mock transport; "cold" starts with an empty weather cache,
+# "warm" reuses it.
+#
+#   python -m backend.benchmarks.irrigation_bulk [--plots 5000] [--spread-deg 1.0]
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from backend import irrigation_ai
+from backend.cache import ResponseCache
+from backend.http_client import UpstreamClient
+from backend.irrigation_ai import VALID_CROPS, get_bulk_recommendations, get_smart_recommendation
+
+
+def synthetic_plots(n, spread_deg, rng):
+    lat0, lon0 = 19.0, 76.0
+    return [(lat0 + rng.uniform(0, spread_deg), lon0 + rng.uniform(0, spread_deg), rng.choice(VALID_CROPS), rng.randint(0, 14))
+            for _ in range(n)]
+
+
+async def run(plots):
+    requests = {"count": 0}
+
+    def handler(request):
+        requests["count"] += 1
+        lat = float(request.url.params["lat"])
+        return httpx.Response(200, json={"main": {"temp": 20 + lat % 1 * 15}, "rain": {"1h": lat * 7 % 2}})
+
+    http = UpstreamClient(transport=httpx.MockTransport(handler))
+    lats, lons, crops, days = (list(col) for col in zip(*plots))
+    results = {}
+    try:
+        start = time.perf_counter()
+        await get_bulk_recommendations(http, lats, lons, crops, days)
+        results["bulk_cold_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results["weather_requests"] = requests["count"]
+
+        start = time.perf_counter()
+        bulk = await get_bulk_recommendations(http, lats, lons, crops, days)
+        results["bulk_warm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results["weather_cells"] = bulk["weather_cells"]
+
+        start = time.perf_counter()
+        singles = [await get_smart_recommendation(http, lat, lon, crop, d, "June") for lat, lon, crop, d in plots]
+        results["per_plot_warm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    finally:
+        await http.aclose()
+
+    columns = bulk["columns"]
+    results["speedup_warm"] = round(results["per_plot_warm_ms"] / max(results["bulk_warm_ms"], 1e-3), 1)
+    results["mismatches"] = sum(
+        s["recommendation"] != rec or abs(s["soil_moisture_prediction"] - moisture) > 1e-9 or s["next_irrigation_in_days"] != nxt
+        for s, rec, moisture, nxt in zip(singles, columns["recommendation"], columns["soil_moisture_prediction"], columns["next_irrigation_in_days"])
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-plot and bulk irrigation recommendations.")
+    parser.add_argument("--plots", type=int, default=5000)
+    parser.add_argument("--spread-deg", type=float, default=1.0, help="plots are spread over a square of this size")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    irrigation_ai.response_cache = ResponseCache()  # private in-process cache, starts empty
+    plots = synthetic_plots(args.plots, args.spread_deg, random.Random(args.seed))
+    print(json.dumps({"plots": args.plots, **asyncio.run(run(plots))}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
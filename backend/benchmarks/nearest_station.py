@@ -0,0 +1,85 @@
+# backend/benchmarks/nearest_station.py
+#
+# Nearest river station + city lookup: old linear scans vs the precomputed indexes in risk_analyzer.
+# Uses a synthetic gauge network (default 5,000 stations inside India) so it scales past river_data.json.
+#
+#   python -m backend.benchmarks.nearest_station [--stations 5000] [--queries 2000]
+
+import argparse
+import json
+import random
+import time
+
+from backend import risk_analyzer
+from backend.risk_analyzer import StationIndex, haversine
+
+INDIA_BOUNDS = (6.74, 68.03, 35.50, 97.39)  # south, west, north, east
+
+
+def synthetic_stations(n, rng):
+    south, west, north, east = INDIA_BOUNDS
+    return [
+        {"station_name": f"Gauge {i}", "lat": rng.uniform(south, north), "lon": rng.uniform(west, east),
+         "warning_level": 100.0, "danger_level": 101.0}
+        for i in range(n)
+    ]
+
+
+def linear_city_lookup(city_name):
+    city_name_lower = city_name.lower().strip()
+    for city_info in risk_analyzer.CITY_DATA:
+        if city_info["city"].lower() == city_name_lower:
+            return city_info
+    return None
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare linear scans with the risk_analyzer spatial indexes.")
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stations = synthetic_stations(args.stations, rng)
+    cities = [rng.choice(risk_analyzer.CITY_DATA) for _ in range(args.queries)]
+
+    scan, scan_s = timed(lambda: [
+        min(range(len(stations)), key=lambda i: haversine(c["lat"], c["lon"], stations[i]["lat"], stations[i]["lon"]))
+        for c in cities
+    ])
+    import sklearn.neighbors  # noqa: F401  (exclude the one-off import cost from the build time)
+    index, build_s = timed(lambda: StationIndex(stations))
+    (_, indexed), query_s = timed(lambda: index.nearest([c["lat"] for c in cities], [c["lon"] for c in cities], k=1))
+    mismatches = sum(1 for a, b in zip(scan, indexed[:, 0]) if a != b)
+
+    names = [c["city"] for c in cities]
+    _, city_scan_s = timed(lambda: [linear_city_lookup(n) for n in names])
+    _, city_index_s = timed(lambda: [risk_analyzer.CITY_INDEX.lookup(n) for n in names])
+
+    print(json.dumps({
+        "stations": args.stations,
+        "queries": args.queries,
+        "nearest_station": {
+            "linear_scan_ms_per_query": round(scan_s * 1000 / args.queries, 4),
+            "index_build_ms": round(build_s * 1000, 2),
+            "index_ms_per_query": round(query_s * 1000 / args.queries, 4),
+            "speedup": round(scan_s / query_s, 1),
+            "mismatches": mismatches,
+        },
+        "city_lookup": {
+            "linear_scan_us_per_query": round(city_scan_s * 1e6 / args.queries, 2),
+            "index_us_per_query": round(city_index_s * 1e6 / args.queries, 2),
+            "speedup": round(city_scan_s / city_index_s, 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
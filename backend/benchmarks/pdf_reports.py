@@ -0,0 +1,119 @@
+# backend/benchmarks/pdf_reports.py
+#
+# Peak memory and disk usage over N deforestation reports:
+#   legacy   - PDF and both thumbnails written to NamedTemporaryFile(delete=False), as before (never cleaned up)
+#   inmemory - create_pdf_report into a BytesIO with the image bytes passed straight to ReportLab
+#   cached   - get_or_create_pdf_report, with every report requested twice (second one is a cache hit)
+#
+# Each mode runs in its own interpreter so peak RSS (ru_maxrss) is measured per mode.
+#
+#   python -m backend.benchmarks.pdf_reports [--reports 1000]
+
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from backend import pdf_report
+from backend.disk_cache import DiskLRU
+
+
+def synthetic_png(rng, size=512):
+    """Noisy image so the PNG is about as large as a real satellite thumbnail."""
+    img = Image.frombytes("RGB", (size, size), bytes(rng.getrandbits(8) for _ in range(size * size * 3)))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def report_args(i):
+    stats = {"Initial Forest Area (ha)": 500 + i, "Deforested Area (ha)": round(i * 0.37, 2), "Percentage Loss (%)": round(i % 100 * 0.1, 2)}
+    return json.dumps(stats), f"https://example.test/{i}/start.png", f"https://example.test/{i}/end.png", "2020-01-01", "2023-01-01"
+
+
+def legacy_report(images, stats, start_map, end_map, start_date, end_date):
+    paths = []
+    for img in images:
+        path = tempfile.NamedTemporaryFile(delete=False, suffix=".png").name
+        with open(path, "wb") as f:
+            f.write(img)
+        paths.append(path)
+    pdf = pdf_report.create_pdf_report(stats, start_map, end_map, start_date, end_date,
+                                       images=tuple(open(p, "rb").read() for p in paths))
+    pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
+    with open(pdf_path, "wb") as f:
+        f.write(pdf)
+    return paths + [pdf_path]
+
+
+def run(mode, n, images):
+    leaked = []
+    start = time.perf_counter()
+    for i in range(n):
+        args = report_args(i)
+        if mode == "legacy":
+            leaked += legacy_report(images, *args)
+        elif mode == "inmemory":
+            pdf_report.create_pdf_report(*args, images=images)
+        else:
+            for _ in range(2):
+                pdf_report.get_or_create_pdf_report(*args, images=images)
+    elapsed = time.perf_counter() - start
+
+    disk = sum(os.path.getsize(p) for p in leaked)
+    if mode == "cached":
+        disk = pdf_report.report_cache.stats()["bytes"]
+    for path in leaked:
+        os.remove(path)
+    return {
+        "mode": mode,
+        "reports": n,
+        "ms_per_report": round(elapsed * 1000 / n, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "disk_mb_left_behind": round(disk / 1e6, 1),
+        "temp_files_left_behind": len(leaked),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory / disk usage of PDF report generation.")
+    parser.add_argument("--reports", type=int, default=1000)
+    parser.add_argument("--modes", default="legacy,inmemory,cached")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.child:
+        results = []
+        for mode in args.modes.split(","):
+            out = subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.pdf_reports", "--child", "--modes", mode,
+                 "--reports", str(args.reports), "--seed", str(args.seed)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(out))
+        print(json.dumps(results, indent=2))
+        return
+
+    rng = random.Random(args.seed)
+    images = (synthetic_png(rng, 256), synthetic_png(rng, 256))
+    scratch = tempfile.mkdtemp(prefix="report-bench-")
+    # Bounded cache in a scratch dir so the run doesn't touch the server's report cache
+    pdf_report.report_cache = DiskLRU(os.path.join(scratch, "cache"), max_bytes=64 * 1024 * 1024)
+    try:
+        print(json.dumps(run(args.modes, args.reports, images)))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# backend/benchmarks/standins.py
+#
+# Offline stand-ins for everything the backend talks to, so the benchmark suite runs without
+# credentials or network access:
+#   - FakeEE: an `ee` module look-alike; every blocking call (getInfo, getThumbURL, getMapId) sleeps for
+#     a configurable latency and is counted, everything else just chains. Batch exports complete instantly
+#     and can be read back from their table asset
+#   - UpstreamStub: a local HTTP server answering like AQICN, OpenWeather, Groq and EE thumbnail URLs,
+#     plus StubTransport, which rewrites the app's outbound https URLs to it
+#   - a randomly initialised ResNet-50 with the class_names.json head, and a tiny sklearn water model
+
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import numpy as np
+
+from backend.ghg_detector import NO2_BAND
+
+
+# ==============================================================================
+# Fake Earth Engine
+# ==============================================================================
+class _Node:
+    """Any EE object: attribute access, calls and indexing return another node."""
+
+    def __init__(self, fake, payload=None, sticky=False):
+        self._fake = fake
+        self._payload = payload
+        self._sticky = sticky  # keep the payload through chained calls (exported table assets)
+
+    def _next(self):
+        return _Node(self._fake, self._payload, True) if self._sticky else _Node(self._fake)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self._next()
+
+    def __call__(self, *args, **kwargs):
+        return self._next()
+
+    def __getitem__(self, key):
+        return self._next()
+
+    def getInfo(self):
+        return self._fake.round_trip("getInfo", self._payload if self._payload is not None else {})
+
+    def getThumbURL(self, params=None):
+        return self._fake.round_trip("getThumbURL", "https://earthengine.googleapis.com/v1/thumbnails/bench.png")
+
+    def getMapId(self, vis_params=None):
+        fetcher = type("TileFetcher", (), {"url_format": "https://earthengine.googleapis.com/v1/maps/bench/tiles/{z}/{x}/{y}"})()
+        return self._fake.round_trip("getMapId", {"mapid": "bench", "token": "", "tile_fetcher": fetcher})
+
+
+class _FakeTask:
+    def __init__(self, fake, task_id, asset_id):
+        self._fake = fake
+        self.id = task_id
+        self.asset_id = asset_id
+
+    def start(self):
+        self._fake.round_trip("startTask", None)
+        self._fake.tasks[self.id] = {"id": self.id, "state": self._fake.export_state, "description": self.asset_id}
+
+
+class FakeEE:
+    """Drop-in for the `ee` module in gee_utils / gee_tiling / ghg_detector. Thread-safe round-trip counters."""
+
+    EXPORT_SUMS = {"deforested": 3.0e7, "initial_forest": 9.0e9, "start_date": "", "end_date": ""}
+
+    def __init__(self, latency_s=0.05):
+        self.latency_s = latency_s
+        self.round_trips = Counter()
+        self._lock = threading.Lock()
+        self.EEException = type("EEException", (Exception,), {})
+        self.tasks = {}     # task id -> status dict, as ee.data.getTaskStatus returns it
+        self.assets = set()
+        self.export_state = "COMPLETED"  # state a started export task reports (tests set "RUNNING" to model a stuck one)
+        self.data = SimpleNamespace(getTaskStatus=self._task_status, deleteAsset=self.assets.remove, cancelTask=self._cancel_task)
+        self.batch = SimpleNamespace(Export=SimpleNamespace(table=SimpleNamespace(toAsset=self._export_to_asset)))
+
+    def round_trip(self, kind, result):
+        with self._lock:
+            self.round_trips[kind] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)  # blocking, like the real client
+        return result
+
+    def Dictionary(self, value=None):
+        return _Node(self, self._payload_for(value if isinstance(value, dict) else {}))
+
+    def FeatureCollection(self, *args, **kwargs):
+        if args and isinstance(args[0], str):  # an exported table asset
+            return _Node(self, dict(self.EXPORT_SUMS), sticky=True)
+        return _Node(self, {"features": []})
+
+    def _export_to_asset(self, collection=None, description="", assetId=""):
+        self.assets.add(assetId)
+        return _FakeTask(self, f"task-{len(self.tasks) + 1}", assetId)
+
+    def _cancel_task(self, task_id):
+        self.tasks[task_id]["state"] = "CANCELLED"
+
+    def _task_status(self, task_id):
+        self.round_trip("getTaskStatus", None)
+        return [self.tasks.get(task_id, {"id": task_id, "state": "UNKNOWN"})]
+
+    def __getattr__(self, name):
+        return _Node(self)
+
+    @staticmethod
+    def _payload_for(value):
+        keys = set(value)
+        bounds = [[[77.0, 28.0], [77.2, 28.0], [77.2, 28.2], [77.0, 28.2], [77.0, 28.0]]]
+        if {"sums", "bounds"} <= keys:
+            return {"start_size": 12, "end_size": 14, "bounds": bounds,
+                    "sums": {"deforested": 1.5e6, "initial_forest": 2.4e8}}
+        if "has_imagery" in keys:
+            return {"start_size": 12, "end_size": 14, "has_imagery": True, "bounds": bounds}
+        if "bands" in keys:
+            return {"bands": 1, "stats": {f"{NO2_BAND}_min": 2e-5, f"{NO2_BAND}_max": 9e-5, f"{NO2_BAND}_mean": 5e-5}}
+        return {}
+
+
+# ==============================================================================
+# Upstream HTTP stub (AQICN, OpenWeather, Groq, thumbnails)
+# ==============================================================================
+INDIA_BOUNDS = (6.74, 68.03, 35.50, 97.39)
+
+
+def synthetic_png(size=256, seed=0):
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class UpstreamStub:
+    """Threaded local HTTP server. Paths are /<original host><original path>; see StubTransport."""
+
+    def __init__(self, latency_s=0.02, stations=1500, seed=0):
+        self.latency_s = latency_s
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        rng = random.Random(seed)
+        south, west, north, east = INDIA_BOUNDS
+        self.stations = [{"lat": rng.uniform(south, north), "lon": rng.uniform(west, east), "uid": i,
+                          "aqi": str(rng.randint(10, 400)), "station": {"name": f"Station {i}", "time": "2024-01-01T10:00:00+05:30"}}
+                         for i in range(stations)]
+        self.png = synthetic_png()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def do_POST(self):
+                stub._handle(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="upstream-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        host, _, path = parts.path.lstrip("/").partition("/")
+        path = "/" + path
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length:
+            handler.rfile.read(length)
+        with self._lock:
+            self.requests[host] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        body, content_type = self._respond(host, path, query)
+        if body is None:
+            handler.send_response(404)
+            body, content_type = b'{"error": "not found"}', "application/json"
+        else:
+            handler.send_response(200)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _respond(self, host, path, query):
+        if host == "api.waqi.info":
+            if path.startswith("/map/bounds"):
+                return self._json({"status": "ok", "data": self.stations})
+            if path.startswith("/feed/"):
+                city = path.split("/")[2]
+                return self._json({"status": "ok", "data": {"aqi": 142, "city": {"name": city},
+                                                           "iaqi": {"pm25": {"v": 142}, "no2": {"v": 21}}}})
+        if host == "api.openweathermap.org":
+            lat = float(query.get("lat", 20))
+            if path.endswith("/weather"):
+                return self._json({"main": {"temp": 20 + lat % 10, "feels_like": 22, "humidity": 60},
+                                   "wind": {"speed": 3.1}, "weather": [{"description": "clear sky", "icon": "01d"}],
+                                   "rain": {"1h": 0.2}})
+            if path.endswith("/forecast"):
+                start = int(time.time())
+                return self._json({"list": [
+                    {"dt": start + i * 10800, "main": {"temp": 25 + i % 8, "temp_min": 22 + i % 8, "temp_max": 28 + i % 8},
+                     "weather": [{"icon": "01d"}], **({"rain": {"3h": 1.5}} if i % 9 == 0 else {})}
+                    for i in range(40)
+                ]})
+        if host == "api.groq.com" and path.endswith("/chat/completions"):
+            return self._json({
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": "llama-3.3-70b-versatile",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "**Partially True.** Benchmark reply."}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+            })
+        if path.endswith(".png"):
+            return self.png, "image/png"
+        return None, None
+
+    @staticmethod
+    def _json(value):
+        return json.dumps(value).encode(), "application/json"
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Sends every request to the stub as http://127.0.0.1:<port>/<host><path>?<query>."""
+
+    def __init__(self, stub):
+        self._stub = stub
+        self._inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        url = request.url
+        request.url = url.copy_with(scheme="http", host="127.0.0.1", port=self._stub.port, path=f"/{url.host}{url.path}")
+        request.headers["Host"] = f"127.0.0.1:{self._stub.port}"
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+# ==============================================================================
+# Models
+# ==============================================================================
+def write_random_resnet(path, num_classes, seed=0):
+    """ResNet-50 with a `num_classes` head and random weights, saved as a state dict (same shape as the real one)."""
+    import torch
+    import torch.nn as nn
+    import torchvision.models as models
+    torch.manual_seed(seed)
+    model = models.resnet50(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, num_classes)
+    torch.save(model.state_dict(), path)
+    return path
+
+
+def tiny_water_model(seed=0):
+    """Small RandomForest on the same features / classes as the production water-quality model."""
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    rng = np.random.default_rng(seed)
+    n = 2000
+    frame = pd.DataFrame({"do": rng.uniform(0, 12, n), "ph": rng.uniform(5, 9.5, n),
+                          "conductivity": rng.uniform(50, 3000, n), "bod": rng.uniform(0, 30, n)})
+    score = frame["do"] / 2 - frame["bod"] / 6 - abs(frame["ph"] - 7.2) - frame["conductivity"] / 1500
+    labels = np.select([score > 1.5, score > -1.0], ["Good", "Moderate"], default="Poor")
+    return RandomForestClassifier(n_estimators=20, max_depth=6, random_state=seed).fit(frame, labels)
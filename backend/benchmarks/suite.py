@@ -0,0 +1,382 @@
+# backend/benchmarks/suite.py
+#
+# Offline end-to-end benchmark suite. Runs the real FastAPI app in-process (lifespan included) against
+# the stand-ins in standins.py (fake Earth Engine with configurable round-trip latency, a local HTTP stub for
+# AQICN / OpenWeather / Groq, a random-weight ResNet-50 and a tiny water model), so no credentials or network
+# are needed and runs on different machines / commits are comparable.
+#   - load: per endpoint, N requests at a fixed concurrency -> throughput and p50 / p95 / p99 latency, plus
+#     EE round trips and upstream calls per request (to see caching and batching at work)
+#   - micro: haversine, nearest-station lookup, create_pdf_report and the crop image preprocessing transform
+#   - modules (--with-modules): the focused benchmarks in this package, run as subprocesses
+# Results are written as JSON; --baseline compares against an earlier run and flags regressions.
+#
+#   python -m backend.benchmarks.suite [--requests 100] [--concurrency 8] [--only air,irrigation]
+#       [--ee-latency-ms 50] [--upstream-latency-ms 20] [--output bench.json]
+#       [--baseline old.json] [--tolerance 0.15] [--fail-on-regression] [--with-modules]
+#
+# Run from the repository root (the backend reads backend/*.json with relative paths).
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from unittest import mock
+
+import numpy as np
+
+# Focused benchmarks run by --with-modules, with arguments small enough for a CI run
+MODULE_BENCHMARKS = {
+    "flood_bulk": ["--repeat", "2"],
+    "nearest_station": ["--stations", "2000", "--queries", "500"],
+    "water_batch": ["--rows", "500"],
+    "irrigation_bulk": ["--plots", "1000"],
+    "irrigation_sim": ["--plots", "1000"],
+    "aqi_grid": ["--queries", "2000"],
+    "image_preprocess": ["--repeat", "3"],
+    "pdf_reports": ["--reports", "20", "--modes", "inmemory,cached"],
+    "batch_reports": ["--regions", "8", "--workers", "1"],
+    "import_time": ["--repeat", "1"],
+}
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {"throughput_rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "p50_us": False}
+
+
+def configure_environment(workdir, stub_url):
+    """Points every cache / job store at `workdir` and the API keys at dummies. Must run before importing backend.*."""
+    os.environ.update({
+        "EE_CACHE_PATH": os.path.join(workdir, "ee_results.sqlite"),
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.sqlite"),
+        "JOBS_ARTIFACT_DIR": os.path.join(workdir, "job_artifacts"),
+        "REPORT_CACHE_DIR": os.path.join(workdir, "reports"),
+        "TILE_CACHE_DIR": os.path.join(workdir, "tiles"),
+        "AQICN_API_KEY": "bench",
+        "OPENWEATHER_API_KEY": "bench",
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": f"{stub_url}/api.groq.com",
+        "WARM_UP_RESOURCES": "",
+        "CROP_MODEL_BACKEND": "eager",
+    })
+
+
+# ==============================================================================
+# Fixtures and scenarios
+# ==============================================================================
+def synthetic_jpeg(width=1600, height=1200, seed=0):
+    """Smooth gradient plus noise, so it compresses about like a phone photo."""
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def random_point(rng):
+    return round(rng.uniform(8.0, 34.0), 4), round(rng.uniform(69.0, 96.0), 4)
+
+
+def polygon_geojson(i):
+    """A ~2 km square, shifted per request so every analysis misses the EE result cache."""
+    lat, lon = 20.0 + (i % 100) * 0.02, 77.0 + (i // 100) * 0.02
+    ring = [[lon, lat], [lon + 0.02, lat], [lon + 0.02, lat + 0.02], [lon, lat + 0.02], [lon, lat]]
+    return json.dumps({"type": "Polygon", "coordinates": [ring]})
+
+
+def plots(rng, n):
+    from backend.irrigation_ai import VALID_CROPS
+    lat0, lon0 = random_point(rng)
+    return [{"latitude": lat0 + rng.uniform(0, 1), "longitude": lon0 + rng.uniform(0, 1),
+             "crop_type": rng.choice(VALID_CROPS), "days_since_last_irrigation": rng.randint(0, 10)} for _ in range(n)]
+
+
+def build_scenarios(jpeg):
+    """name -> (group, method, path or path(i, rng), build(i, rng) -> httpx request kwargs)."""
+    from backend.risk_analyzer import CITY_DATA
+    cities = [city["city"] for city in CITY_DATA]
+    thumb = "https://earthengine.googleapis.com/v1/thumbnails/{}/{}.png"
+
+    def report_form(i, rng):
+        stats = {"Initial Forest Area (ha)": 500 + i, "Deforested Area (ha)": round(i * 0.37, 2), "Percentage Loss (%)": round(i % 100 * 0.1, 2)}
+        return {"data": {"stats": json.dumps(stats), "start_map": thumb.format(i, "start"), "end_map": thumb.format(i, "end"),
+                         "start_date": "2020-01-01", "end_date": "2023-01-01"}}
+
+    def bbox(rng):
+        lat, lon = random_point(rng)
+        return {"south": lat - 1, "west": lon - 1, "north": lat + 1, "east": lon + 1, "zoom": rng.randint(5, 10)}
+
+    none = lambda i, rng: {}
+    return {
+        "health_ready": ("core", "GET", "/health/ready", none),
+        "cache_stats": ("core", "GET", "/cache/stats", none),
+        "air_pollution_stations": ("air", "GET", "/air/pollution_stations", none),
+        "air_aqi_at": ("air", "GET", "/air/aqi_at", lambda i, rng: {"params": dict(zip(("lat", "lon"), random_point(rng)))}),
+        "air_stations_clustered": ("air", "GET", "/air/pollution_stations/clustered", lambda i, rng: {"params": bbox(rng)}),
+        "air_pollution_by_city": ("air", "GET", lambda i, rng: f"/air/pollution_by_city/{rng.choice(cities)}", none),
+        "air_weather_forecast": ("air", "GET", "/air/weather_forecast", lambda i, rng: {"params": dict(zip(("lat", "lon"), random_point(rng)))}),
+        "air_ghg_emissions": ("air", "POST", "/air/ghg_emissions", lambda i, rng: {"json": {
+            "bounds": [[20 + i % 50 * 0.1, 77.0], [20.5 + i % 50 * 0.1, 77.5]], "date": f"2024-0{1 + i % 9}-15"}}),
+        "flood_drought_by_city": ("risk", "POST", "/predict/flood_drought_by_city", lambda i, rng: {"json": {"city": rng.choice(cities)}}),
+        "flood_drought_bulk": ("risk", "POST", "/predict/flood_drought/bulk", lambda i, rng: {"json": {"seed": i}}),
+        "water_quality": ("water", "POST", "/predict/water_quality", lambda i, rng: {"json": {
+            "do": rng.uniform(0, 12), "ph": rng.uniform(5, 9.5), "conductivity": rng.uniform(50, 3000), "bod": rng.uniform(0, 30), "coliform": 0}}),
+        "irrigation_recommendation": ("irrigation", "POST", "/irrigation/get_recommendation", lambda i, rng: {"json": {
+            **dict(zip(("latitude", "longitude"), random_point(rng))), "crop_type": "Wheat", "days_since_last_irrigation": 3, "month": "June"}}),
+        "irrigation_bulk_200": ("irrigation", "POST", "/irrigation/bulk_recommendations", lambda i, rng: {"json": {"plots": plots(rng, 200), "month": "June"}}),
+        "irrigation_schedule_200": ("irrigation", "POST", "/irrigation/schedule", lambda i, rng: {"json": {"plots": plots(rng, 200), "month": "June"}}),
+        "analyze_area": ("land", "POST", "/analyze_area", lambda i, rng: {"data": {
+            "geojson": polygon_geojson(i), "start_date": "2020-01-01", "end_date": "2023-01-01"}}),
+        "generate_report": ("land", "POST", "/generate_report", report_form),
+        "crop_disease": ("crop", "POST", "/predict_crop_disease", lambda i, rng: {"files": {"file": ("leaf.jpg", jpeg, "image/jpeg")}}),
+        "crop_disease_batch_8": ("crop", "POST", "/predict_crop_disease/batch", lambda i, rng: {
+            "files": [("files", (f"leaf{n}.jpg", jpeg, "image/jpeg")) for n in range(8)]}),
+        "recommend_crop_from_photo": ("crop", "POST", "/recommend_crop_from_photo", lambda i, rng: {
+            "files": {"file": ("soil.jpg", jpeg, "image/jpeg")}, "data": {"month": "June", "location": rng.choice(cities)}}),
+        "report_issue": ("crop", "POST", "/report_issue", lambda i, rng: {"files": {"file": ("river_waste.jpg", jpeg, "image/jpeg")}}),
+        "ecobot": ("llm", "POST", "/chatbot/ecobot", lambda i, rng: {"json": {"message": "How do forests affect rainfall?"}}),
+        "verify_claim": ("llm", "POST", "/verify_claim", lambda i, rng: {"json": {"claim": f"Claim number {i % 20}: trees cool cities."}}),
+    }
+
+
+# ==============================================================================
+# Load runner
+# ==============================================================================
+def latency_summary(seconds, unit="ms"):
+    scale = 1000 if unit == "ms" else 1e6
+    values = np.asarray(seconds) * scale
+    return {f"p50_{unit}": round(float(np.percentile(values, 50)), 3), f"p95_{unit}": round(float(np.percentile(values, 95)), 3),
+            f"p99_{unit}": round(float(np.percentile(values, 99)), 3), f"mean_{unit}": round(float(values.mean()), 3)}
+
+
+async def run_scenario(client, scenario, requests, concurrency, rng, counters):
+    _, method, path, build = scenario
+    target = lambda i: path(i, rng) if callable(path) else path
+
+    # First request alone: cold loads (models, Groq client, AQI snapshot) are reported, not mixed into percentiles
+    start = time.perf_counter()
+    first = await client.request(method, target(0), **build(0, rng))
+    first_ms = round((time.perf_counter() - start) * 1000, 1)
+    if first.status_code >= 400:
+        return {"error": f"HTTP {first.status_code}: {first.text[:200]}", "first_request_ms": first_ms}
+
+    before = counters()
+    latencies, errors, next_index = [], [], itertools.count(1)
+
+    async def worker():
+        while (i := next(next_index)) <= requests:
+            kwargs = build(i, rng)
+            t0 = time.perf_counter()
+            response = await client.request(method, target(i), **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    after = counters()
+    return {
+        "requests": requests, "concurrency": concurrency, "first_request_ms": first_ms,
+        "throughput_rps": round(requests / elapsed, 2), **latency_summary(latencies),
+        "errors": len(errors), "error_statuses": sorted(set(errors)),
+        **{f"{name}_per_request": round((after[name] - before[name]) / requests, 3) for name in after},
+    }
+
+
+@contextmanager
+def offline_backend(workdir, ee_latency_s=0.05, upstream_latency_s=0.02):
+    """
+    Starts the stand-ins and patches every external dependency of the app to use them.
+    Yields (backend.main module, counters); also used by the tests in backend/tests.
+    """
+    from backend.benchmarks.standins import FakeEE, StubTransport, UpstreamStub, tiny_water_model, write_random_resnet
+
+    stub = UpstreamStub(latency_s=upstream_latency_s).start()
+    configure_environment(workdir, stub.base_url)
+    fake_ee = FakeEE(latency_s=ee_latency_s)
+
+    from backend import gee_tiling, gee_utils, ghg_detector, main
+    from backend.crop_disease import predictor
+    from backend.http_client import UpstreamClient
+
+    weights = write_random_resnet(os.path.join(workdir, "resnet50_random.pth"), len(predictor.class_names))
+    with ExitStack() as patches:
+        for module in (gee_utils, gee_tiling, ghg_detector):
+            patches.enter_context(mock.patch.object(module, "ee", fake_ee))
+        patches.enter_context(mock.patch.object(gee_utils.earth_engine, "_loader", lambda: None))
+        patches.enter_context(mock.patch.object(predictor, "MODEL_PATH", weights))
+        patches.enter_context(mock.patch.object(main.water_model, "_loader", tiny_water_model))
+        patches.enter_context(mock.patch.object(main, "UpstreamClient",
+                                                lambda **kwargs: UpstreamClient(transport=StubTransport(stub), **kwargs)))
+        for resource in (gee_utils.earth_engine, main.water_model):
+            resource.reset()
+
+        def counters():
+            return {"ee_round_trips": sum(fake_ee.round_trips.values()), "upstream_calls": sum(stub.requests.values())}
+
+        try:
+            yield main, counters
+        finally:
+            stub.stop()
+
+
+@asynccontextmanager
+async def offline_app(args, workdir):
+    """The app with every external dependency replaced by a stand-in. Yields (httpx client, counters)."""
+    import httpx
+
+    with offline_backend(workdir, args.ee_latency_ms / 1000, args.upstream_latency_ms / 1000) as (main, counters):
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                yield client, counters
+
+
+async def run_load(args, workdir):
+    results = {}
+    async with offline_app(args, workdir) as (client, counters):
+        jpeg = synthetic_jpeg()
+        scenarios = build_scenarios(jpeg)
+        selected = {name: s for name, s in scenarios.items()
+                    if not args.only or s[0] in args.only or name in args.only}
+        for name, scenario in selected.items():
+            rng = random.Random(f"{args.seed}:{name}")
+            results[name] = await run_scenario(client, scenario, args.requests, args.concurrency, rng, counters)
+            summary = results[name].get("error") or f"{results[name]['throughput_rps']} req/s, p95 {results[name]['p95_ms']} ms"
+            print(f"INFO: {name}: {summary}", file=sys.stderr)
+    return results
+
+
+# ==============================================================================
+# Micro-benchmarks
+# ==============================================================================
+def time_calls(fn, inputs):
+    durations = []
+    for value in inputs:
+        start = time.perf_counter()
+        fn(value)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run_micro(args):
+    from backend.benchmarks.standins import synthetic_png
+    from backend.crop_disease.predictor import preprocess_image
+    from backend.pdf_report import create_pdf_report
+    from backend.risk_analyzer import haversine, nearest_stations
+
+    rng = random.Random(args.seed)
+    points = [random_point(rng) for _ in range(args.micro_iterations * 100)]
+    pairs = list(zip(points, reversed(points)))
+    images = (synthetic_png(512, 1), synthetic_png(512, 2))
+    stats = json.dumps({"Initial Forest Area (ha)": 512.0, "Deforested Area (ha)": 3.7, "Percentage Loss (%)": 0.72})
+    jpeg = synthetic_jpeg()
+
+    results = {
+        "haversine": time_calls(lambda p: haversine(*p[0], *p[1]), pairs),
+        "nearest_station": time_calls(lambda p: nearest_stations(*p), points),
+        "create_pdf_report": time_calls(lambda i: create_pdf_report(stats, "start.png", "end.png", "2020-01-01", "2023-01-01", images=images),
+                                        range(args.micro_iterations)),
+        "preprocess_image": time_calls(preprocess_image, [jpeg] * args.micro_iterations),
+    }
+    return {name: {"calls": len(durations), **latency_summary(durations, "us")} for name, durations in results.items()}
+
+
+def run_modules():
+    results = {}
+    for name, extra in MODULE_BENCHMARKS.items():
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-m", f"backend.benchmarks.{name}", *extra], capture_output=True, text=True)
+        if proc.returncode != 0:
+            results[name] = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+        else:
+            results[name] = json.loads(proc.stdout)
+        print(f"INFO: module {name} finished in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return results
+
+
+# ==============================================================================
+# Baseline comparison
+# ==============================================================================
+def compare(current, baseline, tolerance):
+    """Relative change of every COMPARED_METRICS value present in both runs; regressions beyond `tolerance` are flagged."""
+    rows = []
+    for section in ("load", "micro"):
+        for name, metrics in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name, {})
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                if metric not in metrics or not old.get(metric):
+                    continue
+                change = (metrics[metric] - old[metric]) / old[metric]
+                regressed = -change > tolerance if higher_is_better else change > tolerance
+                rows.append({"benchmark": f"{section}.{name}", "metric": metric, "baseline": old[metric],
+                             "current": metrics[metric], "change_pct": round(change * 100, 1), "regression": regressed})
+    return rows
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end and micro benchmarks with baseline comparison.")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", default="", help="comma-separated scenario groups or names (core, air, risk, water, irrigation, land, crop, llm)")
+    parser.add_argument("--ee-latency-ms", type=float, default=50.0, help="simulated Earth Engine round-trip latency")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0, help="simulated AQICN / OpenWeather / Groq latency")
+    parser.add_argument("--micro-iterations", type=int, default=50)
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--with-modules", action="store_true", help="also run the focused benchmarks in this package")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    args.only = {name.strip() for name in args.only.split(",") if name.strip()}
+
+    with tempfile.TemporaryDirectory(prefix="bitclimate-bench-") as workdir:
+        results = {"environment": environment_info(),
+                   "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")} | {"only": sorted(args.only)}}
+        if not args.skip_load:
+            results["load"] = asyncio.run(run_load(args, workdir))
+        if not args.skip_micro:
+            results["micro"] = run_micro(args)
+        if args.with_modules:
+            results["modules"] = run_modules()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(results, json.load(f), args.tolerance)
+        regressions = [row for row in results["comparison"] if row["regression"]]
+        for row in regressions:
+            print(f"WARN: {row['benchmark']} {row['metric']}: {row['baseline']} -> {row['current']} ({row['change_pct']:+}%)", file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
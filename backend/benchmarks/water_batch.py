@@ -0,0 +1,62 @@
+# backend/benchmarks/water_batch.py
+#
+# Water-quality prediction: N single calls through the old one-row DataFrame path vs one batch
+# through the NumPy validation + chunked NDJSON path used by /predict/water_quality/batch.
+#
+#   python -m backend.benchmarks.water_batch [--rows 2000]
+
+import argparse
+import json
+import random
+import time
+
+import joblib
+import pandas as pd
+
+from backend.water_quality import iter_ndjson_predictions, validate_columns
+
+MODEL_PATH = "backend/model/water_quality_model.pkl"
+
+
+def synthetic_rows(n, rng):
+    return [
+        {"do": rng.uniform(0, 12), "ph": rng.uniform(5, 9.5), "conductivity": rng.uniform(50, 3000),
+         "bod": rng.uniform(0, 30), "coliform": rng.uniform(0, 5000)}
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-row and batch water-quality prediction.")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    rows = synthetic_rows(args.rows, random.Random(args.seed))
+
+    start = time.perf_counter()
+    singles = []
+    for row in rows:
+        features = {k: row[k] for k in ("do", "ph", "conductivity", "bod")}
+        singles.append(str(model.predict(pd.DataFrame([features]))[0]))
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    matrix = validate_columns(columns, model)
+    lines = "".join(iter_ndjson_predictions(model, matrix)).splitlines()
+    batch_s = time.perf_counter() - start
+
+    batched = [json.loads(line)["predicted_quality"] for line in lines]
+    print(json.dumps({
+        "rows": args.rows,
+        "single_calls_ms": round(single_s * 1000, 1),
+        "batch_ms": round(batch_s * 1000, 1),
+        "speedup": round(single_s / batch_s, 1),
+        "mismatches": sum(a != b for a, b in zip(singles, batched)),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# backend/cache.py
+#
+# Shared response cache for upstream APIs (AQICN, OpenWeather, Groq).
+#   - per-source TTL + stale-while-revalidate window (CACHE_POLICIES)
+#   - bounded in-process LRU backend, or any Redis-compatible client (get / set(ex=) / delete); the async
+#     API reads and writes a network backend in a worker thread, so a slow Redis never blocks the event loop
+#   - request coalescing: concurrent misses for the same key share one upstream call
+#   - hit / miss / stale counters per source, exposed at /cache/stats
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float            # seconds an entry is served as fresh
+    stale_ttl: float = 0  # extra seconds it may be served stale while a refresh runs in the background
+
+
+CACHE_POLICIES = {
+    "aqicn_stations": CachePolicy(ttl=600, stale_ttl=300),
+    "aqicn_city": CachePolicy(ttl=600, stale_ttl=300),
+    "openweather_current": CachePolicy(ttl=900, stale_ttl=300),
+    "openweather_forecast": CachePolicy(ttl=900, stale_ttl=900),
+    "groq_verify": CachePolicy(ttl=24 * 3600),
+    # NO2 window stats: settled windows barely change; the last few days still receive new orbits
+    "no2_window": CachePolicy(ttl=7 * 24 * 3600),
+    "no2_window_recent": CachePolicy(ttl=3600),
+    "no2_stats": CachePolicy(ttl=6 * 3600),
+    "no2_stats_recent": CachePolicy(ttl=3600),
+    # getMapId credentials; kept well inside their EE lifetime so a cached URL never points at an expired map.
+    # Recent weeks are re-minted sooner: a map id renders the composite as it was when it was minted
+    "ee_mapid": CachePolicy(ttl=float(os.getenv("EE_MAPID_TTL", "7200"))),
+    "ee_mapid_recent": CachePolicy(ttl=float(os.getenv("EE_MAPID_RECENT_TTL", "900"))),
+}
+DEFAULT_POLICY = CachePolicy(ttl=300)
+
+# Weather is keyed by grid cell, not the exact coordinate (0.1 deg ~ 11 km)
+WEATHER_GRID_DEG = float(os.getenv("CACHE_WEATHER_GRID_DEG", "0.1"))
+
+
+def grid_cell(lat, lon, cell_deg=WEATHER_GRID_DEG):
+    """Snaps a coordinate to the centre of its grid cell. Returns (lat, lon) rounded for stable keys."""
+    snap = lambda v: round((round(v / cell_deg)) * cell_deg, 4)
+    return snap(lat), snap(lon)
+
+
+def grid_key(lat, lon, cell_deg=WEATHER_GRID_DEG):
+    cell_lat, cell_lon = grid_cell(lat, lon, cell_deg)
+    return f"{cell_lat:.4f},{cell_lon:.4f}"
+
+
+# ==============================================================================
+# Backends: store (value, stored_at) pairs
+# ==============================================================================
+class MemoryBackend:
+    """Bounded, thread-safe LRU kept in the worker process."""
+
+    blocking = False
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            entry, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._data[key] = (entry, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Stores entries as JSON in anything with a Redis-style `get(key)`, `set(key, value, ex=seconds)`
+    and `delete(key)` (redis.Redis, fakeredis, or a small dict-based fake in tests).
+    Values must be JSON-serializable.
+    """
+
+    blocking = True  # every call is a network round trip
+
+    def __init__(self, client, prefix="bitclimate:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        value, stored_at = json.loads(raw)
+        return value, stored_at
+
+    def set(self, key, entry, ttl):
+        self.client.set(self.prefix + key, json.dumps(entry), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+# ==============================================================================
+# Cache front-end
+# ==============================================================================
+class ResponseCache:
+    def __init__(self, backend=None, policies=None):
+        self.backend = backend or MemoryBackend()
+        self.policies = dict(CACHE_POLICIES if policies is None else policies)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._async_inflight = {}   # full key -> asyncio.Task shared by every waiter
+        self._sync_inflight = {}    # full key -> (threading.Event, result holder)
+        self._sync_lock = threading.Lock()
+        self._refreshing = set()
+        self._background = set()    # strong references to running refresh / fetch tasks
+
+    # --- Bookkeeping ---
+    def _count(self, source, counter):
+        with self._stats_lock:
+            counters = self._stats.setdefault(
+                source, {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "errors": 0}
+            )
+            counters[counter] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {source: dict(counters) for source, counters in self._stats.items()}
+
+    def policy(self, source):
+        return self.policies.get(source, DEFAULT_POLICY)
+
+    def _lookup(self, source, full_key):
+        """Returns (value, state) where state is 'fresh', 'stale' or None."""
+        return self._freshness(source, self.backend.get(full_key))
+
+    async def _alookup(self, source, full_key):
+        if not self.backend.blocking:
+            return self._lookup(source, full_key)
+        return self._freshness(source, await asyncio.to_thread(self.backend.get, full_key))
+
+    def _freshness(self, source, entry):
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = time.time() - stored_at
+        policy = self.policy(source)
+        if age <= policy.ttl:
+            return value, "fresh"
+        if age <= policy.ttl + policy.stale_ttl:
+            return value, "stale"
+        return None, None
+
+    def _store(self, source, full_key, value):
+        policy = self.policy(source)
+        self.backend.set(full_key, (value, time.time()), policy.ttl + policy.stale_ttl)
+
+    async def _astore(self, source, full_key, value):
+        if not self.backend.blocking:
+            self._store(source, full_key, value)
+        else:
+            await asyncio.to_thread(self._store, source, full_key, value)
+
+    def peek(self, source, key):
+        """Fresh cached value or None, counted as a hit / miss. For callers that batch their own misses."""
+        value, state = self._lookup(source, f"{source}:{key}")
+        self._count(source, "hits" if state == "fresh" else "misses")
+        return value if state == "fresh" else None
+
+    def put(self, source, key, value):
+        self._store(source, f"{source}:{key}", value)
+
+    async def aput(self, source, key, value):
+        await self._astore(source, f"{source}:{key}", value)
+
+    def invalidate(self, source, key):
+        self.backend.delete(f"{source}:{key}")
+
+    # --- Async API (FastAPI handlers) ---
+    async def aget_or_fetch(self, source, key, fetch):
+        """
+        Returns the cached value for (source, key), calling `await fetch()` on a miss.
+        Exceptions from `fetch` are propagated to every waiting caller and never cached.
+        """
+        full_key = f"{source}:{key}"
+        value, state = await self._alookup(source, full_key)
+        if state == "fresh":
+            self._count(source, "hits")
+            return value
+        if state == "stale":
+            self._count(source, "stale_hits")
+            if full_key not in self._refreshing:
+                self._refreshing.add(full_key)
+                self._spawn(self._refresh_async(source, full_key, fetch))
+            return value
+
+        inflight = self._async_inflight.get(full_key)
+        if inflight is not None:
+            self._count(source, "coalesced")
+            return await asyncio.shield(inflight)
+
+        # The fetch runs in its own task: a cancelled caller (the first one included) stops waiting,
+        # but the upstream call finishes for everyone else and is still cached
+        self._count(source, "misses")
+        task = self._spawn(self._fetch_shared(source, full_key, fetch))
+        self._async_inflight[full_key] = task
+        return await asyncio.shield(task)
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled():
+            task.exception()  # retrieved here, so a failure nobody waits for any more is not logged as "never retrieved"
+
+    async def _fetch_shared(self, source, full_key, fetch):
+        try:
+            value = await fetch()
+            await self._astore(source, full_key, value)
+            return value
+        except Exception:
+            self._count(source, "errors")
+            raise
+        finally:
+            self._async_inflight.pop(full_key, None)
+
+    async def _refresh_async(self, source, full_key, fetch):
+        try:
+            await self._astore(source, full_key, await fetch())
+            self._count(source, "refreshes")
+        except Exception as e:
+            self._count(source, "errors")
+            print(f"WARN: Background refresh of '{full_key}' failed: {e}", file=sys.stderr)
+        finally:
+            self._refreshing.discard(full_key)
+
+    # --- Sync API (plain functions / worker threads) ---
+    def get_or_fetch(self, source, key, fetch):
+        full_key = f"{source}:{key}"
+        value, state = self._lookup(source, full_key)
+        if state == "fresh":
+            self._count(source, "hits")
+            return value
+        if state == "stale":
+            self._count(source, "stale_hits")
+            with self._sync_lock:
+                start_refresh = full_key not in self._refreshing
+                self._refreshing.add(full_key)
+            if start_refresh:
+                threading.Thread(target=self._refresh_sync, args=(source, full_key, fetch), daemon=True).start()
+            return value
+
+        with self._sync_lock:
+            inflight = self._sync_inflight.get(full_key)
+            leader = inflight is None
+            if leader:
+                inflight = (threading.Event(), {})
+                self._sync_inflight[full_key] = inflight
+        done, holder = inflight
+
+        if not leader:
+            self._count(source, "coalesced")
+            done.wait()
+            if "error" in holder:
+                raise holder["error"]
+            return holder["value"]
+
+        self._count(source, "misses")
+        try:
+            value = fetch()
+            self._store(source, full_key, value)
+            holder["value"] = value
+            return value
+        except Exception as e:
+            self._count(source, "errors")
+            holder["error"] = e
+            raise
+        finally:
+            with self._sync_lock:
+                self._sync_inflight.pop(full_key, None)
+            done.set()
+
+    def _refresh_sync(self, source, full_key, fetch):
+        try:
+            self._store(source, full_key, fetch())
+            self._count(source, "refreshes")
+        except Exception as e:
+            self._count(source, "errors")
+            print(f"WARN: Background refresh of '{full_key}' failed: {e}", file=sys.stderr)
+        finally:
+            with self._sync_lock:
+                self._refreshing.discard(full_key)
+
+
+def build_default_cache():
+    """In-process LRU by default; Redis when CACHE_REDIS_URL is set and the redis package is installed."""
+    redis_url = os.getenv("CACHE_REDIS_URL")
+    if redis_url:
+        try:
+            import redis
+            return ResponseCache(RedisBackend(redis.Redis.from_url(redis_url)))
+        except ImportError:
+            print("WARN: CACHE_REDIS_URL is set but the 'redis' package is not installed. Using in-process cache.", file=sys.stderr)
+    return ResponseCache(MemoryBackend(max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "2048"))))
+
+
+response_cache = build_default_cache()
@@ -0,0 +1,186 @@
+# backend/climate_normals.py
+#
+# Monthly climate normals (mean temperature, total rainfall) for every city in city_data.json.
+# The table is built once at import: each city gets an inverse-distance-weighted blend of its
+# CLIMATE_NEIGHBOURS nearest reference stations below, stored as (cities, 12) arrays with a name index,
+# so a lookup is a dict hit plus two array reads.
+# Reference values are approximate IMD 1981-2010 station normals (deg C, mm per month). There is no
+# elevation correction, so the hill, North-East and island stations are there to keep those regions from being
+# blended out of the plains; a city whose nearest station is over CLIMATE_LOW_CONFIDENCE_KM away is marked
+# "low" confidence. Unknown locations get DEFAULT_CLIMATE instead of an error.
+
+import os
+
+import numpy as np
+
+from backend.risk_analyzer import CITY_DATA, CITY_INDEX, EARTH_RADIUS_KM, normalize_city_name
+
+CLIMATE_NEIGHBOURS = int(os.getenv("CLIMATE_NEIGHBOURS", "3"))
+CLIMATE_LOW_CONFIDENCE_KM = float(os.getenv("CLIMATE_LOW_CONFIDENCE_KM", "200"))
+DEFAULT_CLIMATE = {"avg_temp": 25.0, "avg_rainfall": 80.0}
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june",
+               "july", "august", "september", "october", "november", "december"]
+
+# station: (lat, lon, monthly mean temperature Jan..Dec, monthly rainfall Jan..Dec)
+REFERENCE_NORMALS = {
+    "Delhi": (28.61, 77.21, [14.3, 17.3, 22.9, 29.0, 32.8, 33.4, 31.4, 30.3, 29.5, 26.0, 20.4, 15.6],
+              [19, 20, 15, 10, 28, 74, 209, 233, 124, 15, 6, 8]),
+    "Mumbai": (19.08, 72.88, [24.4, 25.2, 27.0, 28.7, 30.1, 29.0, 27.6, 27.3, 27.6, 28.6, 27.6, 25.8],
+               [1, 0, 0, 1, 12, 523, 800, 530, 312, 56, 17, 7]),
+    "Kolkata": (22.57, 88.36, [20.0, 23.0, 27.6, 30.4, 31.0, 30.3, 29.2, 29.1, 29.1, 27.9, 24.4, 20.6],
+                [11, 22, 32, 51, 135, 294, 367, 346, 328, 165, 27, 7]),
+    "Chennai": (13.08, 80.27, [24.9, 26.1, 28.2, 30.6, 32.6, 32.0, 30.9, 30.2, 29.8, 28.1, 26.3, 25.1],
+                [25, 4, 4, 15, 48, 47, 97, 145, 138, 286, 404, 174]),
+    "Bengaluru": (12.97, 77.59, [21.3, 23.5, 26.0, 27.4, 26.8, 24.3, 23.3, 23.3, 23.5, 23.3, 21.9, 20.7],
+                  [2, 7, 15, 46, 120, 80, 110, 137, 195, 180, 65, 22]),
+    "Hyderabad": (17.39, 78.49, [22.6, 25.3, 28.9, 31.8, 33.4, 29.2, 26.8, 26.0, 26.3, 25.8, 23.4, 21.9],
+                  [9, 9, 14, 22, 30, 108, 165, 200, 168, 104, 27, 6]),
+    "Ahmedabad": (23.02, 72.57, [20.5, 23.0, 27.7, 31.7, 33.7, 32.2, 29.1, 28.0, 28.8, 28.1, 24.5, 21.3],
+                  [2, 1, 1, 2, 6, 98, 278, 222, 117, 17, 8, 2]),
+    "Jaipur": (26.91, 75.79, [15.9, 18.8, 24.6, 30.1, 33.9, 33.6, 30.8, 29.2, 29.2, 26.5, 21.1, 17.0],
+               [8, 8, 6, 4, 14, 63, 223, 226, 87, 14, 4, 4]),
+    "Jodhpur": (26.24, 73.02, [17.0, 20.0, 25.5, 30.5, 33.9, 33.6, 30.8, 28.9, 29.1, 27.3, 22.4, 18.4],
+                [3, 3, 2, 3, 10, 35, 120, 145, 55, 8, 2, 1]),
+    "Lucknow": (26.85, 80.95, [15.9, 19.2, 25.0, 30.7, 33.5, 33.1, 29.9, 29.2, 28.8, 25.9, 20.7, 16.5],
+                [17, 17, 9, 6, 12, 112, 304, 292, 188, 34, 6, 8]),
+    "Patna": (25.59, 85.14, [16.7, 19.8, 25.3, 30.0, 31.4, 31.3, 29.6, 29.3, 29.1, 27.1, 22.3, 17.8],
+              [15, 14, 10, 10, 44, 152, 316, 276, 225, 81, 7, 4]),
+    "Bhopal": (23.26, 77.41, [18.6, 21.3, 25.8, 30.4, 33.6, 30.5, 26.8, 25.7, 26.1, 25.0, 21.4, 18.8],
+               [11, 8, 7, 4, 13, 137, 388, 330, 205, 38, 14, 6]),
+    "Nagpur": (21.15, 79.09, [21.4, 24.0, 28.2, 32.5, 35.3, 31.8, 27.6, 26.9, 27.5, 26.7, 23.5, 20.8],
+               [12, 14, 18, 9, 17, 170, 320, 290, 180, 60, 13, 12]),
+    "Pune": (18.52, 73.86, [20.8, 22.6, 26.3, 29.2, 29.7, 27.1, 25.1, 24.4, 24.7, 25.1, 22.6, 20.6],
+             [2, 0, 3, 16, 35, 140, 187, 130, 130, 80, 30, 6]),
+    "Panaji": (15.49, 73.83, [25.9, 26.3, 27.6, 29.1, 30.0, 27.8, 26.8, 26.7, 27.0, 27.8, 27.6, 26.6],
+               [1, 0, 1, 5, 80, 870, 1000, 600, 280, 130, 35, 10]),
+    "Thiruvananthapuram": (8.52, 76.94, [26.7, 27.4, 28.5, 28.9, 28.6, 26.9, 26.3, 26.5, 26.9, 27.0, 26.8, 26.7],
+                           [20, 21, 37, 120, 230, 330, 220, 150, 190, 280, 210, 70]),
+    "Kochi": (9.93, 76.27, [27.3, 27.9, 28.8, 29.1, 28.9, 26.9, 26.3, 26.4, 26.9, 27.1, 27.2, 27.2],
+              [20, 30, 45, 125, 290, 670, 580, 390, 290, 330, 170, 40]),
+    "Madurai": (9.93, 78.12, [26.0, 27.5, 29.8, 31.3, 31.6, 30.8, 30.2, 29.8, 29.4, 28.2, 26.7, 25.9],
+                [15, 12, 20, 75, 75, 35, 50, 110, 130, 185, 160, 50]),
+    "Visakhapatnam": (17.69, 83.22, [23.8, 25.4, 27.9, 30.0, 31.4, 31.0, 29.6, 29.5, 29.2, 28.1, 25.9, 23.9],
+                      [7, 11, 7, 22, 57, 95, 130, 135, 185, 230, 80, 10]),
+    "Bhubaneswar": (20.30, 85.82, [22.4, 25.3, 28.9, 31.2, 32.0, 30.5, 28.6, 28.4, 28.5, 27.5, 24.7, 22.0],
+                    [13, 25, 28, 25, 65, 215, 305, 345, 265, 165, 35, 5]),
+    "Raipur": (21.25, 81.63, [21.0, 23.8, 28.5, 32.9, 35.3, 31.5, 27.4, 27.0, 27.6, 26.4, 22.8, 20.1],
+               [10, 12, 15, 10, 15, 190, 380, 350, 220, 55, 10, 5]),
+    "Ranchi": (23.34, 85.31, [17.3, 20.2, 25.0, 29.2, 30.7, 28.6, 25.8, 25.5, 25.4, 24.0, 20.4, 17.5],
+               [18, 25, 22, 18, 52, 230, 330, 310, 240, 85, 12, 7]),
+    "Guwahati": (26.14, 91.74, [17.1, 19.4, 23.6, 26.3, 27.7, 28.9, 29.3, 29.3, 28.6, 26.3, 22.1, 18.3],
+                 [9, 17, 62, 153, 258, 322, 339, 263, 173, 84, 15, 6]),
+    "Ludhiana": (30.90, 75.85, [12.9, 15.6, 20.6, 26.8, 31.6, 32.8, 30.9, 30.2, 29.4, 25.3, 19.0, 14.1],
+                 [27, 36, 30, 12, 20, 70, 215, 170, 100, 10, 5, 15]),
+    "Chandigarh": (30.73, 76.78, [13.6, 16.3, 21.0, 26.6, 31.1, 32.2, 30.1, 29.3, 28.6, 25.3, 19.7, 15.0],
+                   [43, 38, 36, 12, 28, 140, 280, 310, 150, 20, 5, 20]),
+    "Varanasi": (25.32, 82.97, [16.5, 19.6, 25.4, 31.1, 33.6, 33.0, 29.8, 29.2, 28.9, 26.4, 21.4, 17.5],
+                 [19, 16, 10, 5, 10, 110, 310, 290, 230, 40, 10, 4]),
+    "Indore": (22.72, 75.86, [18.4, 20.7, 25.0, 29.3, 31.6, 28.9, 25.8, 24.6, 25.3, 24.9, 21.5, 18.9],
+               [5, 3, 2, 2, 10, 140, 300, 290, 180, 40, 15, 5]),
+    "Amritsar": (31.63, 74.87, [12.4, 15.4, 20.6, 26.5, 31.4, 32.8, 30.7, 30.1, 29.1, 24.8, 18.8, 13.6],
+                 [26, 33, 35, 15, 17, 65, 215, 175, 85, 15, 4, 12]),
+    "Dehradun": (30.32, 78.03, [13.2, 15.6, 19.9, 24.7, 28.0, 28.6, 26.4, 25.9, 25.1, 21.9, 17.4, 14.2],
+                 [47, 55, 52, 22, 54, 230, 630, 620, 290, 45, 8, 16]),
+    "Shimla": (31.10, 77.17, [5.4, 6.8, 10.6, 15.0, 18.3, 19.3, 18.3, 17.8, 16.7, 13.9, 10.5, 7.5],
+               [55, 60, 65, 45, 60, 160, 410, 400, 160, 40, 10, 25]),
+    "Srinagar": (34.08, 74.80, [1.3, 3.8, 8.7, 13.7, 17.8, 21.9, 24.4, 23.9, 19.8, 13.3, 7.2, 2.9],
+                 [58, 72, 107, 92, 63, 35, 58, 58, 31, 28, 22, 35]),
+    "Leh": (34.16, 77.58, [-7.2, -4.8, 0.5, 6.3, 10.3, 14.4, 17.6, 17.2, 13.0, 6.7, 1.1, -4.6],
+            [10, 8, 11, 7, 6, 4, 16, 20, 12, 5, 2, 5]),
+    "Darjeeling": (27.04, 88.27, [5.7, 7.0, 10.6, 13.9, 15.5, 16.8, 17.4, 17.3, 16.4, 14.0, 10.2, 7.2],
+                   [20, 25, 50, 105, 215, 570, 720, 550, 400, 120, 15, 5]),
+    "Gangtok": (27.34, 88.61, [8.9, 10.5, 14.0, 17.0, 18.8, 20.2, 20.6, 20.6, 19.6, 17.1, 13.4, 10.1],
+                [40, 60, 110, 250, 500, 600, 650, 570, 420, 170, 35, 20]),
+    "Shillong": (25.57, 91.88, [9.9, 11.8, 15.9, 18.6, 19.5, 20.7, 21.2, 21.1, 20.3, 17.8, 14.1, 11.0],
+                 [14, 30, 60, 150, 300, 500, 420, 350, 300, 200, 30, 10]),
+    "Kohima": (25.66, 94.11, [11.4, 13.1, 16.7, 19.6, 21.3, 22.5, 23.2, 23.0, 22.2, 19.8, 16.2, 12.8],
+               [20, 35, 60, 140, 200, 350, 380, 350, 280, 140, 30, 10]),
+    "Imphal": (24.82, 93.94, [13.8, 16.5, 20.3, 23.2, 25.1, 26.1, 26.0, 26.1, 25.6, 23.4, 19.1, 14.9],
+               [14, 36, 65, 145, 220, 450, 390, 325, 230, 130, 35, 10]),
+    "Aizawl": (23.73, 92.72, [14.9, 16.6, 20.2, 22.3, 22.8, 23.0, 23.2, 23.3, 23.2, 21.8, 18.7, 15.8],
+               [15, 25, 80, 180, 330, 400, 390, 380, 380, 230, 40, 10]),
+    "Agartala": (23.83, 91.28, [18.5, 21.2, 25.4, 27.6, 28.0, 28.6, 28.7, 28.8, 28.6, 27.3, 23.4, 19.6],
+                 [10, 25, 60, 195, 370, 430, 380, 330, 250, 160, 35, 8]),
+    "Ooty": (11.41, 76.70, [13.0, 14.0, 15.6, 16.8, 16.9, 14.6, 13.7, 14.0, 14.4, 14.5, 13.6, 13.0],
+             [40, 15, 30, 110, 170, 170, 200, 150, 140, 220, 150, 60]),
+    "Port Blair": (11.62, 92.73, [26.5, 26.8, 27.6, 28.6, 28.2, 27.4, 27.1, 27.0, 26.8, 27.0, 27.2, 26.9],
+                   [40, 20, 10, 70, 360, 540, 470, 420, 460, 290, 230, 150]),
+}
+
+# State / UT names -> a representative city, so "Punjab" or "Maharashtra" still resolve
+STATE_CITIES = {
+    "andhra pradesh": "visakhapatnam", "arunachal pradesh": "itanagar", "assam": "guwahati", "bihar": "patna",
+    "chhattisgarh": "raipur", "goa": "panaji", "gujarat": "ahmedabad", "haryana": "gurgaon",
+    "himachal pradesh": "shimla", "jharkhand": "ranchi", "karnataka": "bangalore", "kerala": "kochi",
+    "madhya pradesh": "bhopal", "maharashtra": "mumbai", "manipur": "imphal", "meghalaya": "shillong",
+    "mizoram": "aizawl", "nagaland": "kohima", "odisha": "bhubaneswar", "orissa": "bhubaneswar",
+    "punjab": "ludhiana", "rajasthan": "jaipur", "sikkim": "gangtok", "tamil nadu": "chennai",
+    "telangana": "hyderabad", "tripura": "agartala", "uttar pradesh": "lucknow", "uttarakhand": "dehradun",
+    "west bengal": "kolkata", "jammu and kashmir": "srinagar", "chandigarh": "chandigarh",
+    "puducherry": "puducherry",
+}
+
+
+def parse_month(month):
+    """Month name ("July"), abbreviation ("jul") or number ("7") -> 1..12. Raises ValueError."""
+    text = str(month).strip().lower()
+    if text.isdigit() and 1 <= int(text) <= 12:
+        return int(text)
+    for number, name in enumerate(MONTH_NAMES, start=1):
+        if name == text or (len(text) >= 3 and name.startswith(text)):
+            return number
+    raise ValueError(f"'{month}' is not a recognized month.")
+
+
+class ClimateNormalsTable:
+    """(cities, 12) temperature and rainfall arrays plus normalized-name -> row index."""
+
+    def __init__(self, cities, references=REFERENCE_NORMALS, neighbours=CLIMATE_NEIGHBOURS):
+        ref_lat, ref_lon, ref_temp, ref_rain = (np.array(col, dtype=np.float64) for col in zip(*references.values()))
+        self.names = [city["city"] for city in cities]
+        self.row = {}
+        for i, name in enumerate(self.names):
+            self.row.setdefault(normalize_city_name(name), i)  # duplicate names: first entry wins, as in CityIndex
+
+        lat = np.radians([city["lat"] for city in cities])[:, None]
+        lon = np.radians([city["lon"] for city in cities])[:, None]
+        a = np.sin((np.radians(ref_lat) - lat) / 2) ** 2 + \
+            np.cos(lat) * np.cos(np.radians(ref_lat)) * np.sin((np.radians(ref_lon) - lon) / 2) ** 2
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))           # (cities, references)
+        k = min(neighbours, len(references))
+        nearest = np.argsort(distances, axis=1)[:, :k]
+        weights = 1.0 / np.maximum(np.take_along_axis(distances, nearest, axis=1), 1.0) ** 2
+        weights /= weights.sum(axis=1, keepdims=True)
+        self.temperature = np.einsum("ck,ckm->cm", weights, ref_temp[nearest]).astype(np.float32)
+        self.rainfall = np.einsum("ck,ckm->cm", weights, ref_rain[nearest]).astype(np.float32)
+        self.nearest_km = distances[np.arange(len(cities)), nearest[:, 0]].astype(np.float32)
+
+    def lookup(self, location, month):
+        """
+        Normals for a city (aliases and fuzzy matches as in CITY_INDEX) or state name. Never raises:
+        an unknown location gets DEFAULT_CLIMATE (confidence "default"), an unrecognized month the city's
+        annual means, and a city far from every reference station is marked confidence "low".
+        """
+        key = normalize_city_name(location)
+        city_info = CITY_INDEX.lookup(STATE_CITIES.get(key, key))
+        try:
+            m = parse_month(month) - 1
+        except ValueError:
+            m = None
+        if city_info is None:
+            return {**DEFAULT_CLIMATE, "location": None, "month": MONTH_NAMES[m].capitalize() if m is not None else None,
+                    "confidence": "default"}
+
+        row = self.row[normalize_city_name(city_info["city"])]
+        nearest_km = float(self.nearest_km[row])
+        if m is None:
+            temp, rain = self.temperature[row].mean(), self.rainfall[row].mean()
+        else:
+            temp, rain = self.temperature[row, m], self.rainfall[row, m]
+        return {"avg_temp": round(float(temp), 1), "avg_rainfall": round(float(rain), 1),
+                "location": self.names[row], "month": MONTH_NAMES[m].capitalize() if m is not None else None,
+                "confidence": "low" if m is None or nearest_km > CLIMATE_LOW_CONFIDENCE_KM else "high",
+                "nearest_station_km": round(nearest_km)}
+
+
+CLIMATE_NORMALS = ClimateNormalsTable(CITY_DATA)
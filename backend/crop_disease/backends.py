@@ -0,0 +1,174 @@
+# backend/crop_disease/backends.py
+#
+# Optimized CPU inference backends for the ResNet-50 crop disease model.
+# The backend is picked at startup with CROP_MODEL_BACKEND:
+#   eager        - plain fp32 torchvision model (default)
+#   torchscript  - traced + frozen fp32 graph (fused conv/bn, no Python overhead)
+#   int8-dynamic - dynamic int8 quantization (only the final Linear layer; small win on ResNet)
+#   int8-static  - static int8 quantization (FX graph mode), calibrated on CROP_CALIBRATION_DIR
+#   onnx         - ONNX export executed with onnxruntime (optional dependency)
+#
+# Every backend is a callable: float tensor (N, 3, 224, 224) -> logits tensor (N, num_classes).
+#
+# Accuracy check against the fp32 model on a held-out folder:
+#   python -m backend.crop_disease.backends --backend int8-static \
+#       --calibration-dir samples/calib --holdout-dir samples/holdout
+
+import argparse
+import os
+import time
+
+import torch
+import torch.nn as nn
+
+SUPPORTED_BACKENDS = ("eager", "torchscript", "int8-dynamic", "int8-static", "onnx")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+INPUT_SHAPE = (1, 3, 224, 224)
+
+
+def load_image_folder(folder, preprocess, limit=None):
+    """Reads every image in `folder` (recursively) through `preprocess`. Returns (paths, tensors)."""
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    paths = sorted(paths)[:limit] if limit else sorted(paths)
+    if not paths:
+        raise ValueError(f"No images found in folder: '{folder}'")
+    tensors = []
+    for path in paths:
+        with open(path, "rb") as f:
+            tensors.append(preprocess(f.read()))
+    return paths, tensors
+
+
+# --- Backend builders ---
+def to_torchscript(model):
+    example = torch.zeros(INPUT_SHAPE)
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, example)
+    return torch.jit.freeze(traced)
+
+
+def quantize_dynamic(model):
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model, calibration_tensors, batch_size=8):
+    """Post-training static int8 quantization (FX graph mode), calibrated on real sample images."""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+    example = (torch.zeros(INPUT_SHAPE),)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example)
+    with torch.inference_mode():
+        for i in range(0, len(calibration_tensors), batch_size):
+            prepared(torch.stack(calibration_tensors[i:i + batch_size]))
+    return convert_fx(prepared)
+
+
+class OnnxRuntimeModel:
+    """Runs an exported ONNX graph with onnxruntime, exposing the same tensor-in/tensor-out call."""
+
+    def __init__(self, onnx_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        logits = self.session.run(None, {self.input_name: batch.contiguous().numpy()})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+
+def export_onnx(model, onnx_path):
+    torch.onnx.export(
+        model, torch.zeros(INPUT_SHAPE), onnx_path,
+        input_names=["input"], output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    return onnx_path
+
+
+def build_backend(name, fp32_model, preprocess=None, calibration_dir=None, onnx_path=None, weights_path=None):
+    """Converts the fp32 model into the requested backend. Raises ValueError for bad configuration."""
+    if name not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose one of: {', '.join(SUPPORTED_BACKENDS)}")
+    fp32_model.eval()
+    if name == "eager":
+        return fp32_model
+    if name == "torchscript":
+        return to_torchscript(fp32_model)
+    if name == "int8-dynamic":
+        return quantize_dynamic(fp32_model)
+    if name == "int8-static":
+        if not calibration_dir or preprocess is None:
+            raise ValueError("int8-static needs CROP_CALIBRATION_DIR pointing at sample leaf images.")
+        _, calibration_tensors = load_image_folder(calibration_dir, preprocess, limit=256)
+        return quantize_static(fp32_model, calibration_tensors)
+    # onnx
+    if not onnx_path:
+        raise ValueError("onnx backend needs an onnx_path to export to / load from.")
+    # Re-export whenever the trained weights are newer than the cached ONNX file
+    stale = weights_path and os.path.exists(onnx_path) and os.path.getmtime(onnx_path) < os.path.getmtime(weights_path)
+    if not os.path.exists(onnx_path) or stale:
+        export_onnx(fp32_model, onnx_path)
+    return OnnxRuntimeModel(onnx_path, num_threads=torch.get_num_threads())
+
+
+# --- Accuracy / latency check ---
+def check_accuracy(candidate, reference, tensors, batch_size=16):
+    """
+    Compares a backend with the fp32 reference on the same inputs.
+    Returns top-1 agreement, the largest softmax probability difference and per-image latency of both.
+    """
+    def run(model):
+        outputs, start = [], time.perf_counter()
+        with torch.inference_mode():
+            for i in range(0, len(tensors), batch_size):
+                outputs.append(torch.softmax(model(torch.stack(tensors[i:i + batch_size])), dim=1))
+        return torch.cat(outputs), (time.perf_counter() - start) * 1000 / len(tensors)
+
+    ref_probs, ref_ms = run(reference)
+    cand_probs, cand_ms = run(candidate)
+    agreement = (ref_probs.argmax(1) == cand_probs.argmax(1)).float().mean().item()
+    return {
+        "images": len(tensors),
+        "top1_agreement": round(agreement, 4),
+        "max_prob_diff": round((ref_probs - cand_probs).abs().max().item(), 4),
+        "fp32_ms_per_image": round(ref_ms, 2),
+        "backend_ms_per_image": round(cand_ms, 2),
+    }
+
+
+def main():
+    from backend.crop_disease import predictor
+
+    parser = argparse.ArgumentParser(description="Check an optimized crop disease backend against the fp32 model.")
+    parser.add_argument("--backend", choices=SUPPORTED_BACKENDS, required=True)
+    parser.add_argument("--holdout-dir", required=True, help="Folder of held-out leaf images")
+    parser.add_argument("--calibration-dir", help="Folder of calibration images (int8-static)")
+    args = parser.parse_args()
+
+    reference = predictor.load_model()
+    candidate = build_backend(
+        args.backend, predictor.load_model(), preprocess=predictor.preprocess_image,
+        calibration_dir=args.calibration_dir, onnx_path=predictor.ONNX_PATH, weights_path=predictor.MODEL_PATH,
+    )
+    _, tensors = load_image_folder(args.holdout_dir, predictor.preprocess_image)
+    print(check_accuracy(candidate, reference, tensors))
+
+
+if __name__ == "__main__":
+    main()
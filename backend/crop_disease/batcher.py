@@ -0,0 +1,118 @@
+# backend/crop_disease/batcher.py
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue cannot accept more work."""
+
+
+class MicroBatcher:
+    """
+    Collects single inference requests from many callers into one batch.
+
+    Callers `await submit(item)`; a background worker waits up to `max_wait_ms`
+    for more items (up to `max_batch_size`), runs `runner(items)` once in a
+    worker thread and resolves every caller's future with its own result.
+    `runner` must return one result per item, in the same order.
+    """
+
+    def __init__(self, runner, max_batch_size=16, max_wait_ms=5.0, max_queue_size=256, name="inference"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.runner = runner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.name = name
+        self._queue = None
+        self._worker_task = None
+        self._loop = None
+        # A single thread keeps forward passes serialized; torch parallelizes inside each pass.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-worker")
+
+    # --- Lifecycle ---
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker_task is not None and not self._worker_task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker_task = loop.create_task(self._worker(), name=f"{self.name}-batcher")
+
+    async def stop(self):
+        """Cancels the worker task. Pending callers receive CancelledError."""
+        if self._worker_task is None:
+            return
+        self._worker_task.cancel()
+        try:
+            await self._worker_task
+        except asyncio.CancelledError:
+            pass
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        self._worker_task = None
+
+    # --- Public API ---
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item):
+        """Queues one item and waits for its result."""
+        results = await self.submit_many([item])
+        return results[0]
+
+    async def submit_many(self, items):
+        """Queues several items atomically (all or none) and waits for all results."""
+        self._ensure_started()
+        if self._queue.qsize() + len(items) > self.max_queue_size:
+            raise QueueFullError(
+                f"{self.name} queue is full ({self._queue.qsize()}/{self.max_queue_size} pending)."
+            )
+        futures = []
+        for item in items:
+            future = self._loop.create_future()
+            self._queue.put_nowait((item, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    # --- Worker ---
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Grab whatever is already waiting before sleeping on the queue.
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect_batch()
+            live = [(item, future) for item, future in batch if not future.done()]
+            if not live:
+                continue
+            items = [item for item, _ in live]
+            try:
+                results = await self._loop.run_in_executor(self._executor, self.runner, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} runner returned {len(results)} results for {len(items)} items.")
+            except Exception as e:
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
@@ -1,16 +1,33 @@
 import torch
 import torch.nn as nn
 import torchvision.models as models
-import torchvision.transforms as transforms
-from PIL import Image
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
-import io
 import os
+import sys
+
+from backend.crop_disease.backends import build_backend, check_accuracy, load_image_folder
+from backend.crop_disease.batcher import MicroBatcher
+from backend.crop_disease.soil_head import SOIL_HEAD_PATH, load_soil_head, soil_class_names, soil_type_from_color
+from backend.image_preprocess import INPUT_SIZE, decode_image, normalize_batch, normalize_into
+from backend.lazy import LazyResource
+from backend.metrics import span
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "plant_disease_model.pth")
 CLASS_NAMES_PATH = os.path.join(BASE_DIR, "class_names.json")
+ONNX_PATH = os.path.join(BASE_DIR, "plant_disease_model.onnx")
+
+# Inference backend config (see backends.py)
+MODEL_BACKEND = os.getenv("CROP_MODEL_BACKEND", "eager")
+CALIBRATION_DIR = os.getenv("CROP_CALIBRATION_DIR")
+ACCURACY_CHECK_DIR = os.getenv("CROP_ACCURACY_CHECK_DIR")
+MIN_TOP1_AGREEMENT = float(os.getenv("CROP_MIN_TOP1_AGREEMENT", "0.98"))
+if os.getenv("CROP_TORCH_THREADS"):
+    torch.set_num_threads(int(os.getenv("CROP_TORCH_THREADS")))
 
 # Load class names
 with open(CLASS_NAMES_PATH, "r") as f:
@@ -28,27 +45,191 @@ def load_model():
     model.eval()
     return model
 
-model = load_model()
+class MultiHeadResNet(nn.Module):
+    """
+    One ResNet-50 trunk (up to layer4) shared by several heads; returns every head's logits concatenated on dim 1.
+    The crop disease head is the trained model's own avgpool + fc, so its logits are unchanged.
+    """
+
+    def __init__(self, resnet, extra_heads):
+        super().__init__()
+        self.trunk = nn.Sequential(*list(resnet.children())[:-2])
+        self.heads = nn.ModuleDict({"crop": nn.Sequential(resnet.avgpool, nn.Flatten(1), resnet.fc), **extra_heads})
+
+    def forward(self, x):
+        features = self.trunk(x)
+        return torch.cat([head(features) for head in self.heads.values()], dim=1)
+
+def load_shared_model():
+    """Crop disease ResNet plus the optional soil head (only when trained) on the same trunk. Returns (model, head slices)."""
+    soil = load_soil_head()
+    if soil is None:
+        print(f"WARN: No soil head at {SOIL_HEAD_PATH}; soil types come from the colour heuristic.", file=sys.stderr)
+    model = MultiHeadResNet(load_model(), {"soil": soil} if soil is not None else {}).eval()
+    sizes = {"crop": len(class_names), **({"soil": len(soil_class_names)} if soil is not None else {})}
+    slices, start = {}, 0
+    for name, size in sizes.items():
+        slices[name] = slice(start, start + size)
+        start += size
+    return model, slices
+
+class InferenceRuntime:
+    """The configured backend (a tensor -> concatenated logits callable) and where each head's logits sit."""
+
+    def __init__(self, model, heads):
+        self.model = model
+        self.heads = heads
+
+    def head_only(self, name):
+        return lambda batch: self.model(batch)[:, self.heads[name]]
+
+# Image preprocessing: draft-mode decode + one resize to uint8, then a fused normalize (see backend/image_preprocess.py).
+# Same input contract as the torchvision Resize((224, 224)) / ToTensor / Normalize pipeline the model was trained with.
+def preprocess_image(image_bytes):
+    """Decodes one uploaded image into a normalized (3, 224, 224) tensor. Raises ValueError for unreadable images."""
+    pixels = decode_image(image_bytes)
+    return torch.from_numpy(normalize_into(pixels, np.empty((3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)))
+
+def load_inference_model():
+    """
+    Builds the configured inference backend from the fp32 weights (crop and soil heads in one graph).
+    Falls back to the eager fp32 model if the backend cannot be built or fails the accuracy check.
+    """
+    fp32_model, heads = load_shared_model()
+    fp32 = InferenceRuntime(fp32_model, heads)
+    if MODEL_BACKEND == "eager":
+        return fp32
+    # The exported graph includes the soil head, so it gets its own ONNX file and is re-exported when either weight file changes
+    onnx_path = ONNX_PATH if "soil" not in heads else ONNX_PATH.replace(".onnx", "_soil.onnx")
+    weights_path = max((p for p in (MODEL_PATH, SOIL_HEAD_PATH) if os.path.exists(p)), key=os.path.getmtime)
+    try:
+        optimized = InferenceRuntime(build_backend(
+            MODEL_BACKEND, load_shared_model()[0], preprocess=preprocess_image,
+            calibration_dir=CALIBRATION_DIR, onnx_path=onnx_path, weights_path=weights_path,
+        ), heads)
+    except Exception as e:
+        print(f"WARN: Could not build '{MODEL_BACKEND}' inference backend ({e}). Falling back to eager fp32.")
+        return fp32
+
+    if ACCURACY_CHECK_DIR:
+        _, holdout_tensors = load_image_folder(ACCURACY_CHECK_DIR, preprocess_image)
+        report = check_accuracy(optimized.head_only("crop"), fp32.head_only("crop"), holdout_tensors)
+        print(f"INFO: Accuracy check for '{MODEL_BACKEND}' backend: {report}")
+        if report["top1_agreement"] < MIN_TOP1_AGREEMENT:
+            print(f"WARN: '{MODEL_BACKEND}' agreement below {MIN_TOP1_AGREEMENT}. Falling back to eager fp32.")
+            return fp32
+
+    print(f"INFO: Crop disease model running on the '{MODEL_BACKEND}' backend (heads: {', '.join(heads)}).")
+    return optimized  # the fp32 copy is dropped here, so only one model stays resident
 
-# Define image preprocessing
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406],
-                         [0.229, 0.224, 0.225])
-])
+# Built on first use (or by the app's warm-up hook), not at import time
+crop_model = LazyResource("crop_disease_backend", load_inference_model, register=False)
+
+def predict_proba_batch(items):
+    """
+    Runs one forward pass over (head, decoded uint8 image) items and returns a softmax row per item for its head.
+    Crop and soil photos share the batch, so the trunk runs once for both. The images are normalized into this
+    thread's reusable batch buffer, so no per-request float tensors are kept.
+    """
+    runtime = crop_model.get()
+    batch = torch.from_numpy(normalize_batch([pixels for _, pixels in items]))
+    with span("crop.forward_batch"), torch.inference_mode():
+        logits = runtime.model(batch)
+    return [torch.softmax(logits[i, runtime.heads[head]], dim=0) for i, (head, _) in enumerate(items)]
+
+def top_k_classes(probabilities, k=3):
+    """Converts one softmax row into [{"class": ..., "probability": ...}, ...] sorted by probability."""
+    k = max(1, min(k, len(class_names)))
+    values, indices = probabilities.topk(k)
+    return [
+        {"class": class_names[int(i)], "probability": round(float(v), 4)}
+        for v, i in zip(values, indices)
+    ]
+
+# --- Micro-batching inference queue (configurable via env vars) ---
+batcher = MicroBatcher(
+    predict_proba_batch,
+    max_batch_size=int(os.getenv("CROP_BATCH_MAX_SIZE", "16")),
+    max_wait_ms=float(os.getenv("CROP_BATCH_MAX_WAIT_MS", "5")),
+    max_queue_size=int(os.getenv("CROP_BATCH_MAX_QUEUE", "256")),
+    name="crop-disease",
+)
+
+# Shared pool for decoding multi-image uploads in parallel (PIL releases the GIL while decoding)
+_decode_pool = ThreadPoolExecutor(max_workers=int(os.getenv("CROP_DECODE_WORKERS", "4")), thread_name_prefix="crop-decode")
+
+def _decode_or_error(image_bytes):
+    try:
+        return decode_image(image_bytes), None
+    except ValueError as e:
+        return None, str(e)
+
+async def predict_disease_async(image_bytes):
+    """
+    Event-loop friendly version of predict_disease: decodes the image in a thread,
+    then shares a forward pass with other concurrent requests via the batcher.
+    Raises ValueError for unreadable images and QueueFullError when the inference queue is saturated.
+    """
+    with span("crop.decode"):
+        pixels = await asyncio.get_running_loop().run_in_executor(_decode_pool, decode_image, image_bytes)
+    with span("crop.inference"):  # queueing in the batcher + the shared forward pass
+        probabilities = await batcher.submit(("crop", pixels))
+    return class_names[int(probabilities.argmax())]
+
+def soil_head_installed():
+    """Whether trained soil head weights exist. Without them soil typing never needs the model runtime."""
+    return os.path.exists(SOIL_HEAD_PATH)
+
+async def predict_soil_async(image_bytes):
+    """
+    Soil type of one photo. Uses the colour heuristic (method "color", no confidence) unless trained soil
+    head weights are installed, in which case the head runs through the crop disease batcher (method "cnn").
+    Returns {"soil_type", "confidence", "method"}.
+    """
+    with span("soil.decode"):
+        pixels = await asyncio.get_running_loop().run_in_executor(_decode_pool, decode_image, image_bytes)
+    # The runtime is only loaded for a trained head; it may also predate weights installed after it was built
+    if not soil_head_installed() or "soil" not in (await crop_model.aget()).heads:
+        return {"soil_type": soil_type_from_color(pixels), "confidence": None, "method": "color"}
+    with span("soil.inference"):
+        probabilities = await batcher.submit(("soil", pixels))
+    confidence, index = probabilities.max(dim=0)
+    return {"soil_type": soil_class_names[int(index)], "confidence": round(float(confidence), 4), "method": "cnn"}
+
+async def predict_top_k_async(images, k=3):
+    """
+    Classifies many images in one go.
+    `images` is a list of (filename, image_bytes). Returns one dict per image with the
+    top-k classes, or an error message if that particular image could not be decoded.
+    """
+    loop = asyncio.get_running_loop()
+    with span("crop.decode"):
+        decoded = await asyncio.gather(*[
+            loop.run_in_executor(_decode_pool, _decode_or_error, image_bytes) for _, image_bytes in images
+        ])
+
+    valid_images = [pixels for pixels, _ in decoded if pixels is not None]
+    with span("crop.inference"):
+        probabilities = iter(await batcher.submit_many([("crop", pixels) for pixels in valid_images]) if valid_images else [])
+
+    results = []
+    for (filename, _), (pixels, error) in zip(images, decoded):
+        results.append({
+            "filename": filename,
+            "predictions": top_k_classes(next(probabilities), k) if pixels is not None else [],
+            "error": error,
+        })
+    return results
 
 # Prediction function
 def predict_disease(image_bytes):
-    try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img_tensor = transform(image).unsqueeze(0)  # add batch dimension
+    """Returns the most likely class name for one image. Raises ValueError if the image cannot be read."""
+    with span("crop.decode"):
+        pixels = decode_image(image_bytes)
 
-        with torch.no_grad():
-            outputs = model(img_tensor)
-            _, predicted = outputs.max(1)
-            predicted_class = class_names[predicted.item()]
+    with span("crop.forward"), torch.inference_mode():
+        outputs = crop_model.get().head_only("crop")(torch.from_numpy(normalize_batch([pixels])))
+        _, predicted = outputs.max(1)
+        predicted_class = class_names[predicted.item()]
 
-        return predicted_class
-    except Exception as e:
-        return f"Error during prediction: {str(e)}"
+    return predicted_class
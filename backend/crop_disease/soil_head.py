@@ -0,0 +1,155 @@
+# backend/crop_disease/soil_head.py
+#
+# Soil type for /recommend_crop_from_photo.
+#   - default: soil_type_from_color(), a mean-colour heuristic. No trained soil weights ship with the repo
+#     (there is no labelled soil photo set in it), so this is what every deployment uses out of the box
+#   - optional: a small classifier head on the frozen ResNet-50 feature map of the crop disease model
+#     (2048 x 7 x 7), used only once weights are trained and placed at CROP_SOIL_HEAD_PATH.
+#     predictor.MultiHeadResNet then runs the trunk once per batch with both heads on top
+# The response's "soil_model" says which one answered ("color" or "cnn").
+#
+# Training (only the head; the backbone stays frozen, its features are extracted once). The weights are only
+# written when the held-out accuracy reaches --min-accuracy:
+#   python -m backend.crop_disease.soil_head --data-dir samples/soil [--epochs 30] [--lr 1e-3] [--min-accuracy 0.8]
+# `data-dir` holds one sub-folder per soil type ("black_soil/", "Red Soil/", ...).
+
+import argparse
+import json
+import os
+import random
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from backend.crop_disease.backends import load_image_folder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOIL_HEAD_PATH = os.getenv("CROP_SOIL_HEAD_PATH", os.path.join(BASE_DIR, "soil_head.pth"))
+SOIL_CLASS_NAMES_PATH = os.path.join(BASE_DIR, "soil_class_names.json")
+FEATURE_CHANNELS = 2048  # ResNet-50 layer4
+
+with open(SOIL_CLASS_NAMES_PATH, "r") as f:
+    soil_class_names = json.load(f)
+
+
+def build_soil_head(in_channels=FEATURE_CHANNELS, hidden=128, num_classes=len(soil_class_names)):
+    """1x1 conv bottleneck over the feature map, global pooling, linear classifier (~0.26M parameters)."""
+    return nn.Sequential(
+        nn.Conv2d(in_channels, hidden, kernel_size=1, bias=False),
+        nn.BatchNorm2d(hidden),
+        nn.ReLU(inplace=True),
+        nn.AdaptiveAvgPool2d(1),
+        nn.Flatten(1),
+        nn.Dropout(0.2),
+        nn.Linear(hidden, num_classes),
+    )
+
+
+def load_soil_head(path=SOIL_HEAD_PATH):
+    """Trained head in eval mode, or None when no weights have been trained yet."""
+    if not os.path.exists(path):
+        return None
+    head = build_soil_head()
+    head.load_state_dict(torch.load(path, map_location=torch.device("cpu")))
+    return head.eval()
+
+
+def soil_type_from_color(pixels):
+    """
+    Default soil classifier (no head trained): a colour rule on the decoded (H, W, 3) uint8 photo.
+    Dark -> black (regur), reddish -> red (iron oxides), pale -> alluvial, otherwise clayey.
+    A heuristic, not a trained model: lighting and moisture shift it, so no confidence is reported.
+    """
+    r, g, b = pixels.reshape(-1, 3).mean(axis=0)
+    brightness = (r + g + b) / 3
+    if brightness < 70:
+        return "Black Soil"
+    if r > 1.15 * g and r - b > 40:
+        return "Red Soil"
+    if brightness > 140:
+        return "Alluvial Soil"
+    return "Clayey Soil"
+
+
+# ==============================================================================
+# Training
+# ==============================================================================
+def _class_index(folder_name):
+    key = folder_name.lower().replace("_", " ").replace("-", " ").strip()
+    for i, name in enumerate(soil_class_names):
+        if key in (name.lower(), name.lower().replace(" soil", "")):
+            return i
+    raise ValueError(f"Folder '{folder_name}' does not match a soil class: {', '.join(soil_class_names)}")
+
+
+def extract_features(trunk, tensors, batch_size=16):
+    """Frozen-backbone feature maps, kept as float16 to halve the memory of the cached training set."""
+    features = []
+    with torch.inference_mode():
+        for i in range(0, len(tensors), batch_size):
+            features.append(trunk(torch.stack(tensors[i:i + batch_size])).half())
+    return torch.cat(features)
+
+
+def train(data_dir, epochs=30, lr=1e-3, holdout=0.2, seed=0):
+    from backend.crop_disease import predictor
+
+    random.seed(seed)
+    torch.manual_seed(seed)
+    classes = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    tensors, labels = [], []
+    for folder in classes:
+        label = _class_index(folder)
+        _, folder_tensors = load_image_folder(os.path.join(data_dir, folder), predictor.preprocess_image)
+        tensors += folder_tensors
+        labels += [label] * len(folder_tensors)
+
+    trunk = predictor.MultiHeadResNet(predictor.load_model(), {}).trunk.eval()
+    features = extract_features(trunk, tensors)
+    labels = torch.tensor(labels)
+    order = torch.randperm(len(labels))
+    n_val = int(len(labels) * holdout)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    head = build_soil_head()
+    optimizer = torch.optim.Adam(head.parameters(), lr=lr)
+    loss_fn = nn.CrossEntropyLoss()
+    for _ in range(epochs):
+        head.train()
+        for batch in train_idx[torch.randperm(len(train_idx))].split(32):
+            optimizer.zero_grad()
+            loss = loss_fn(head(features[batch].float()), labels[batch])
+            loss.backward()
+            optimizer.step()
+
+    head.eval()
+    with torch.inference_mode():
+        val_acc = (head(features[val_idx].float()).argmax(1) == labels[val_idx]).float().mean().item() if n_val else None
+    return head, {"images": len(labels), "train": len(train_idx), "holdout": n_val,
+                  "holdout_accuracy": round(val_acc, 4) if val_acc is not None else None,
+                  "per_class": np.bincount(labels.numpy(), minlength=len(soil_class_names)).tolist()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the soil-type head on the frozen crop disease backbone.")
+    parser.add_argument("--data-dir", required=True, help="One sub-folder of photos per soil type")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--min-accuracy", type=float, default=0.8, help="Held-out accuracy required to save the head")
+    parser.add_argument("--output", default=SOIL_HEAD_PATH)
+    args = parser.parse_args()
+
+    head, report = train(args.data_dir, args.epochs, args.lr, args.holdout)
+    accuracy = report["holdout_accuracy"]
+    if accuracy is None or accuracy < args.min_accuracy:
+        # A head worse than the threshold would silently replace the colour rule for every request
+        print(json.dumps({**report, "saved_to": None}, indent=2))
+        raise SystemExit(f"Held-out accuracy {accuracy} is below --min-accuracy {args.min_accuracy}; weights not saved.")
+    torch.save(head.state_dict(), args.output)
+    print(json.dumps({**report, "saved_to": args.output}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# backend/disk_cache.py
+#
+# Size-bounded on-disk LRU for small binary blobs (map tiles).
+# Recency is the file mtime, so the LRU order survives restarts; the in-memory index is rebuilt
+# from the directory on start-up. Writes go to a temp file and are renamed into place.
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class DiskLRU:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # file name -> size, least recently used first
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._bytes += size
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        name = self._name(key)
+        with self._lock:
+            if name not in self._index:
+                self._stats["misses"] += 1
+                return None
+            self._index.move_to_end(name)
+            self._stats["hits"] += 1
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._index.pop(name, 0)
+            return None
+
+    def set(self, key, data: bytes):
+        name = self._name(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except OSError as e:
+            print(f"WARN: Could not write disk cache entry: {e}", file=sys.stderr)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._bytes += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            self._stats["writes"] += 1
+            while self._bytes > self.max_bytes and self._index:
+                victim, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self._stats["evictions"] += 1
+                try:
+                    os.remove(os.path.join(self.directory, victim))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._index), "bytes": self._bytes}
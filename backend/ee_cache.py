@@ -0,0 +1,121 @@
+# backend/ee_cache.py
+#
+# Persistent (SQLite) cache for finished Earth Engine analyses.
+# Keys combine a canonical hash of the GeoJSON geometry, the request parameters (e.g. the date pair)
+# and the algorithm version, so a resubmitted polygon returns in milliseconds and any change to the
+# analysis code invalidates old entries. Entries expire after a TTL; the least recently used
+# ones are evicted once the stored payloads exceed a size budget.
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+COORD_PRECISION = 7  # ~1 cm; removes float noise from re-serialized GeoJSON
+
+
+def _round_coords(value):
+    if isinstance(value, float):
+        return round(value, COORD_PRECISION)
+    if isinstance(value, list):
+        return [_round_coords(v) for v in value]
+    return value
+
+
+def canonical_geometry(geojson):
+    """Reduces Feature / FeatureCollection / Geometry GeoJSON to a stable, minimal geometry dict."""
+    if isinstance(geojson, str):
+        geojson = json.loads(geojson)
+    kind = geojson.get("type")
+    if kind == "Feature":
+        return canonical_geometry(geojson["geometry"])
+    if kind == "FeatureCollection":
+        geometries = [canonical_geometry(f) for f in geojson.get("features", [])]
+        return geometries[0] if len(geometries) == 1 else {"type": "GeometryCollection", "geometries": geometries}
+    if kind == "GeometryCollection":
+        return {"type": kind, "geometries": [canonical_geometry(g) for g in geojson.get("geometries", [])]}
+    return {"type": kind, "coordinates": _round_coords(geojson.get("coordinates"))}
+
+
+def geometry_hash(geojson):
+    canonical = json.dumps(canonical_geometry(geojson), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def make_key(geojson, *params, version):
+    return ":".join([geometry_hash(geojson), *map(str, params), f"v{version}"])
+
+
+class ResultCache:
+    def __init__(self, path, ttl_seconds=6 * 3600, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._stats["hits"] += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._stats["writes"] += 1
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._conn.execute("SELECT key, size FROM results ORDER BY last_access LIMIT 1").fetchone()
+            if oldest is None:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (oldest[0],))
+            total -= oldest[1]
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            return {**self._stats, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+
+analysis_cache = ResultCache(
+    os.getenv("EE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "bitclimate_ee_results.sqlite")),
+    ttl_seconds=float(os.getenv("EE_CACHE_TTL_SECONDS", str(6 * 3600))),
+    max_bytes=int(os.getenv("EE_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+)
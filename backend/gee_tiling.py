@@ -0,0 +1,360 @@
+# backend/gee_tiling.py
+#
+# Large-region mode for the deforestation analysis.
+# One reduceRegion over a district-sized polygon at 30 m either exceeds maxPixels or times out,
+# so the region is cut into a grid of tiles whose sums are reduced concurrently and added up.
+#   - only tiles that overlap the polygon are reduced (checked locally, no EE round trips)
+#   - tiles run on a bounded thread pool, each retried with exponential backoff + full jitter
+#   - regions above EE_EXPORT_REGION_HA skip interactive mode: an ee.batch.Export writes the sums to a temporary
+#     table asset, the job polls the task and reads the asset back, so both modes return the same result.
+#     An export that times out (or whose job fails) is cancelled, and the asset is always deleted
+#   - runs as a background job (backend/jobs.py); tile progress is reported through the job record
+
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import ee
+import numpy as np
+
+from backend.ee_cache import analysis_cache, canonical_geometry, make_key
+from backend.gee_utils import (
+    ALGORITHM_VERSION, GCP_PROJECT_ID, NO_IMAGERY_MESSAGE, PhaseTimer, area_sums, build_analysis, earth_engine,
+    has_imagery, stats_from_sums, thumbnail_urls,
+)
+
+TILE_DEG = float(os.getenv("EE_TILE_DEG", "0.1"))              # ~11 km tiles, well under maxPixels at 30 m
+TILE_WORKERS = int(os.getenv("EE_TILE_WORKERS", "8"))          # concurrent EE requests per analysis
+TILE_RETRIES = int(os.getenv("EE_TILE_RETRIES", "3"))
+TILE_BACKOFF_BASE = float(os.getenv("EE_TILE_BACKOFF_BASE", "1.0"))
+EXPORT_REGION_HA = float(os.getenv("EE_EXPORT_REGION_HA", "1000000"))  # 10,000 km2
+EXPORT_ASSET_ROOT = os.getenv("EE_EXPORT_ASSET_ROOT", f"projects/{GCP_PROJECT_ID}/assets")  # temporary result tables
+EXPORT_POLL_SECONDS = float(os.getenv("EE_EXPORT_POLL_SECONDS", "30"))
+EXPORT_TIMEOUT_SECONDS = float(os.getenv("EE_EXPORT_TIMEOUT_SECONDS", str(6 * 3600)))
+EXPORT_FAILED_STATES = ("FAILED", "CANCELLED", "CANCEL_REQUESTED")
+EARTH_RADIUS_M = 6378137.0
+
+
+# ==============================================================================
+# Local geometry helpers (no EE round trips)
+# ==============================================================================
+def _polygons(geometry):
+    kind = geometry["type"]
+    if kind == "Polygon":
+        return [geometry["coordinates"]]
+    if kind == "MultiPolygon":
+        return geometry["coordinates"]
+    if kind == "GeometryCollection":
+        return [poly for g in geometry["geometries"] for poly in _polygons(g)]
+    raise ValueError(f"Large-region analysis needs a Polygon or MultiPolygon, got {kind}.")
+
+
+def _ring_area_m2(ring):
+    """Spherical ring area (same approximation as geojson-area / turf)."""
+    total = 0.0
+    n = len(ring)
+    if n < 3:
+        return 0.0
+    for i in range(n):
+        lon1, _ = ring[i][:2]
+        _, lat2 = ring[(i + 1) % n][:2]
+        lon3, _ = ring[(i + 2) % n][:2]
+        total += (math.radians(lon3) - math.radians(lon1)) * math.sin(math.radians(lat2))
+    return abs(total * EARTH_RADIUS_M ** 2 / 2)
+
+
+def geojson_area_ha(geojson):
+    polygons = _polygons(canonical_geometry(geojson))
+    m2 = sum(_ring_area_m2(rings[0]) - sum(_ring_area_m2(hole) for hole in rings[1:]) for rings in polygons)
+    return m2 / 10000
+
+
+def geojson_bbox(geojson):
+    points = [pt for rings in _polygons(canonical_geometry(geojson)) for ring in rings for pt in ring]
+    lons = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def tile_grid(bbox, tile_deg=TILE_DEG):
+    """Splits (west, south, east, north) into tile_deg x tile_deg rectangles (edge tiles are smaller)."""
+    west, south, east, north = bbox
+    rows = max(1, math.ceil((north - south) / tile_deg - 1e-9))
+    cols = max(1, math.ceil((east - west) / tile_deg - 1e-9))
+    tiles = []
+    for i in range(rows):
+        for j in range(cols):
+            tiles.append((
+                west + j * tile_deg, south + i * tile_deg,
+                min(west + (j + 1) * tile_deg, east), min(south + (i + 1) * tile_deg, north),
+            ))
+    return tiles
+
+
+def _segment_hits_rect(x1, y1, x2, y2, rect):
+    """Liang-Barsky clip: True if the segment touches the (west, south, east, north) rectangle."""
+    west, south, east, north = rect
+    dx, dy = x2 - x1, y2 - y1
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x1 - west), (dx, east - x1), (-dy, y1 - south), (dy, north - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+    return True
+
+
+def tiles_touching(geojson, tiles):
+    """
+    The tiles that overlap the polygon: one of its edges crosses the tile, or the tile lies inside it.
+    Conservative (a tile inside a hole is kept; its EE sum is simply 0), never drops a tile that overlaps.
+    """
+    polygons = _polygons(canonical_geometry(geojson))
+    x1, y1, x2, y2 = (np.array(col, dtype=np.float64) for col in zip(*[
+        (a[0], a[1], b[0], b[1]) for rings in polygons for ring in rings for a, b in zip(ring, ring[1:] + ring[:1])
+    ]))
+    outer = [np.array([pt[:2] for pt in rings[0]], dtype=np.float64) for rings in polygons]
+
+    def inside(x, y):
+        for ring in outer:
+            xs, ys = ring[:, 0], ring[:, 1]
+            xn, yn = np.roll(xs, -1), np.roll(ys, -1)
+            crosses = (ys > y) != (yn > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                at = xs + (y - ys) * (xn - xs) / (yn - ys)
+            if np.count_nonzero(crosses & (x < at)) % 2:
+                return True
+        return False
+
+    keep = []
+    for tile in tiles:
+        west, south, east, north = tile
+        near = np.nonzero((np.maximum(x1, x2) >= west) & (np.minimum(x1, x2) <= east) &
+                          (np.maximum(y1, y2) >= south) & (np.minimum(y1, y2) <= north))[0]
+        if any(_segment_hits_rect(x1[i], y1[i], x2[i], y2[i], tile) for i in near) or \
+                inside((west + east) / 2, (south + north) / 2):
+            keep.append(tile)
+    return keep
+
+
+# ==============================================================================
+# Tiled reduction
+# ==============================================================================
+def _reduce_tile(analysis, region, tile):
+    """Sums one tile, retrying transient EE failures (rate limits, timeouts) with backoff."""
+    geometry = region.intersection(ee.Geometry.Rectangle(list(tile), None, False), ee.ErrorMargin(1))
+    for attempt in range(TILE_RETRIES + 1):
+        try:
+            return area_sums(analysis, geometry).getInfo() or {}
+        except ee.EEException as e:
+            if attempt == TILE_RETRIES:
+                raise
+            delay = random.uniform(0, TILE_BACKOFF_BASE * (2 ** attempt))
+            print(f"WARN: Tile {tile} failed ({e}); retry {attempt + 1}/{TILE_RETRIES} in {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
+
+
+def analyze_area_tiled(geojson, start_date_str, end_date_str, progress=None, tile_deg=TILE_DEG):
+    """
+    Same result as gee_utils.analyze_area, computed tile by tile.
+    `progress(done, total)` is called after every finished tile.
+    """
+    print(f"INFO: Tiled analysis for dates: {start_date_str} to {end_date_str}")
+    earth_engine.get()
+    timer = PhaseTimer(prefix="analyze_area_tiled")
+    tiles = []
+    try:
+        with timer.phase("build"):
+            region = ee.Geometry(geojson)
+            analysis = build_analysis(region, start_date_str, end_date_str)
+            tiles = tiles_touching(geojson, tile_grid(geojson_bbox(geojson), tile_deg))
+
+        with timer.phase("sizes"):
+            summary = ee.Dictionary({
+                "start_size": analysis["start_size"],
+                "end_size": analysis["end_size"],
+                "has_imagery": has_imagery(analysis),
+                "bounds": region.bounds(maxError=1).coordinates(),
+            }).getInfo()
+            timer.trip()
+        if not summary["has_imagery"]:
+            raise ValueError(NO_IMAGERY_MESSAGE)
+
+        deforested = initial_forest = 0.0
+        with timer.phase("tiles"), ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix="ee-tile") as pool:
+            futures = [pool.submit(_reduce_tile, analysis, region, tile) for tile in tiles]
+            for done, future in enumerate(as_completed(futures), start=1):
+                sums = future.result()
+                deforested += sums.get("deforested") or 0
+                initial_forest += sums.get("initial_forest") or 0
+                timer.trip()
+                if progress:
+                    progress(done, len(tiles))
+
+        final_stats = stats_from_sums(deforested, initial_forest)
+        print("INFO: Analysis Stats:", final_stats)
+
+        with timer.phase("thumbnails"):
+            start_map_url, end_map_with_overlay_url = thumbnail_urls(analysis, summary["bounds"])
+            timer.trip(2)
+        return start_map_url, end_map_with_overlay_url, final_stats
+    except ee.EEException as e:
+        print(f"ERROR: Earth Engine error during tiled analysis: {e}", file=sys.stderr)
+        raise ValueError("Earth Engine analysis failed for one or more tiles. Please try again later.")
+    finally:
+        print(f"INFO: analyze_area_tiled timings: {timer.summary()} over {len(tiles)} tiles")
+
+
+# ==============================================================================
+# Export fallback for regions too big for interactive use
+# ==============================================================================
+def start_export(analysis, region, start_date_str, end_date_str, description):
+    """Starts an ee.batch.Export of the area sums into a one-feature table asset. Returns (task, asset_id)."""
+    sums = area_sums(analysis, region, max_pixels=1e13)
+    table = ee.FeatureCollection([ee.Feature(None, sums.set("start_date", start_date_str).set("end_date", end_date_str))])
+    asset_id = f"{EXPORT_ASSET_ROOT}/{description}"
+    task = ee.batch.Export.table.toAsset(collection=table, description=description, assetId=asset_id)
+    task.start()
+    return task, asset_id
+
+
+def wait_for_export(task_id, poll_seconds, timeout_seconds):
+    """Polls the task until it completes. Raises ValueError if it fails, is cancelled or runs past the timeout."""
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        status = export_status(task_id)
+        state = status.get("state")
+        if state == "COMPLETED":
+            return status
+        if state in EXPORT_FAILED_STATES:
+            raise ValueError(f"Earth Engine export {task_id} ended as {state}: {status.get('error_message', 'no details')}")
+        if time.monotonic() > deadline:
+            raise ValueError(f"Earth Engine export {task_id} did not finish within {timeout_seconds:.0f}s (last state {state}).")
+        time.sleep(poll_seconds)
+
+
+def read_export(asset_id):
+    """The exported sums in one getInfo."""
+    return ee.FeatureCollection(asset_id).first().toDictionary().getInfo() or {}
+
+
+def cancel_export(task_id):
+    """Cancels a task that is still queued or running, so an abandoned export stops using EE quota."""
+    try:
+        if export_status(task_id).get("state") in ("COMPLETED", *EXPORT_FAILED_STATES):
+            return
+        ee.data.cancelTask(task_id)
+        print(f"INFO: Cancelled export task {task_id}")
+    except Exception as e:
+        print(f"WARN: Could not cancel export task {task_id}: {e}", file=sys.stderr)
+
+
+def delete_export_asset(asset_id, must_exist=True):
+    try:
+        ee.data.deleteAsset(asset_id)
+    except Exception as e:
+        if must_exist:  # an export that never completed may not have written it
+            print(f"WARN: Could not delete export asset {asset_id}: {e}", file=sys.stderr)
+
+
+def analyze_area_export(geojson, start_date_str, end_date_str, progress=None):
+    """
+    Same result as analyze_area_tiled for regions too big for interactive requests.
+    `progress(done, total)` reports (0, 1) once the export is running and (1, 1) when it has been read back.
+    """
+    print(f"INFO: Export analysis for dates: {start_date_str} to {end_date_str}")
+    earth_engine.get()
+    region = ee.Geometry(geojson)
+    analysis = build_analysis(region, start_date_str, end_date_str)
+    try:
+        # Imagery check and thumbnail bounds first, so a range without imagery never starts an export
+        summary = ee.Dictionary({
+            "has_imagery": has_imagery(analysis),
+            "bounds": region.bounds(maxError=1).coordinates(),
+        }).getInfo()
+        if not summary["has_imagery"]:
+            raise ValueError(NO_IMAGERY_MESSAGE)
+
+        task, asset_id = start_export(analysis, region, start_date_str, end_date_str, f"deforestation_{uuid.uuid4().hex[:12]}")
+        print(f"INFO: Started export task {task.id} -> {asset_id}")
+        if progress:
+            progress(0, 1)
+        completed = False
+        try:
+            wait_for_export(task.id, EXPORT_POLL_SECONDS, EXPORT_TIMEOUT_SECONDS)
+            completed = True
+            sums = read_export(asset_id)
+        except BaseException:
+            if not completed:
+                cancel_export(task.id)  # timed out, or this job failed / stopped while the export was running
+            raise
+        finally:
+            delete_export_asset(asset_id, must_exist=completed)
+        if progress:
+            progress(1, 1)
+
+        final_stats = stats_from_sums(sums.get("deforested"), sums.get("initial_forest"))
+        print("INFO: Analysis Stats:", final_stats)
+        start_map_url, end_map_with_overlay_url = thumbnail_urls(analysis, summary["bounds"])
+        return start_map_url, end_map_with_overlay_url, final_stats, task.id
+    except ee.EEException as e:
+        print(f"ERROR: Earth Engine error during export analysis: {e}", file=sys.stderr)
+        raise ValueError("Earth Engine export analysis failed. Please try again later.")
+
+
+# ==============================================================================
+# Job entry points (run through backend/jobs.py)
+# ==============================================================================
+def plan_large_analysis(geojson, start_date_str, end_date_str):
+    """Validates the request locally and returns {mode, area_ha, tiles} without touching EE."""
+    for value in (start_date_str, end_date_str):
+        datetime.strptime(value, '%Y-%m-%d')  # fail the request now, not the job later
+    area_ha = geojson_area_ha(geojson)
+    return {
+        "mode": "export" if area_ha > EXPORT_REGION_HA else "tiled",
+        "area_ha": round(area_ha, 2),
+        "tiles": len(tiles_touching(geojson, tile_grid(geojson_bbox(geojson)))),
+    }
+
+
+def run_large_analysis(geojson, start_date, end_date, progress=None):
+    """
+    Job task: tiled analysis up to EXPORT_REGION_HA, an ee.batch.Export above it (the job waits for the
+    export and merges its sums, so both modes return the same fields). Results go through the EE result cache.
+    """
+    plan = plan_large_analysis(geojson, start_date, end_date)
+    cache_key = make_key(geojson, start_date, end_date, version=ALGORITHM_VERSION)
+    cached = analysis_cache.get(cache_key)
+    extra = {}
+    if cached is not None:
+        start_map, end_map_overlay, stats = cached
+    else:
+        if plan["mode"] == "export":
+            print(f"INFO: Region of {plan['area_ha']} ha exceeds {EXPORT_REGION_HA} ha; using an export task")
+            start_map, end_map_overlay, stats, task_id = analyze_area_export(geojson, start_date, end_date, progress=progress)
+            extra = {"export_task_id": task_id}
+        else:
+            start_map, end_map_overlay, stats = analyze_area_tiled(geojson, start_date, end_date, progress=progress)
+        analysis_cache.set(cache_key, [start_map, end_map_overlay, stats])
+    return {**plan, **extra, "start_map": start_map, "end_map_overlay": end_map_overlay, "stats": stats}
+
+
+def export_status(task_id):
+    earth_engine.get()
+    try:
+        info = ee.data.getTaskStatus(task_id)[0]
+    except Exception as e:
+        return {"state": "UNKNOWN", "error": str(e)}
+    return {key: info[key] for key in ("id", "state", "description", "error_message", "destination_uris") if key in info}
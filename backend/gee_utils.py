@@ -3,212 +3,316 @@
 import ee
 import os
 import sys # For better error output
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from google.oauth2 import service_account
 from google.auth import exceptions as google_auth_exceptions
 from datetime import datetime, timedelta
 
+from backend.lazy import LazyResource
+from backend.ee_cache import analysis_cache, make_key
+from backend.metrics import span
+
 # --- Earth Engine Initialization (Robust Version) ---
-try:
-    GCP_PROJECT_ID = 'psychic-rush-470109-r9' # Your Google Cloud Project ID
-    CREDENTIALS_ENV_VAR = 'GOOGLE_APPLICATION_CREDENTIALS' # Env var Render sets
-    
-    credentials_path_on_server = os.getenv(CREDENTIALS_ENV_VAR)
-
-    # --- Server/Render Path ---
-    if credentials_path_on_server:
-        print(f"INFO: Found {CREDENTIALS_ENV_VAR}. Initializing Earth Engine in Server Mode.")
-        print(f"DEBUG: Credentials path from env var: '{credentials_path_on_server}'")
-
-        if not os.path.exists(credentials_path_on_server):
-            print(f"ERROR: Service account key file NOT found at the specified path: '{credentials_path_on_server}'")
-            # Attempt to list directory for debugging (might fail due to permissions)
-            try:
-                secrets_dir = os.path.dirname(credentials_path_on_server)
-                print(f"DEBUG: Listing contents of directory '{secrets_dir}': {os.listdir(secrets_dir)}")
-            except Exception as list_e:
-                print(f"DEBUG: Could not list contents of '{secrets_dir}': {list_e}")
-            raise FileNotFoundError(f"Service account key file not found at: {credentials_path_on_server}")
+GCP_PROJECT_ID = 'psychic-rush-470109-r9' # Your Google Cloud Project ID
+CREDENTIALS_ENV_VAR = 'GOOGLE_APPLICATION_CREDENTIALS' # Env var Render sets
+
+def initialize_earth_engine():
+    """
+    Initializes the shared Earth Engine session (server or local mode).
+    Called once through the `earth_engine` lazy accessor below, never at import time.
+    """
+    try:
+        credentials_path_on_server = os.getenv(CREDENTIALS_ENV_VAR)
+
+        # --- Server/Render Path ---
+        if credentials_path_on_server:
+            print(f"INFO: Found {CREDENTIALS_ENV_VAR}. Initializing Earth Engine in Server Mode.")
+            print(f"DEBUG: Credentials path from env var: '{credentials_path_on_server}'")
+
+            if not os.path.exists(credentials_path_on_server):
+                print(f"ERROR: Service account key file NOT found at the specified path: '{credentials_path_on_server}'")
+                # Attempt to list directory for debugging (might fail due to permissions)
+                try:
+                    secrets_dir = os.path.dirname(credentials_path_on_server)
+                    print(f"DEBUG: Listing contents of directory '{secrets_dir}': {os.listdir(secrets_dir)}")
+                except Exception as list_e:
+                    print(f"DEBUG: Could not list contents of '{secrets_dir}': {list_e}")
+                raise FileNotFoundError(f"Service account key file not found at: {credentials_path_on_server}")
 
-        try:
-            print(f"INFO: Loading credentials from: {credentials_path_on_server}")
-            # Explicitly load credentials using google-auth library
-            credentials = service_account.Credentials.from_service_account_file(
-                credentials_path_on_server,
-                # Define necessary scopes for your EE operations
-                scopes=[
-                    'https://www.googleapis.com/auth/earthengine',
-                    'https://www.googleapis.com/auth/cloud-platform'
-                ]
-            )
-            print("INFO: Credentials loaded successfully.")
-
-            print("INFO: Initializing Earth Engine with loaded credentials and project ID...")
-            # Initialize using the loaded credential OBJECT and project ID
-            # opt_url might be needed for high volume requests with service accounts
-            ee.Initialize(credentials=credentials, project=GCP_PROJECT_ID, opt_url='https://earthengine-highvolume.googleapis.com')
-            print("INFO: Earth Engine Initialized Successfully (Server Mode).")
-
-        except Exception as init_e:
-            print(f"ERROR: Failed to initialize Earth Engine using service account credentials: {init_e}", file=sys.stderr)
-            raise init_e # Re-raise the exception after logging
-
-    # --- Local Development Path ---
-    else:
-        print(f"INFO: {CREDENTIALS_ENV_VAR} not found. Attempting initialization in Local Mode.")
-        try:
-            # First, try initializing directly. Works if gcloud default login is set.
-            print("INFO: Attempting ee.Initialize() with project ID...")
-            ee.Initialize(project=GCP_PROJECT_ID)
-            print("INFO: Earth Engine Initialized Successfully (Local Mode - Default Credentials).")
-        except (ee.EEException, google_auth_exceptions.DefaultCredentialsError, Exception) as e1:
-            # Catch a broader range of potential default init errors
-            print(f"WARN: Default initialization failed ({type(e1).__name__}: {e1}). Falling back to ee.Authenticate() flow.")
             try:
-                # If default fails, try the interactive authentication flow
-                print("INFO: Attempting ee.Authenticate()...")
-                ee.Authenticate(project_id=GCP_PROJECT_ID) # Authenticate first
-                print("INFO: ee.Authenticate() completed. Attempting ee.Initialize() again...")
-                ee.Initialize(project=GCP_PROJECT_ID) # Initialize after authentication
-                print("INFO: Earth Engine Initialized Successfully (Local Mode - Authenticate Flow).")
-            except Exception as e2:
-                print(f"ERROR: Interactive authentication/initialization also failed: {e2}", file=sys.stderr)
-                raise e2 # Re-raise the exception after logging
-
-except Exception as final_e:
-    # Catch any unexpected error during the entire process
-    print(f"CRITICAL ERROR: Failed during Earth Engine setup phase: {final_e}", file=sys.stderr)
-    # Raising here might stop the server from starting if EE is critical
-    raise final_e
+                print(f"INFO: Loading credentials from: {credentials_path_on_server}")
+                # Explicitly load credentials using google-auth library
+                credentials = service_account.Credentials.from_service_account_file(
+                    credentials_path_on_server,
+                    # Define necessary scopes for your EE operations
+                    scopes=[
+                        'https://www.googleapis.com/auth/earthengine',
+                        'https://www.googleapis.com/auth/cloud-platform'
+                    ]
+                )
+                print("INFO: Credentials loaded successfully.")
+
+                print("INFO: Initializing Earth Engine with loaded credentials and project ID...")
+                # Initialize using the loaded credential OBJECT and project ID
+                # opt_url might be needed for high volume requests with service accounts
+                ee.Initialize(credentials=credentials, project=GCP_PROJECT_ID, opt_url='https://earthengine-highvolume.googleapis.com')
+                print("INFO: Earth Engine Initialized Successfully (Server Mode).")
+
+            except Exception as init_e:
+                print(f"ERROR: Failed to initialize Earth Engine using service account credentials: {init_e}", file=sys.stderr)
+                raise init_e # Re-raise the exception after logging
+
+        # --- Local Development Path ---
+        else:
+            print(f"INFO: {CREDENTIALS_ENV_VAR} not found. Attempting initialization in Local Mode.")
+            try:
+                # First, try initializing directly. Works if gcloud default login is set.
+                print("INFO: Attempting ee.Initialize() with project ID...")
+                ee.Initialize(project=GCP_PROJECT_ID)
+                print("INFO: Earth Engine Initialized Successfully (Local Mode - Default Credentials).")
+            except (ee.EEException, google_auth_exceptions.DefaultCredentialsError, Exception) as e1:
+                # No interactive ee.Authenticate() fallback: this runs on a request or job thread, where a
+                # browser / stdin prompt would hang it. Fail fast; the lazy accessor retries on the next request.
+                print(f"ERROR: Default initialization failed ({type(e1).__name__}: {e1}).", file=sys.stderr)
+                raise RuntimeError(
+                    f"No Earth Engine credentials found. Set {CREDENTIALS_ENV_VAR} to a service account key, "
+                    "or run `earthengine authenticate` once on this machine."
+                ) from e1
+
+    except Exception as final_e:
+        # Catch any unexpected error during the entire process
+        print(f"CRITICAL ERROR: Failed during Earth Engine setup phase: {final_e}", file=sys.stderr)
+        # The lazy accessor records the error and retries on the next request
+        raise final_e
+
+# Every module that talks to Earth Engine calls earth_engine.get() before building ee objects.
+earth_engine = LazyResource("earth_engine", initialize_earth_engine)
 # --- END Earth Engine Initialization ---
 
 
-# --- YOUR EXISTING analyze_area FUNCTION ---
-# (Ensure this function definition is AFTER the initialization block)
-def analyze_area(geojson, start_date_str, end_date_str):
+# Bump whenever the analysis below changes (collection, masks, thresholds, vis params),
+# so results cached by older code are never served.
+ALGORITHM_VERSION = 1
+
+
+def analyze_area(geojson, start_date_str, end_date_str, use_cache=True):
     """
     Analyzes deforestation in a given GeoJSON area between two dates.
     Returns start map URL, end map URL with overlay, and statistics.
+    Finished results are kept in the persistent EE result cache (backend/ee_cache.py).
+    """
+    cache_key = make_key(geojson, start_date_str, end_date_str, version=ALGORITHM_VERSION)
+    if use_cache:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            print(f"INFO: EE result cache hit for {start_date_str} to {end_date_str}")
+            return tuple(cached)
+    result = _run_analysis(geojson, start_date_str, end_date_str)
+    analysis_cache.set(cache_key, list(result))
+    return result
+
+
+# Using Landsat 8 Surface Reflectance collection
+LANDSAT_COLLECTION = "LANDSAT/LC08/C02/T1_L2"
+ANALYSIS_SCALE = 30 # Landsat scale
+TRUE_COLOR_VIS = {'bands': ['SR_B4', 'SR_B3', 'SR_B2'], 'min': 0, 'max': 0.3} # Adjusted max for SR
+DEFORESTATION_VIS = {'palette': 'FF0000', 'opacity': 0.6} # Slightly more opaque red
+NO_IMAGERY_MESSAGE = "No cloud-free satellite imagery found for the selected date range(s). Please try different dates or a larger area."
+
+
+class PhaseTimer:
     """
+    Records wall time and Earth Engine round trips per phase of an analysis.
+    Call `trip()` next to every blocking EE call (getInfo, getThumbURL) made inside a phase.
+    Each phase is also a metrics span named "<prefix>.<phase>".
+    """
+
+    def __init__(self, prefix="analyze_area"):
+        self.prefix = prefix
+        self.phases = {}
+        self._current = None
+
+    @contextmanager
+    def phase(self, name):
+        self._current = self.phases.setdefault(name, {"seconds": 0.0, "round_trips": 0})
+        start = time.perf_counter()
+        try:
+            with span(f"{self.prefix}.{name}"):
+                yield self
+        finally:
+            self._current["seconds"] = round(self._current["seconds"] + time.perf_counter() - start, 3)
+            self._current = None
+
+    def trip(self, count=1):
+        if self._current is not None:
+            self._current["round_trips"] += count
+
+    def summary(self):
+        return {
+            "phases": self.phases,
+            "round_trips": sum(p["round_trips"] for p in self.phases.values()),
+            "seconds": round(sum(p["seconds"] for p in self.phases.values()), 3),
+        }
+
+
+# Function to mask clouds, scale, and select bands
+def maskL8sr(image):
+    # Bits 3 (cloud) and 4 (cloud shadow) are mask bits.
+    cloudShadowBitMask = 1 << 4
+    cloudsBitMask = 1 << 3
+    qa = image.select('QA_PIXEL')
+    # Both flags should be set to zero, indicating clear conditions.
+    mask = qa.bitwiseAnd(cloudShadowBitMask).eq(0).And(qa.bitwiseAnd(cloudsBitMask).eq(0))
+    # Apply scaling factors and select spectral bands.
+    return image.updateMask(mask).multiply(0.0000275).add(-0.2)\
+        .select("SR_B.*")\
+        .copyProperties(image, ["system:time_start"])
+
+
+# Function to calculate NDVI
+def get_ndvi(img):
+    # Landsat 8 uses B5 (NIR) and B4 (Red)
+    return img.normalizedDifference(['SR_B5', 'SR_B4']).rename('NDVI')
+
+
+def build_analysis(region, start_date_str, end_date_str):
+    """
+    Builds (without evaluating) every ee object the deforestation analysis needs.
+    Returns a dict of server-side objects; nothing here makes a network call.
+    """
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+    end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+
+    # Define date ranges (e.g., 90 days before each date for clearer imagery)
+    start_range_begin = (start_date - timedelta(days=90)).strftime('%Y-%m-%d')
+    end_range_begin = (end_date - timedelta(days=90)).strftime('%Y-%m-%d')
+
+    # Filter collections and apply mask
+    start_collection = ee.ImageCollection(LANDSAT_COLLECTION)\
+        .filterBounds(region)\
+        .filterDate(start_range_begin, start_date_str)\
+        .map(maskL8sr)
+
+    end_collection = ee.ImageCollection(LANDSAT_COLLECTION)\
+        .filterBounds(region)\
+        .filterDate(end_range_begin, end_date_str)\
+        .map(maskL8sr)
+
+    # Create median composite images
+    start_image = start_collection.median()
+    end_image = end_collection.median()
+
+    # Calculate NDVI for both images
+    start_ndvi = get_ndvi(start_image)
+    end_ndvi = get_ndvi(end_image)
+
+    # Identify potential deforestation: NDVI decrease > threshold (e.g., 0.25)
+    # and where it was initially forest (e.g., start NDVI >= 0.4)
+    initial_forest = start_ndvi.gte(0.4) # Mask for initial forest
+    deforestation = start_ndvi.subtract(end_ndvi).gt(0.25).And(initial_forest).selfMask()
+
+    # Both areas (sq meters) as bands of one image, so a single reduceRegion sums them together.
+    # Each band keeps its own mask: deforested pixels only, initial forest pixels only.
+    pixel_area = ee.Image.pixelArea()
+    area_image = ee.Image.cat([
+        deforestation.multiply(pixel_area).rename('deforested'),
+        initial_forest.selfMask().multiply(pixel_area).rename('initial_forest'),
+    ])
+
+    return {
+        "start_size": start_collection.size(),
+        "end_size": end_collection.size(),
+        "start_image": start_image,
+        "end_image": end_image,
+        "deforestation": deforestation,
+        "area_image": area_image,
+    }
+
+
+def has_imagery(analysis):
+    """Server-side boolean: both periods have at least one image."""
+    return ee.Number(analysis["start_size"]).gt(0).And(ee.Number(analysis["end_size"]).gt(0))
+
+
+def area_sums(analysis, geometry, max_pixels=1e9):
+    """Server-side dict {'deforested', 'initial_forest'} of summed sq meters over `geometry`."""
+    return analysis["area_image"].reduceRegion(
+        reducer=ee.Reducer.sum(),
+        geometry=geometry,
+        scale=ANALYSIS_SCALE,
+        maxPixels=max_pixels,
+    )
+
+
+def stats_from_sums(deforested_m2, initial_forest_m2):
+    """Converts the summed areas (sq meters) into the stats dict returned to the frontend."""
+    # Convert sq meters to hectares, treat missing sums as 0, round
+    deforested_hectares = round((deforested_m2 or 0) / 10000, 2)
+    initial_forest_hectares = round((initial_forest_m2 or 0) / 10000, 2)
+
+    # Calculate percentage loss, only when there was forest to begin with
+    percentage_loss = 0
+    if initial_forest_hectares > 0:
+        percentage_loss = round((deforested_hectares / initial_forest_hectares) * 100, 2)
+
+    return {
+        "Initial Forest Area (ha)": initial_forest_hectares,
+        "Deforested Area (ha)": deforested_hectares,
+        "Percentage Loss (%)": percentage_loss,
+    }
+
+
+def thumbnail_urls(analysis, bounds):
+    """Generates the before / after thumbnail URLs concurrently (each getThumbURL is a round trip)."""
+    thumb_params = {'dimensions': 512, 'region': bounds, 'format': 'png'}
+    start_thumb = analysis["start_image"].visualize(**TRUE_COLOR_VIS)
+
+    # Create the 'after' image with deforestation overlay blended on top
+    after_image_visualized = analysis["end_image"].visualize(**TRUE_COLOR_VIS)
+    deforestation_mask_visualized = analysis["deforestation"].visualize(**DEFORESTATION_VIS)
+    end_thumb = ee.Image().blend(after_image_visualized).blend(deforestation_mask_visualized)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ee-thumb") as pool:
+        start_future = pool.submit(start_thumb.getThumbURL, thumb_params)
+        end_future = pool.submit(end_thumb.getThumbURL, thumb_params)
+        return start_future.result(), end_future.result()
+
+
+def _run_analysis(geojson, start_date_str, end_date_str):
     print(f"INFO: Analyzing area for dates: {start_date_str} to {end_date_str}")
+    earth_engine.get()
+    timer = PhaseTimer()
     try:
-        region = ee.Geometry(geojson) # Convert GeoJSON dict/string to ee.Geometry
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-
-        # Define date ranges (e.g., 90 days before each date for clearer imagery)
-        start_range_begin = (start_date - timedelta(days=90)).strftime('%Y-%m-%d')
-        end_range_begin = (end_date - timedelta(days=90)).strftime('%Y-%m-%d')
-
-        # Using Landsat 8 Surface Reflectance collection
-        LANDSAT_COLLECTION = "LANDSAT/LC08/C02/T1_L2"
-
-        # Function to mask clouds, scale, and select bands
-        def maskL8sr(image):
-            # Bits 3 (cloud) and 4 (cloud shadow) are mask bits.
-            cloudShadowBitMask = 1 << 4
-            cloudsBitMask = 1 << 3
-            qa = image.select('QA_PIXEL')
-            # Both flags should be set to zero, indicating clear conditions.
-            mask = qa.bitwiseAnd(cloudShadowBitMask).eq(0).And(qa.bitwiseAnd(cloudsBitMask).eq(0))
-            # Apply scaling factors and select spectral bands.
-            return image.updateMask(mask).multiply(0.0000275).add(-0.2)\
-                .select("SR_B.*")\
-                .copyProperties(image, ["system:time_start"])
-
-        # Filter collections and apply mask
-        start_collection = ee.ImageCollection(LANDSAT_COLLECTION)\
-            .filterBounds(region)\
-            .filterDate(start_range_begin, start_date_str)\
-            .map(maskL8sr)
-
-        end_collection = ee.ImageCollection(LANDSAT_COLLECTION)\
-            .filterBounds(region)\
-            .filterDate(end_range_begin, end_date_str)\
-            .map(maskL8sr)
-
-        # Check if collections are empty after filtering
-        start_size = start_collection.size().getInfo()
-        end_size = end_collection.size().getInfo()
-        print(f"DEBUG: Found {start_size} images for start period, {end_size} images for end period.")
-        if start_size == 0 or end_size == 0:
-            raise ValueError("No cloud-free satellite imagery found for the selected date range(s). Please try different dates or a larger area.")
-
-        # Create median composite images
-        start_image = start_collection.median()
-        end_image = end_collection.median()
-
-        # Function to calculate NDVI
-        def get_ndvi(img):
-            # Landsat 8 uses B5 (NIR) and B4 (Red)
-            return img.normalizedDifference(['SR_B5', 'SR_B4']).rename('NDVI')
-
-        # Calculate NDVI for both images
-        start_ndvi = get_ndvi(start_image)
-        end_ndvi = get_ndvi(end_image)
-
-        # Identify potential deforestation: NDVI decrease > threshold (e.g., 0.25)
-        # and where it was initially forest (e.g., start NDVI >= 0.4)
-        initial_forest = start_ndvi.gte(0.4) # Mask for initial forest
-        deforestation = start_ndvi.subtract(end_ndvi).gt(0.25).And(initial_forest).selfMask()
-
-        # Image representing area of each pixel in square meters
-        pixel_area = ee.Image.pixelArea()
-
-        # --- Calculate Areas ---
-        # Calculate deforested area
-        deforested_area_image = deforestation.multiply(pixel_area)
-        deforested_stats = deforested_area_image.reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=region,
-            scale=30, # Landsat scale
-            maxPixels=1e9
-        )
-        # Convert sq meters to hectares, use .get(key, 0) for safety, round
-        deforested_hectares = round(ee.Number(deforested_stats.get('NDVI', 0)).divide(10000).getInfo(), 2)
-
-        # Calculate initial forest area
-        initial_forest_area_image = initial_forest.updateMask(initial_forest).multiply(pixel_area) # Mask to count only forest pixels
-        initial_stats = initial_forest_area_image.reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=region,
-            scale=30,
-            maxPixels=1e9
-        )
-        initial_forest_hectares = round(ee.Number(initial_stats.get('NDVI', 0)).divide(10000).getInfo(), 2)
-
-        # Calculate percentage loss, ensure initial_forest_hectares is not None or 0
-        percentage_loss = 0
-        if initial_forest_hectares is not None and initial_forest_hectares > 0:
-             deforested_hectares_safe = deforested_hectares if deforested_hectares is not None else 0
-             percentage_loss = round((deforested_hectares_safe / initial_forest_hectares) * 100, 2)
-        # --- End Area Calculation ---
+        with timer.phase("build"):
+            region = ee.Geometry(geojson) # Convert GeoJSON dict/string to ee.Geometry
+            analysis = build_analysis(region, start_date_str, end_date_str)
+
+        # --- One round trip for sizes, both area sums and the thumbnail bounds ---
+        # The If keeps EE from evaluating median()/NDVI of an empty collection.
+        summary = ee.Dictionary({
+            "start_size": analysis["start_size"],
+            "end_size": analysis["end_size"],
+            "sums": ee.Algorithms.If(has_imagery(analysis), area_sums(analysis, region), ee.Dictionary({})),
+            "bounds": region.bounds(maxError=1).coordinates(), # Use bounds() for efficiency
+        })
+        with timer.phase("stats"):
+            summary = summary.getInfo()
+            timer.trip()
+
+        print(f"DEBUG: Found {summary['start_size']} images for start period, {summary['end_size']} images for end period.")
+        if not summary["start_size"] or not summary["end_size"]:
+            raise ValueError(NO_IMAGERY_MESSAGE)
+
+        sums = summary.get("sums") or {}
+        final_stats = stats_from_sums(sums.get("deforested"), sums.get("initial_forest"))
+        print("INFO: Analysis Stats:", final_stats) # Log the calculated stats
 
         # --- Generate Thumbnail URLs ---
-        # Get bounds for thumbnail region
-        region_info = region.bounds(maxError=1).getInfo()['coordinates'] # Use bounds() for efficiency
-        thumb_params = {'dimensions': 512, 'region': region_info, 'format': 'png'}
-
-        # Define visualization parameters
-        true_color_vis = {'bands': ['SR_B4', 'SR_B3', 'SR_B2'], 'min': 0, 'max': 0.3} # Adjusted max for SR
-        deforestation_vis = {'palette': 'FF0000', 'opacity': 0.6} # Slightly more opaque red
-
-        # Generate URLs
-        start_map_url = start_image.visualize(**true_color_vis).getThumbURL(thumb_params)
-
-        # Create the 'after' image with deforestation overlay blended on top
-        after_image_visualized = end_image.visualize(**true_color_vis)
-        deforestation_mask_visualized = deforestation.visualize(**deforestation_vis)
-        end_map_with_overlay_image = ee.Image().blend(after_image_visualized).blend(deforestation_mask_visualized)
-        end_map_with_overlay_url = end_map_with_overlay_image.getThumbURL(thumb_params)
-        # --- End Thumbnail Generation ---
-
-        # Structure the final statistics result, handle potential None values
-        final_stats = {
-            "Initial Forest Area (ha)": initial_forest_hectares if initial_forest_hectares is not None else 0,
-            "Deforested Area (ha)": deforested_hectares if deforested_hectares is not None else 0,
-            "Percentage Loss (%)": percentage_loss if percentage_loss is not None else 0
-        }
-        print("INFO: Analysis Stats:", final_stats) # Log the calculated stats
+        with timer.phase("thumbnails"):
+            start_map_url, end_map_with_overlay_url = thumbnail_urls(analysis, summary["bounds"])
+            timer.trip(2)
 
         return start_map_url, end_map_with_overlay_url, final_stats
 
@@ -225,5 +329,8 @@ def analyze_area(geojson, start_date_str, end_date_str):
         error_message = f"Unexpected error during Earth Engine analysis: {e}"
         print(f"ERROR: {error_message}", file=sys.stderr)
         raise ValueError(f"Analysis failed unexpectedly: {e}") # Raise a standard error type
+    finally:
+        print(f"INFO: analyze_area timings: {timer.summary()}")
+
 
 # --- Add any other utility functions you have in this file ---
\ No newline at end of file
@@ -1,76 +1,290 @@
 # backend/ghg_detector.py
 
 import ee
+import base64
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
 from datetime import datetime, timedelta
 
-try:
-    ee.Initialize()
-    print("Google Earth Engine initialized successfully.")
-except Exception as e:
-    print(f"Error initializing Google Earth Engine: {e}")
+# Shares the single lazily-initialized Earth Engine session from gee_utils
+from backend.gee_utils import earth_engine
+from backend.cache import response_cache
+from backend.disk_cache import DiskLRU
+from backend.metrics import span
 
-# backend/ghg_detector.py
+NO2_COLLECTION = 'COPERNICUS/S5P/OFFL/L3_NO2'
+NO2_BAND = 'tropospheric_NO2_column_number_density'
+NO2_TO_UMOL = 1e6  # mol/m² -> μmol/m²
+NO2_VIZ_PARAMS = {
+    'min': 0,
+    'max': 0.0002,
+    'palette': ['black', 'blue', 'purple', 'cyan', 'green', 'yellow', 'red']
+}
+# Bounds are snapped outward to this grid, so small pans / zooms share map credentials and stats
+BOUNDS_GRID_DEG = float(os.getenv("GHG_BOUNDS_GRID_DEG", "0.05"))
 
-def analyze_no2_for_area(bounds: list, date_str: str):
+RECENT_WINDOW_DAYS = 7  # windows ending this close to today may still gain orbits
+
+# PNG tiles served by the tile proxy, keyed by layer + z/x/y (not by the expiring map id)
+no2_tile_cache = DiskLRU(
+    os.getenv("TILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bitclimate_tiles")),
+    max_bytes=int(os.getenv("TILE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+)
+
+
+def snap_bounds(bounds, cell_deg=BOUNDS_GRID_DEG):
+    """[[south, west], [north, east]] expanded to whole grid cells."""
+    (south, west), (north, east) = bounds
+    down = lambda v: round(math.floor(v / cell_deg + 1e-9) * cell_deg, 4)
+    up = lambda v: round(math.ceil(v / cell_deg - 1e-9) * cell_deg, 4)
+    return [[down(south), down(west)], [up(north), up(east)]]
+
+
+def is_recent(end_str):
+    """True for a window ending within RECENT_WINDOW_DAYS: its composite still changes as new orbits land."""
+    return end_str > (datetime.utcnow() - timedelta(days=RECENT_WINDOW_DAYS)).strftime('%Y-%m-%d')
+
+
+def _viz_tag(viz_params=NO2_VIZ_PARAMS):
+    canonical = json.dumps(viz_params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:8]
+
+
+def layer_key(bounds, start_str, end_str, viz_params=NO2_VIZ_PARAMS):
     """
-    Analyzes the 7-day average NO2 concentration and calculates statistics.
-    Returns GEE map layer credentials and a stats object.
+    Identifies a rendered NO2 layer independently of its (expiring) map credentials. Self-describing:
+    the snapped bounds and week are encoded in it, so any worker can re-mint the layer (see parse_layer_key).
+    """
+    payload = json.dumps([bounds, start_str, end_str], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=") + "." + _viz_tag(viz_params)
+
+
+def parse_layer_key(layer):
+    """
+    (bounds, start_str, end_str) of a layer key, or None unless it describes a layer analyze_no2_for_area could
+    have produced: current viz params, grid-snapped bounds, a 7-day week.
     """
+    encoded, _, tag = layer.partition(".")
+    if tag != _viz_tag():
+        return None
     try:
-        west, south = bounds[0][1], bounds[0][0]
-        east, north = bounds[1][1], bounds[1][0]
-        area_of_interest = ee.Geometry.Rectangle([west, south, east, north])
-
-        end_date = datetime.strptime(date_str, '%Y-%m-%d')
-        start_date = end_date - timedelta(days=7)
-
-        no2_image = ee.ImageCollection('COPERNICUS/S5P/OFFL/L3_NO2') \
-            .select('tropospheric_NO2_column_number_density') \
-            .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
-            .filterBounds(area_of_interest) \
-            .mean().clip(area_of_interest)
-
-        if not no2_image.bandNames().size().getInfo():
-             raise ValueError(f"No satellite data found for the week ending on {date_str}.")
-
-        viz_params = {
-            'min': 0,
-            'max': 0.0002,
-            'palette': ['black', 'blue', 'purple', 'cyan', 'green', 'yellow', 'red']
-        }
+        bounds, start_str, end_str = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+        start, end = datetime.strptime(start_str, '%Y-%m-%d'), datetime.strptime(end_str, '%Y-%m-%d')
+        (south, west), (north, east) = bounds
+        valid = (end - start == timedelta(days=7) and snap_bounds(bounds) == bounds
+                 and -90 <= south < north <= 90 and -180 <= west < east <= 180)
+    except (ValueError, TypeError):
+        return None
+    return (bounds, start_str, end_str) if valid else None
+
 
-        gee_map = no2_image.getMapId(viz_params)
+def _no2_week(bounds, start_str, end_str):
+    west, south = bounds[0][1], bounds[0][0]
+    east, north = bounds[1][1], bounds[1][0]
+    area_of_interest = ee.Geometry.Rectangle([west, south, east, north])
+    no2_image = ee.ImageCollection(NO2_COLLECTION) \
+        .select(NO2_BAND) \
+        .filterDate(start_str, end_str) \
+        .filterBounds(area_of_interest) \
+        .mean().clip(area_of_interest)
+    return no2_image, area_of_interest
 
-        # NEW: Calculate statistics (min, max, mean) for the area
-        stats = no2_image.reduceRegion(
+
+def _compute_stats(bounds, start_str, end_str, date_str):
+    """Band check and min / max / mean in one getInfo. Raises ValueError when the week has no data."""
+    earth_engine.get()
+    no2_image, area_of_interest = _no2_week(bounds, start_str, end_str)
+    summary = ee.Dictionary({
+        "bands": no2_image.bandNames().size(),
+        "stats": no2_image.reduceRegion(
             reducer=ee.Reducer.minMax().combine(ee.Reducer.mean(), '', True),
             geometry=area_of_interest,
             scale=1000, # Resolution in meters
             maxPixels=1e9
-        ).getInfo()
-        
-        # Extract and clean the stats data
-        band_name = 'tropospheric_NO2_column_number_density'
-        min_val = stats.get(f'{band_name}_min', 0) or 0
-        max_val = stats.get(f'{band_name}_max', 0) or 0
-        mean_val = stats.get(f'{band_name}_mean', 0) or 0
-        
-        # Convert to a more readable unit (micromoles per square meter)
-        conversion_factor = 1e6
-        
-        clean_stats = {
-            "min": f"{min_val * conversion_factor:.2f}",
-            "max": f"{max_val * conversion_factor:.2f}",
-            "mean": f"{mean_val * conversion_factor:.2f}",
-            "unit": "μmol/m²"
-        }
+        ),
+    })
+    with span("no2.stats.getInfo"):
+        result = summary.getInfo()
+    if not result["bands"]:
+        raise ValueError(f"No satellite data found for the week ending on {date_str}.")
+
+    # Extract and clean the stats data
+    stats = result["stats"] or {}
+    min_val = stats.get(f'{NO2_BAND}_min', 0) or 0
+    max_val = stats.get(f'{NO2_BAND}_max', 0) or 0
+    mean_val = stats.get(f'{NO2_BAND}_mean', 0) or 0
+
+    # Convert to a more readable unit (micromoles per square meter)
+    return {
+        "min": f"{min_val * NO2_TO_UMOL:.2f}",
+        "max": f"{max_val * NO2_TO_UMOL:.2f}",
+        "mean": f"{mean_val * NO2_TO_UMOL:.2f}",
+        "unit": "μmol/m²"
+    }
+
+
+def _mint_map(bounds, start_str, end_str):
+    earth_engine.get()
+    no2_image, _ = _no2_week(bounds, start_str, end_str)
+    with span("no2.getMapId"):
+        gee_map = no2_image.getMapId(NO2_VIZ_PARAMS)
+    return {
+        "mapId": gee_map['mapid'],
+        "token": gee_map['token'],
+        "urlTemplate": gee_map['tile_fetcher'].url_format,
+    }
+
+
+def no2_map_layer(layer):
+    """
+    Map credentials for a layer key, re-minted if they expired (None for a layer never requested).
+    Credentials live in the 'ee_mapid' cache for less than their EE lifetime; recent weeks use the much
+    shorter 'ee_mapid_recent' TTL so their tiles pick up newly ingested orbits.
+    """
+    params = parse_layer_key(layer)
+    if params is None:
+        return None
+    source = "ee_mapid_recent" if is_recent(params[2]) else "ee_mapid"
+    return response_cache.get_or_fetch(source, layer, lambda: _mint_map(*params))
+
 
-        return {
-            "mapId": gee_map['mapid'],
-            "token": gee_map['token'],
-            "urlTemplate": gee_map['tile_fetcher'].url_format,
-            "stats": clean_stats # Return the new stats object
+def tile_cache_key(layer, z, x, y):
+    """
+    Returns (tile cache key, Cache-Control max-age) for a tile of `layer`.
+    Tiles of a recent week are keyed by 'ee_mapid_recent' TTL period, so they expire with the credentials.
+    """
+    params = parse_layer_key(layer)
+    if params is None or not is_recent(params[2]):
+        return f"{layer}/{z}/{x}/{y}", 86400
+    ttl = response_cache.policy("ee_mapid_recent").ttl
+    return f"{layer}@{int(time.time() // ttl)}/{z}/{x}/{y}", int(ttl)
+
+
+def analyze_no2_for_area(bounds: list, date_str: str):
+    """
+    Analyzes the 7-day average NO2 concentration and calculates statistics.
+    Returns GEE map layer credentials and a stats object.
+    Stats and map are computed over the bounds snapped outward to BOUNDS_GRID_DEG (returned as "bounds"),
+    so nearby requests share them; both are cached per (week, snapped bounds).
+    """
+    end_date = datetime.strptime(date_str, '%Y-%m-%d')
+    start_date = end_date - timedelta(days=7)
+    start_str, end_str = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    snapped = snap_bounds(bounds)
+
+    # Stats first: a week without data raises before any map credentials are minted
+    stats_key = f"{json.dumps(snapped)}:{start_str}:{end_str}"
+    stats_source = "no2_stats_recent" if is_recent(end_str) else "no2_stats"
+    clean_stats = response_cache.get_or_fetch(stats_source, stats_key, lambda: _compute_stats(snapped, start_str, end_str, date_str))
+
+    layer = layer_key(snapped, start_str, end_str)
+    gee_map = no2_map_layer(layer)
+
+    return {
+        **gee_map,
+        "tileProxyTemplate": f"/air/ghg_emissions/tiles/{layer}/{{z}}/{{x}}/{{y}}.png",
+        "bounds": snapped,  # the box the stats and map actually cover
+        "stats": clean_stats # Return the new stats object
+    }
+
+
+# ==============================================================================
+# NO2 time series: every window reduced server-side, fetched with one getInfo
+# ==============================================================================
+TIMESERIES_INTERVALS = ("daily", "weekly", "monthly")
+TIMESERIES_MAX_WINDOWS = 400
+
+
+def timeseries_windows(start_date_str, end_date_str, interval):
+    """
+    Splits [start, end] (both inclusive) into [window_start, window_end) date pairs.
+    daily / weekly windows step from the start date; monthly windows follow calendar months.
+    """
+    if interval not in TIMESERIES_INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(TIMESERIES_INTERVALS)}.")
+    start = datetime.strptime(start_date_str, '%Y-%m-%d')
+    stop = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
+    if stop <= start:
+        raise ValueError("end_date must not be before start_date.")
+
+    windows = []
+    current = start
+    while current < stop:
+        if interval == "daily":
+            following = current + timedelta(days=1)
+        elif interval == "weekly":
+            following = current + timedelta(days=7)
+        else:
+            following = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        windows.append((current.strftime('%Y-%m-%d'), min(following, stop).strftime('%Y-%m-%d')))
+        current = following
+        if len(windows) > TIMESERIES_MAX_WINDOWS:
+            raise ValueError(f"Too many {interval} windows (max {TIMESERIES_MAX_WINDOWS}); use a shorter range or a longer interval.")
+    return windows
+
+
+def _window_stats(bounds, windows):
+    """One server-side map over all windows; returns {(start, end): stats} from a single getInfo."""
+    west, south = bounds[0][1], bounds[0][0]
+    east, north = bounds[1][1], bounds[1][0]
+    area_of_interest = ee.Geometry.Rectangle([west, south, east, north])
+    collection = ee.ImageCollection(NO2_COLLECTION).select(NO2_BAND).filterBounds(area_of_interest)
+    reducer = ee.Reducer.minMax().combine(ee.Reducer.mean(), '', True)
+
+    def composite(window):
+        window = ee.List(window)
+        images = collection.filterDate(window.get(0), window.get(1))
+        # mean() of an empty window is a band-less image; its reduceRegion is just an empty dict
+        return images.mean().set({'window_start': window.get(0), 'window_end': window.get(1), 'images': images.size()})
+
+    def reduce_window(image):
+        stats = image.reduceRegion(reducer=reducer, geometry=area_of_interest, scale=1000, maxPixels=1e9)
+        return ee.Feature(None, stats).copyProperties(image, ['window_start', 'window_end', 'images'])
+
+    composites = ee.ImageCollection.fromImages(ee.List([list(w) for w in windows]).map(composite))
+    with span("no2_timeseries.getInfo"):
+        features = ee.FeatureCollection(composites.map(reduce_window)).getInfo()["features"]
+
+    results = {}
+    for feature in features:
+        props = feature["properties"]
+        scaled = lambda key: None if props.get(f'{NO2_BAND}_{key}') is None else round(props[f'{NO2_BAND}_{key}'] * NO2_TO_UMOL, 2)
+        results[(props["window_start"], props["window_end"])] = {
+            "images": props.get("images", 0),
+            "min": scaled("min"),
+            "max": scaled("max"),
+            "mean": scaled("mean"),
         }
+    return results
+
+
+def no2_timeseries(bounds: list, start_date_str: str, end_date_str: str, interval: str = "weekly"):
+    """
+    Min / max / mean tropospheric NO2 per window over the bounds box. No map tiles.
+    Window stats are cached per (bounds, window), so overlapping ranges only compute the new windows.
+    """
+    windows = timeseries_windows(start_date_str, end_date_str, interval)
+    bounds_key = ",".join(f"{v:.4f}" for corner in bounds for v in corner)
+    source_for = lambda window: "no2_window_recent" if is_recent(window[1]) else "no2_window"
+    key_for = lambda window: f"{bounds_key}:{window[0]}:{window[1]}"
+
+    points = {window: response_cache.peek(source_for(window), key_for(window)) for window in windows}
+    missing = [window for window, stats in points.items() if stats is None]
+    if missing:
+        earth_engine.get()
+        computed = _window_stats(bounds, missing)
+        for window in missing:
+            stats = computed.get(window, {"images": 0, "min": None, "max": None, "mean": None})
+            response_cache.put(source_for(window), key_for(window), stats)
+            points[window] = stats
 
-    except Exception as e:
-        raise e
\ No newline at end of file
+    return {
+        "interval": interval,
+        "unit": "μmol/m²",
+        "computed_windows": len(missing),
+        "points": [{"start": start, "end": end, **points[(start, end)]} for start, end in windows],
+    }
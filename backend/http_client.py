@@ -0,0 +1,184 @@
+# backend/http_client.py
+#
+# One pooled async HTTP client for every outbound call (AQICN, OpenWeather, EE thumbnails).
+# Created in the FastAPI lifespan hook and injected into handlers with Depends(get_http_client).
+#   - keep-alive connection pool, HTTP/2 when the `h2` package is installed
+#   - explicit connect / read timeouts
+#   - retries with exponential backoff + full jitter for idempotent requests
+#   - a circuit breaker per upstream host, so a dead upstream fails fast instead of tying up workers
+
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import Request
+
+from backend.metrics import span
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """An upstream call failed (network error, timeout or non-2xx status)."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker for this host is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures.
+    open -> half-open after `reset_timeout` seconds, letting one trial request through.
+    half-open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Frees the half-open trial slot without judging the upstream (the caller was cancelled)."""
+        self._trial_in_flight = False
+
+
+class UpstreamClient:
+    """Defaults come from HTTP_* env vars; `transport` lets tests plug in httpx.MockTransport."""
+
+    def __init__(self, connect_timeout=None, read_timeout=None, retries=None, backoff_base=None,
+                 breaker_threshold=None, breaker_reset=None, transport=None):
+        env = lambda name, default: float(os.getenv(name, default))
+        self.retries = int(retries if retries is not None else env("HTTP_RETRIES", "2"))
+        self.backoff_base = backoff_base if backoff_base is not None else env("HTTP_BACKOFF_BASE", "0.2")
+        self._breaker_args = (
+            int(breaker_threshold if breaker_threshold is not None else env("HTTP_BREAKER_THRESHOLD", "5")),
+            breaker_reset if breaker_reset is not None else env("HTTP_BREAKER_RESET", "30"),
+        )
+        self.breakers = {}
+        self._client = httpx.AsyncClient(
+            http2=transport is None and importlib.util.find_spec("h2") is not None,
+            timeout=httpx.Timeout(
+                read_timeout if read_timeout is not None else env("HTTP_READ_TIMEOUT", "10"),
+                connect=connect_timeout if connect_timeout is not None else env("HTTP_CONNECT_TIMEOUT", "3"),
+            ),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30),
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    def breaker_for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(*self._breaker_args)
+        return self.breakers[host]
+
+    async def request(self, method, url, retry=None, **kwargs):
+        """Sends a request with retries and the host's circuit breaker. Returns the httpx.Response (2xx only)."""
+        breaker = self.breaker_for(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Upstream {urlsplit(url).netloc} is unavailable (circuit open).", status_code=503)
+
+        retry = method.upper() in ("GET", "HEAD") if retry is None else retry
+        attempts = self.retries + 1 if retry else 1
+        with span(f"upstream.{urlsplit(url).netloc}"):
+            return await self._request_with_retries(breaker, attempts, method, url, **kwargs)
+
+    async def _request_with_retries(self, breaker, attempts, method, url, **kwargs):
+        # Every way out of the attempt loop must settle the breaker, or a half-open trial that raised
+        # something unexpected would keep the host blocked until the process restarts
+        try:
+            return await self._attempt(breaker, attempts, method, url, **kwargs)
+        except UpstreamError:
+            raise  # already recorded
+        except httpx.HTTPError as e:  # DecodingError, TooManyRedirects, ...
+            breaker.record_failure()
+            raise UpstreamError(f"{type(e).__name__} calling {urlsplit(url).netloc}: {e}") from e
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (e.g. the client disconnected): says nothing about the upstream
+            breaker.release_trial()
+            raise
+
+    async def _attempt(self, breaker, attempts, method, url, **kwargs):
+        last_error = None
+        for attempt in range(attempts):
+            if attempt:
+                # Full jitter: sleep somewhere in [0, base * 2^attempt)
+                await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                last_error = UpstreamError(f"{type(e).__name__} calling {urlsplit(url).netloc}: {e}")
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                last_error = UpstreamError(f"{urlsplit(url).netloc} returned HTTP {response.status_code}", response.status_code)
+                continue
+            if response.is_error:
+                # 4xx other than 429 is the caller's problem, not the upstream's health
+                breaker.record_success()
+                raise UpstreamError(f"{urlsplit(url).netloc} returned HTTP {response.status_code}", response.status_code)
+            breaker.record_success()
+            return response
+
+        breaker.record_failure()
+        raise last_error
+
+    async def get_json(self, url, **kwargs):
+        response = await self.request("GET", url, **kwargs)
+        return response.json()
+
+    async def get_bytes(self, url, **kwargs):
+        response = await self.request("GET", url, **kwargs)
+        return response.content
+
+    def breaker_states(self):
+        return {host: breaker.state for host, breaker in self.breakers.items()}
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def get_http_client(request: Request) -> UpstreamClient:
+    """FastAPI dependency: the shared client created in the app lifespan."""
+    return request.app.state.http
@@ -0,0 +1,169 @@
+# backend/image_preprocess.py
+#
+# Fast decode / preprocess path for uploaded photos (crop disease, crop-from-photo, issue reports).
+# Phone photos are ~12 MP JPEGs, but the models only see 224x224, so:
+#   - uploads are size-bounded: UploadLimitMiddleware rejects oversized bodies with 413 before they are
+#     parsed, and read_upload() enforces the per-file limit while reading
+#   - JPEGs are decoded in draft mode (libjpeg DCT scaling by 1/2, 1/4 or 1/8) to the smallest size that is
+#     still >= 224 on both sides, so the full-resolution pixels are never materialized
+#   - decode_image() returns the resized uint8 (224, 224, 3) array; normalization is fused into a single
+#     pass that writes straight into a reusable float32 (N, 3, 224, 224) batch buffer (normalize_batch)
+# NumPy and Pillow only, so endpoints that just validate an image never import torch.
+
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from backend.metrics import route_label
+
+INPUT_SIZE = 224
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_BATCH_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(60_000_000)))  # header check, before any pixel is decoded
+DRAFT_DECODE = os.getenv("IMAGE_DRAFT_DECODE", "1") == "1"
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries and the small form fields next to the file
+
+# ImageNet statistics (same as the torchvision Normalize the ResNet was trained with), folded into one
+# multiply-add: (x / 255 - mean) / std == x * SCALE - OFFSET
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+_SCALE = (1.0 / (255.0 * _STD)).reshape(3, 1, 1)
+_OFFSET = (_MEAN / _STD).reshape(3, 1, 1)
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeds the configured byte or pixel limit (mapped to HTTP 413)."""
+
+
+# ==============================================================================
+# Reading uploads
+# ==============================================================================
+async def read_upload(upload, max_bytes=MAX_UPLOAD_BYTES, chunk_size=256 * 1024):
+    """Reads a Starlette UploadFile, failing as soon as it is known to exceed `max_bytes`."""
+    size = getattr(upload, "size", None)
+    if size is not None and size > max_bytes:
+        raise UploadTooLargeError(f"Upload too large: {size} bytes (max {max_bytes}).")
+    chunks, total = [], 0
+    while chunk := await upload.read(chunk_size):
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLargeError(f"Upload too large: more than {max_bytes} bytes.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class UploadLimitMiddleware:
+    """
+    413 for request bodies over the limit of the matched route, before the multipart parser spools them.
+    Checks Content-Length up front and counts streamed (chunked) bodies as they arrive.
+    `limits` maps route templates ("/predict_crop_disease") to a byte limit.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(route_label(scope)) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope.get("headers", [])).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received, started, rejected = 0, False, False
+
+        async def limited_receive():
+            # Past the limit the app sees a client disconnect; the 413 is sent here, unless a response already started
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit and not started:
+                    rejected = True
+                    await self._reject(send, limit)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if rejected:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(send, limit):
+        body = f'{{"detail":"Request body too large (max {limit} bytes)."}}'.encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+# ==============================================================================
+# Decoding and normalization
+# ==============================================================================
+def open_image(image_bytes):
+    """Opens (header only) and checks the pixel count. Raises ValueError / UploadTooLargeError."""
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+    except UnidentifiedImageError:
+        raise ValueError("Could not read image: unsupported or corrupt image file.")
+    except OSError as e:
+        raise ValueError(f"Could not read image: {e}")
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise UploadTooLargeError(f"Image too large: {image.width}x{image.height} (max {MAX_IMAGE_PIXELS} pixels).")
+    return image
+
+
+def decode_image(image_bytes, size=INPUT_SIZE):
+    """Decodes to an RGB uint8 array of shape (size, size, 3): draft-mode JPEG decode, then one antialiased resize."""
+    image = open_image(image_bytes)
+    try:
+        if DRAFT_DECODE:
+            image.draft("RGB", (size, size))  # no-op for non-JPEG formats
+        image = image.convert("RGB")
+        if image.size != (size, size):
+            image = image.resize((size, size), Image.BILINEAR)
+        return np.asarray(image)
+    except OSError as e:  # truncated or corrupt pixel data only shows up while decoding
+        raise ValueError(f"Could not read image: {e}")
+
+
+def normalize_into(pixels, out):
+    """(H, W, 3) uint8 -> normalized (3, H, W) float32, written into `out` in a single fused pass."""
+    np.multiply(pixels.transpose(2, 0, 1), _SCALE, out=out, casting="unsafe")
+    out -= _OFFSET
+    return out
+
+
+_buffers = threading.local()
+
+
+def batch_buffer(n, size=INPUT_SIZE):
+    """Reusable per-thread float32 (n, 3, size, size) buffer; grows on demand, never shrinks."""
+    buffer = getattr(_buffers, "array", None)
+    if buffer is None or buffer.shape[0] < n or buffer.shape[2] != size:
+        buffer = _buffers.array = np.empty((max(n, 1), 3, size, size), dtype=np.float32)
+    return buffer[:n]
+
+
+def normalize_batch(images):
+    """Normalizes decoded images into the thread's batch buffer. The result is overwritten by the next call."""
+    out = batch_buffer(len(images), images[0].shape[0] if images else INPUT_SIZE)
+    for i, pixels in enumerate(images):
+        normalize_into(pixels, out[i])
+    return out
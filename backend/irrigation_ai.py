@@ -1,5 +1,11 @@
-import requests
+import asyncio
 import math
+import os
+
+import numpy as np
+
+from backend.cache import WEATHER_GRID_DEG, response_cache, grid_cell, grid_key
+from backend.http_client import UpstreamError
 
 # ==============================================================================
 # SECTION 1: EXPANDED CROP DATABASE (No Changes)
@@ -30,25 +36,29 @@ CROP_WATER_NEEDS = {
 # SECTION 2: CORE FUNCTIONS (This code is already correct)
 # ==============================================================================
 
-def get_live_weather_data(lat, lon):
-    API_KEY = "bcaee639e6c48c093e70c0552db6c020" # Replace with your actual key if needed
-    URL = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "bcaee639e6c48c093e70c0552db6c020")
+
+async def get_live_weather_data(http, lat, lon):
+    API_KEY = OPENWEATHER_API_KEY
+    # Shares the per-grid-cell current-weather cache with /air/weather_forecast
+    cell_lat, cell_lon = grid_cell(lat, lon)
+    URL = f"https://api.openweathermap.org/data/2.5/weather?lat={cell_lat}&lon={cell_lon}&appid={API_KEY}&units=metric"
+
     try:
-        response = requests.get(URL)
-        response.raise_for_status()
-        data = response.json()
+        data = await response_cache.aget_or_fetch("openweather_current", grid_key(lat, lon), lambda: http.get_json(URL))
         return {"temperature": data["main"]["temp"], "rainfall_today": data.get("rain", {}).get("1h", 0)}
-    except requests.exceptions.RequestException as e:
+    except UpstreamError as e:
         print(f"Weather API Error: {e}")
         # Return a default value for testing if the API fails
         return {"temperature": 30.0, "rainfall_today": 0}
 
-def get_smart_recommendation(lat, lon, crop_type, days_since_last_irrigation, month):
+async def get_smart_recommendation(http, lat, lon, crop_type, days_since_last_irrigation, month):
+    """`http` is the shared UpstreamClient used for the (cached) live weather lookup."""
     clean_crop_type = crop_type.lower().strip()
     if clean_crop_type not in VALID_CROPS:
         raise ValueError(f"'{crop_type}' is not a recognized crop. Please enter a valid crop name.")
 
-    weather_data = get_live_weather_data(lat, lon)
+    weather_data = await get_live_weather_data(http, lat, lon)
     temp = weather_data["temperature"]
     rainfall = weather_data["rainfall_today"]
     crop_factor = CROP_WATER_NEEDS.get(clean_crop_type, CROP_WATER_NEEDS["default"])
@@ -85,3 +95,107 @@ def get_smart_recommendation(lat, lon, crop_type, days_since_last_irrigation, mo
         "reason": reason,
         "next_irrigation_in_days": next_irrigation_in_days
     }
+
+# ==============================================================================
+# SECTION 3: BULK RECOMMENDATIONS (many plots, one weather call per grid cell)
+# ==============================================================================
+# Crop lookups as arrays so the whole batch is scored with NumPy
+CROP_INDEX = {crop: i for i, crop in enumerate(VALID_CROPS)}
+CROP_FACTORS = np.array([CROP_WATER_NEEDS.get(crop, CROP_WATER_NEEDS["default"]) for crop in VALID_CROPS])
+RECOMMENDATION_LABELS = np.array(["Irrigate Now", "Consider Irrigating Soon", "Sufficient Moisture"])
+BULK_MAX_PLOTS = int(os.getenv("IRRIGATION_BULK_MAX_PLOTS", "20000"))
+WEATHER_FETCH_CONCURRENCY = int(os.getenv("IRRIGATION_WEATHER_CONCURRENCY", "32"))
+
+
+def crop_indices(crops):
+    """Maps crop names to CROP_INDEX positions. Raises ValueError listing unknown crops."""
+    indices = np.empty(len(crops), dtype=np.int64)
+    unknown = {}
+    for i, crop in enumerate(crops):
+        index = CROP_INDEX.get(crop.lower().strip())
+        if index is None:
+            unknown.setdefault(crop, i)
+            index = -1
+        indices[i] = index
+    if unknown:
+        listed = ", ".join(f"'{crop}' (plot {i})" for crop, i in list(unknown.items())[:10])
+        raise ValueError(f"Unrecognized crop(s): {listed}. Please enter valid crop names.")
+    return indices
+
+
+async def weather_for_cells(http, cell_lats, cell_lons):
+    """Current temperature / 1h rain per grid cell, fetched concurrently (and cached) once per cell."""
+    semaphore = asyncio.Semaphore(WEATHER_FETCH_CONCURRENCY)
+
+    async def fetch(lat, lon):
+        async with semaphore:
+            return await get_live_weather_data(http, lat, lon)
+
+    weather = await asyncio.gather(*(fetch(lat, lon) for lat, lon in zip(cell_lats.tolist(), cell_lons.tolist())))
+    temps = np.array([w["temperature"] for w in weather], dtype=np.float64)
+    rains = np.array([w["rainfall_today"] for w in weather], dtype=np.float64)
+    return temps, rains
+
+
+def moisture_model(temps, rains, crop_factors, days_since_last_irrigation):
+    """Vectorized version of the get_smart_recommendation model. Returns (moisture, label_index, next_days)."""
+    initial_moisture = 80.0
+    daily_moisture_loss = (temps / 10) * crop_factors
+    predicted_moisture = np.clip(initial_moisture - daily_moisture_loss * days_since_last_irrigation + rains * 5, 0, 100)
+
+    label_index = np.select([predicted_moisture < 35, predicted_moisture < 50], [0, 1], default=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        next_days = np.ceil((predicted_moisture - 50) / daily_moisture_loss)
+    next_days = np.where((label_index == 2) & (daily_moisture_loss > 0), next_days, np.nan)
+    return predicted_moisture, label_index, next_days
+
+
+def plot_arrays(lats, lons, crops, days_since_last_irrigation):
+    """Validates per-plot input lists. Returns (lats, lons, days, crop_idx) as NumPy arrays."""
+    n = len(lats)
+    if not (len(lons) == len(crops) == len(days_since_last_irrigation) == n):
+        raise ValueError("lats, lons, crops and days_since_last_irrigation must have the same length.")
+    if n == 0:
+        raise ValueError("No plots given.")
+    if n > BULK_MAX_PLOTS:
+        raise ValueError(f"Too many plots: {n} (max {BULK_MAX_PLOTS}).")
+    return (np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64),
+            np.asarray(days_since_last_irrigation, dtype=np.float64), crop_indices(crops))
+
+
+def group_by_cell(lats, lons):
+    """
+    Groups plots by weather grid cell (integer grid index, the same snapping cache.grid_cell does).
+    Returns (cell centres as an (n_cells, 2) array, cell index of each plot).
+    """
+    cells = np.round(np.column_stack([lats, lons]) / WEATHER_GRID_DEG).astype(np.int64)
+    unique_cells, cell_of_plot = np.unique(cells, axis=0, return_inverse=True)
+    return unique_cells * WEATHER_GRID_DEG, cell_of_plot.reshape(-1)
+
+
+async def get_bulk_recommendations(http, lats, lons, crops, days_since_last_irrigation, month=None):
+    """
+    Recommendations for many plots at once. Plots are grouped by weather grid cell, so each cell's
+    weather is looked up once. Returns columnar output in the same order as the input.
+    """
+    lats, lons, days, crop_idx = plot_arrays(lats, lons, crops, days_since_last_irrigation)
+    centres, cell_of_plot = group_by_cell(lats, lons)
+    cell_temps, cell_rains = await weather_for_cells(http, centres[:, 0], centres[:, 1])
+
+    moisture, label_index, next_days = moisture_model(
+        cell_temps[cell_of_plot], cell_rains[cell_of_plot], CROP_FACTORS[crop_idx], days
+    )
+    return {
+        "count": len(lats),
+        "weather_cells": len(centres),
+        "columns": {
+            "lat": lats.tolist(),
+            "lon": lons.tolist(),
+            "crop": [VALID_CROPS[i] for i in crop_idx.tolist()],
+            "temperature": cell_temps[cell_of_plot].tolist(),
+            "rainfall_today": cell_rains[cell_of_plot].tolist(),
+            "soil_moisture_prediction": moisture.tolist(),
+            "recommendation": RECOMMENDATION_LABELS[label_index].tolist(),
+            "next_irrigation_in_days": [None if np.isnan(d) else int(d) for d in next_days],
+        },
+    }
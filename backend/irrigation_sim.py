@@ -0,0 +1,183 @@
+# backend/irrigation_sim.py
+#
+# Multi-day soil-moisture simulation for irrigation scheduling.
+# A daily water balance is stepped over the OpenWeather 5-day / 3-hour forecast (shared with
+# /air/weather_forecast through the per-grid-cell "openweather_forecast" cache) for many plots and many
+# irrigation scenarios at once. The state is a (plots, scenarios) array advanced one day at a time, so the
+# best schedule for every plot comes out of a single batched pass.
+#
+# Daily balance, in the same units as the single-day model in irrigation_ai:
+#   moisture = clip(moisture - (mean_temp / 10) * crop_factor * month_factor + rain_mm * RAIN_GAIN_PER_MM, 0, 100)
+# An irrigation at the start of a day tops the soil back up to FIELD_CAPACITY.
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+from backend.cache import grid_cell, grid_key, response_cache
+from backend.climate_normals import MONTH_NAMES, parse_month
+from backend.http_client import UpstreamError
+from backend.irrigation_ai import (
+    CROP_FACTORS, OPENWEATHER_API_KEY, VALID_CROPS, WEATHER_FETCH_CONCURRENCY, group_by_cell, plot_arrays,
+)
+
+FORECAST_DAYS = 5
+STEPS_PER_DAY = 8                 # 3-hour forecast steps
+FIELD_CAPACITY = 80.0             # moisture right after irrigation (initial_moisture in irrigation_ai)
+STRESS_THRESHOLD = 35.0           # below this: "Irrigate Now"
+TARGET_THRESHOLD = 50.0           # below this: "Consider Irrigating Soon"
+RAIN_GAIN_PER_MM = 5.0
+FALLBACK_WEATHER = (30.0, 0.0)    # (temp, daily rain) when the forecast is unavailable, as in irrigation_ai
+
+# Schedule score: lower is better. Ties go to the earliest scenario in the list.
+STRESS_DAY_COST = float(os.getenv("IRRIGATION_SIM_STRESS_DAY_COST", "10"))
+LOW_DAY_COST = float(os.getenv("IRRIGATION_SIM_LOW_DAY_COST", "1"))
+IRRIGATION_COST = float(os.getenv("IRRIGATION_SIM_IRRIGATION_COST", "1.5"))
+MAX_SCENARIOS = int(os.getenv("IRRIGATION_SIM_MAX_SCENARIOS", "64"))
+
+# Seasonal evapotranspiration multiplier (Indian climate: hot, dry pre-monsoon peak; cool winter)
+MONTH_FACTORS = {
+    "january": 0.8, "february": 0.85, "march": 1.0, "april": 1.15, "may": 1.2, "june": 1.1,
+    "july": 0.95, "august": 0.95, "september": 1.0, "october": 0.95, "november": 0.85, "december": 0.8,
+}
+
+
+def month_factor(month):
+    """Accepts a month name ("July"), abbreviation ("jul") or number ("7"). None -> 1.0."""
+    if month is None or str(month).strip() == "":
+        return 1.0
+    return MONTH_FACTORS[MONTH_NAMES[parse_month(month) - 1]]
+
+
+def default_scenarios(days=FORECAST_DAYS):
+    """No irrigation, then a single irrigation on each day from the last to the first (so ties prefer waiting)."""
+    return [[]] + [[day] for day in reversed(range(days))]
+
+
+def scenario_mask(scenarios, days=FORECAST_DAYS):
+    """(n_scenarios, days) boolean mask of irrigation days."""
+    if not scenarios:
+        raise ValueError("At least one scenario is required.")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"Too many scenarios: {len(scenarios)} (max {MAX_SCENARIOS}).")
+    mask = np.zeros((len(scenarios), days), dtype=bool)
+    for i, scenario in enumerate(scenarios):
+        for day in scenario:
+            if not 0 <= day < days:
+                raise ValueError(f"Scenario {i}: irrigation day {day} is outside the {days}-day forecast.")
+            mask[i, day] = True
+    return mask
+
+
+def daily_forecast(forecast, days=FORECAST_DAYS):
+    """
+    Folds the 3-hour forecast list into consecutive 24-hour blocks from now.
+    Returns (mean temperature, total rain in mm) arrays of length `days`; short forecasts repeat their last day.
+    """
+    entries = forecast.get("list") or []
+    if not entries:
+        raise ValueError("Forecast has no entries.")
+    temps = np.array([entry["main"]["temp"] for entry in entries], dtype=np.float64)
+    rains = np.array([entry.get("rain", {}).get("3h", 0) for entry in entries], dtype=np.float64)
+    n_days = min(days, -(-len(entries) // STEPS_PER_DAY))
+    daily_temp = np.array([temps[d * STEPS_PER_DAY:(d + 1) * STEPS_PER_DAY].mean() for d in range(n_days)])
+    daily_rain = np.array([rains[d * STEPS_PER_DAY:(d + 1) * STEPS_PER_DAY].sum() for d in range(n_days)])
+    pad = days - n_days
+    return np.pad(daily_temp, (0, pad), mode="edge"), np.pad(daily_rain, (0, pad), mode="edge")
+
+
+async def get_forecast_data(http, lat, lon):
+    """Cached 5-day / 3-hour forecast for the grid cell containing (lat, lon)."""
+    cell_lat, cell_lon = grid_cell(lat, lon)
+    url = f"https://api.openweathermap.org/data/2.5/forecast?lat={cell_lat}&lon={cell_lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+    return await response_cache.aget_or_fetch("openweather_forecast", grid_key(lat, lon), lambda: http.get_json(url))
+
+
+async def forecast_for_cells(http, cell_lats, cell_lons, days=FORECAST_DAYS):
+    """Daily forecast per grid cell, fetched concurrently. Returns (temps, rains, fallback) with shape (cells, days)."""
+    semaphore = asyncio.Semaphore(WEATHER_FETCH_CONCURRENCY)
+
+    async def fetch(lat, lon):
+        async with semaphore:
+            try:
+                return daily_forecast(await get_forecast_data(http, lat, lon), days), False
+            except (UpstreamError, ValueError, KeyError, TypeError) as e:
+                print(f"WARN: Forecast unavailable for {lat:.4f},{lon:.4f} ({e}); using fallback weather.", file=sys.stderr)
+                temp, rain = FALLBACK_WEATHER
+                return (np.full(days, temp), np.full(days, rain)), True
+
+    results = await asyncio.gather(*(fetch(lat, lon) for lat, lon in zip(cell_lats.tolist(), cell_lons.tolist())))
+    temps = np.array([daily[0] for daily, _ in results])
+    rains = np.array([daily[1] for daily, _ in results])
+    return temps, rains, np.array([fallback for _, fallback in results])
+
+
+def simulate(initial, daily_loss, rain_gain, irrigate):
+    """
+    Steps the water balance for every plot under every scenario.
+    initial: (plots,), daily_loss / rain_gain: (plots, days), irrigate: (scenarios, days) bool.
+    Returns end-of-day moisture, shape (plots, scenarios, days).
+    """
+    n_plots, days = daily_loss.shape
+    moisture = np.repeat(initial[:, None], irrigate.shape[0], axis=1)
+    trajectory = np.empty((n_plots, irrigate.shape[0], days))
+    for day in range(days):
+        moisture = np.where(irrigate[None, :, day], np.maximum(moisture, FIELD_CAPACITY), moisture)
+        moisture = np.clip(moisture - daily_loss[:, day, None] + rain_gain[:, day, None], 0, 100)
+        trajectory[:, :, day] = moisture
+    return trajectory
+
+
+def schedule_costs(trajectory, irrigate):
+    """Score per (plot, scenario): stressed days, days below target, and the number of irrigations."""
+    stress_days = (trajectory < STRESS_THRESHOLD).sum(axis=-1)
+    low_days = ((trajectory >= STRESS_THRESHOLD) & (trajectory < TARGET_THRESHOLD)).sum(axis=-1)
+    return stress_days * STRESS_DAY_COST + low_days * LOW_DAY_COST + irrigate.sum(axis=-1)[None, :] * IRRIGATION_COST
+
+
+async def plan_irrigation(http, lats, lons, crops, days_since_last_irrigation, month=None, scenarios=None):
+    """
+    Simulates every plot under every scenario over the forecast and picks the cheapest schedule per plot.
+    Returns columnar output in input order.
+    """
+    lats, lons, days_since, crop_idx = plot_arrays(lats, lons, crops, days_since_last_irrigation)
+    scenarios = default_scenarios() if scenarios is None else [sorted(set(s)) for s in scenarios]
+    irrigate = scenario_mask(scenarios)
+    factor = month_factor(month)
+
+    centres, cell_of_plot = group_by_cell(lats, lons)
+    cell_temps, cell_rains, fallback = await forecast_for_cells(http, centres[:, 0], centres[:, 1])
+
+    daily_loss = (cell_temps[cell_of_plot] / 10) * (CROP_FACTORS[crop_idx] * factor)[:, None]
+    rain_gain = cell_rains[cell_of_plot] * RAIN_GAIN_PER_MM
+    # Starting point: the single-day model run backwards over the days since the last irrigation
+    initial = np.clip(FIELD_CAPACITY - daily_loss[:, 0] * days_since, 0, 100)
+
+    trajectory = simulate(initial, daily_loss, rain_gain, irrigate)
+    costs = schedule_costs(trajectory, irrigate)
+    best = np.argmin(costs, axis=1)
+    rows = np.arange(len(best))
+    best_trajectory = trajectory[rows, best]
+
+    return {
+        "count": len(lats),
+        "weather_cells": len(centres),
+        "fallback_weather_cells": int(fallback.sum()),
+        "days": FORECAST_DAYS,
+        "scenarios": scenarios,
+        "columns": {
+            "lat": lats.tolist(),
+            "lon": lons.tolist(),
+            "crop": [VALID_CROPS[i] for i in crop_idx.tolist()],
+            "initial_moisture": initial.tolist(),
+            "best_scenario": best.tolist(),
+            "irrigation_days": [scenarios[i] for i in best.tolist()],
+            "next_irrigation_day": [scenarios[i][0] if scenarios[i] else None for i in best.tolist()],
+            "stress_days": (best_trajectory < STRESS_THRESHOLD).sum(axis=1).tolist(),
+            "min_moisture": best_trajectory.min(axis=1).tolist(),
+            "moisture_trajectory": np.round(best_trajectory, 2).tolist(),
+            "scenario_costs": costs.tolist(),
+        },
+    }
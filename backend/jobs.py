@@ -0,0 +1,497 @@
+# backend/jobs.py
+#
+# Background job subsystem for long-running work (Earth Engine analyses, PDF reports).
+# POST /jobs/... returns a job id immediately; clients poll GET /jobs/{id} or get a webhook callback.
+#   - JobStore: job records and results persisted in SQLite, so finished results survive a restart
+#   - Broker: pluggable queue interface; InProcessBroker is the default, tests can pass any fake
+#   - JobRunner: N dispatcher threads; tasks run in those threads or in a process pool (JOB_WORKER_MODE)
+#   - identical in-flight jobs (same task + params) are deduplicated to one job id; every submitter's
+#     callback_url is kept (job_callbacks) and notified
+#   - tasks are registered by dotted path so they can be imported inside worker processes
+#   - every runner holds a heartbeat lease on the jobs it owns; only jobs whose lease lapsed (their worker died)
+#     are failed, so several workers can share one JOBS_DB_PATH
+#   - finished jobs and their artifacts are deleted after JOB_RETENTION_SECONDS
+#   - callback URLs must resolve to public addresses (or match JOB_WEBHOOK_ALLOWED_HOSTS), and webhooks connect to
+#     the address that was checked, so a host that re-resolves elsewhere (DNS rebinding) cannot redirect them
+
+import hashlib
+import importlib
+import ipaddress
+import json
+import os
+import queue
+import random
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "thread")  # "thread" or "process"
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "bitclimate_jobs.sqlite"))
+JOBS_ARTIFACT_DIR = os.getenv("JOBS_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "bitclimate_job_artifacts"))
+WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_RETRIES = int(os.getenv("JOB_WEBHOOK_RETRIES", "3"))
+# Comma-separated host names; when set, callbacks may only go to these hosts (internal ones included)
+WEBHOOK_ALLOWED_HOSTS = {host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()}
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # renewed every quarter lease while the worker is alive
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+ACTIVE_STATES = ("queued", "running")
+
+# Task name -> "module:function". Functions take the job params as keyword arguments plus
+# `progress` (a callable(done, total) or None) and return something JSON-serializable.
+# A result dict with "artifact_bytes" (+ "artifact_suffix") has them written to JOBS_ARTIFACT_DIR,
+# served by GET /jobs/{id}/artifact.
+TASKS = {
+    "analyze_area": "backend.jobs:analyze_area_task",
+    "analyze_area_large": "backend.gee_tiling:run_large_analysis",
+    "ghg_emissions": "backend.jobs:ghg_emissions_task",
+    "generate_report": "backend.jobs:generate_report_task",
+    "generate_report_batch": "backend.report_batch:generate_report_batch",
+}
+
+
+def resolve_task(name):
+    module_name, _, attr = TASKS[name].partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def dedup_key(kind, params):
+    canonical = json.dumps({"kind": kind, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ==============================================================================
+# Persistence
+# ==============================================================================
+_COLUMNS = ("id", "kind", "params", "dedup_key", "state", "progress", "result", "error",
+            "callback_url", "callback_status", "created_at", "started_at", "finished_at", "owner", "lease_expires_at")
+_JSON_COLUMNS = {"params", "progress", "result"}
+
+
+class JobStore:
+    """Job records in SQLite. Thread-safe; one connection guarded by a lock."""
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, dedup_key TEXT NOT NULL,"
+            " state TEXT NOT NULL, progress TEXT, result TEXT, error TEXT,"
+            " callback_url TEXT, callback_status TEXT,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL, owner TEXT, lease_expires_at REAL)"
+        )
+        self._add_missing_columns({"owner": "TEXT", "lease_expires_at": "REAL"})
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, state)")
+        # Callbacks of submitters that joined an identical in-flight job (the creator's is jobs.callback_url)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_callbacks ("
+            " job_id TEXT NOT NULL, url TEXT NOT NULL, status TEXT, PRIMARY KEY (job_id, url))"
+        )
+
+    def _add_missing_columns(self, columns):
+        """Upgrades a database created before the column existed (its active rows have no lease, so count as stale)."""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, sql_type in columns.items():
+            if name in existing:
+                continue
+            try:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {sql_type}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e):  # another worker upgraded it first
+                    raise
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def create_or_get_active(self, kind, params, callback_url=None, owner=None, lease_until=None):
+        """
+        Inserts a queued job leased to `owner`, unless an identical one is already queued/running
+        under a live lease. Returns (job, created).
+        """
+        key = dedup_key(kind, params)
+        now = time.time()
+        # One write transaction: a job cannot finish (and read its callbacks) between the check and the insert
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE dedup_key = ? AND state IN {ACTIVE_STATES} "
+                    "AND lease_expires_at >= ? ORDER BY created_at LIMIT 1", (key, now)
+                ).fetchone()
+                if row is not None:
+                    job = self._row_to_job(row)
+                    if callback_url and callback_url != job["callback_url"]:
+                        self._conn.execute("INSERT OR IGNORE INTO job_callbacks (job_id, url) VALUES (?, ?)", (job["id"], callback_url))
+                    self._conn.execute("COMMIT")
+                    return job, False
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, params, dedup_key, state, callback_url, created_at, owner, lease_expires_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(params), key, callback_url, now, owner, lease_until),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id), True
+
+    def extra_callbacks(self, job_id):
+        with self._lock:
+            return [url for (url,) in self._conn.execute("SELECT url FROM job_callbacks WHERE job_id = ? ORDER BY rowid", (job_id,))]
+
+    def set_callback_status(self, job_id, url, status):
+        with self._lock:
+            self._conn.execute("UPDATE job_callbacks SET status = ? WHERE job_id = ? AND url = ?", (status, job_id, url))
+
+    def claim(self, job_id, owner, lease_until):
+        """Moves a queued job to running under `owner`. False if it is gone or another worker claimed it first."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'running', started_at = ?, owner = ?, lease_expires_at = ? WHERE id = ? AND state = 'queued'",
+                (time.time(), owner, lease_until, job_id),
+            )
+        return cursor.rowcount == 1
+
+    def update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = [json.dumps(v) if name in _JSON_COLUMNS and v is not None else v for name, v in fields.items()]
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values, job_id))
+
+    def renew_leases(self, owner, lease_until):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND state IN {ACTIVE_STATES}", (lease_until, owner)
+            )
+
+    def fail_stale(self):
+        """Fails queued/running jobs whose owner stopped renewing its lease (a crashed or restarted worker)."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'failed', error = 'Interrupted: the worker running this job stopped.', finished_at = ? "
+                f"WHERE state IN {ACTIVE_STATES} AND (lease_expires_at IS NULL OR lease_expires_at < ?)", (now, now)
+            )
+        return cursor.rowcount
+
+    def purge_finished(self, before):
+        """Deletes jobs that finished before `before`. Returns their results, for artifact cleanup."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT result FROM jobs WHERE state NOT IN {ACTIVE_STATES} AND finished_at < ?", (before,)
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM job_callbacks WHERE job_id IN "
+                f"(SELECT id FROM jobs WHERE state NOT IN {ACTIVE_STATES} AND finished_at < ?)", (before,)
+            )
+            self._conn.execute(f"DELETE FROM jobs WHERE state NOT IN {ACTIVE_STATES} AND finished_at < ?", (before,))
+        return [json.loads(result) for (result,) in rows if result is not None]
+
+
+# ==============================================================================
+# Brokers
+# ==============================================================================
+class Broker:
+    """
+    Queue of job ids between the API and the workers.
+    Implement `put` and `get` to plug in another transport (Redis list, SQS, a test fake).
+    """
+
+    def put(self, job_id):
+        raise NotImplementedError
+
+    def get(self, timeout):
+        """Returns the next job id, or None if nothing arrived within `timeout` seconds."""
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def put(self, job_id):
+        self._queue.put(job_id)
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+# ==============================================================================
+# Workers
+# ==============================================================================
+def _execute(kind, params):
+    """Entry point inside worker processes (no progress reporting across the process boundary)."""
+    return resolve_task(kind)(progress=None, **params)
+
+
+class JobRunner:
+    def __init__(self, store, broker=None, workers=JOB_WORKERS, mode=JOB_WORKER_MODE, artifact_dir=JOBS_ARTIFACT_DIR,
+                 lease_seconds=JOB_LEASE_SECONDS, retention_seconds=JOB_RETENTION_SECONDS):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"JOB_WORKER_MODE must be 'thread' or 'process', got '{mode}'.")
+        self.store = store
+        self.broker = broker or InProcessBroker()
+        self.workers = workers
+        self.mode = mode
+        self.artifact_dir = artifact_dir
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._process_pool = None
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self.maintain()
+            if self.mode == "process":
+                self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            heartbeat.start()
+            self._threads.append(heartbeat)
+            print(f"INFO: Started {self.workers} job worker(s) in {self.mode} mode.")
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def submit(self, kind, params, callback_url=None):
+        """
+        Queues a job (or joins an identical in-flight one). Returns (job, created).
+        Raises CallbackURLError (a ValueError) for a callback_url the server will not call.
+        """
+        if kind not in TASKS:
+            raise ValueError(f"Unknown job type '{kind}'.")
+        if callback_url:
+            validate_callback_url(callback_url)
+        self.start()
+        job, created = self.store.create_or_get_active(kind, params, callback_url, self.owner, time.time() + self.lease_seconds)
+        if created:
+            self.broker.put(job["id"])
+        return job, created
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            job_id = self.broker.get(timeout=0.5)
+            if job_id is not None:
+                self._run(job_id)
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.lease_seconds / 4):
+            try:
+                self.maintain()
+            except sqlite3.Error as e:
+                print(f"WARN: Job maintenance failed: {e}", file=sys.stderr)
+
+    def maintain(self):
+        """Renews this runner's leases, fails jobs whose worker died, and deletes jobs past retention."""
+        self.store.renew_leases(self.owner, time.time() + self.lease_seconds)
+        interrupted = self.store.fail_stale()
+        if interrupted:
+            print(f"WARN: Marked {interrupted} job(s) whose worker stopped as failed.", file=sys.stderr)
+        expired = self.store.purge_finished(time.time() - self.retention_seconds)
+        for result in expired:
+            if isinstance(result, dict) and "artifact" in result:
+                try:
+                    os.remove(os.path.join(self.artifact_dir, result["artifact"]))
+                except FileNotFoundError:
+                    pass
+        if expired:
+            print(f"INFO: Deleted {len(expired)} job(s) past the retention period.")
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or not self.store.claim(job_id, self.owner, time.time() + self.lease_seconds):
+            return
+
+        def progress(done, total):
+            self.store.update(job_id, progress={"done": done, "total": total})
+
+        try:
+            if self._process_pool is not None:
+                result = self._process_pool.submit(_execute, job["kind"], job["params"]).result()
+            else:
+                result = resolve_task(job["kind"])(progress=progress, **job["params"])
+            result = self._keep_artifact(job_id, result)
+            self.store.update(job_id, state="succeeded", result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"ERROR: Job {job_id} ({job['kind']}) failed: {e}", file=sys.stderr)
+            self.store.update(job_id, state="failed", error=str(e), finished_at=time.time())
+
+        extra = self.store.extra_callbacks(job_id)
+        if job["callback_url"] or extra:
+            payload = self.status(job_id)
+            payload.pop("callback_status", None)  # the creator's delivery status is not for the other subscribers
+            if job["callback_url"]:
+                self.store.update(job_id, callback_status=send_webhook(job["callback_url"], payload))
+            for url in extra:
+                self.store.set_callback_status(job_id, url, send_webhook(url, payload))
+
+    def _keep_artifact(self, job_id, result):
+        if not isinstance(result, dict) or "artifact_bytes" not in result:
+            return result
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        data = result.pop("artifact_bytes")
+        target = os.path.join(self.artifact_dir, job_id + result.pop("artifact_suffix", ""))
+        with open(target, "wb") as f:
+            f.write(data)
+        return {**result, "artifact": os.path.basename(target)}
+
+    def artifact_path(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or not isinstance(job["result"], dict) or "artifact" not in job["result"]:
+            return None
+        path = os.path.join(self.artifact_dir, job["result"]["artifact"])
+        return path if os.path.exists(path) else None
+
+    def status(self, job_id):
+        """Public view of a job for GET /jobs/{id} and webhooks (None if unknown)."""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        status = {key: job[key] for key in ("kind", "state", "progress", "created_at", "started_at", "finished_at")}
+        status["job_id"] = job["id"]
+        if job["state"] == "succeeded":
+            status["result"] = job["result"]
+        if job["error"]:
+            status["error"] = job["error"]
+        if job["callback_url"]:
+            status["callback_status"] = job["callback_status"]
+        return status
+
+
+class CallbackURLError(ValueError):
+    """A callback_url the server refuses to call: not http(s), unresolvable, or pointing at a non-public address."""
+
+
+def resolve_host(host, port):
+    return {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+
+
+def validate_callback_url(url):
+    """
+    Keeps webhooks from reaching the server's own network (SSRF): with JOB_WEBHOOK_ALLOWED_HOSTS set the host
+    must be listed, otherwise every address it resolves to must be public.
+    Returns the checked addresses (sorted), or None for an allow-listed host.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        raise CallbackURLError("callback_url has an invalid port.")
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise CallbackURLError("callback_url must be an http(s) URL.")
+    host = parsed.hostname.lower()
+    if WEBHOOK_ALLOWED_HOSTS:
+        if host not in WEBHOOK_ALLOWED_HOSTS:
+            raise CallbackURLError(f"callback_url host '{host}' is not in JOB_WEBHOOK_ALLOWED_HOSTS.")
+        return None
+    try:
+        addresses = resolve_host(host, port)
+    except (OSError, UnicodeError):
+        raise CallbackURLError(f"callback_url host '{host}' could not be resolved.")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise CallbackURLError(f"callback_url must point at a public address; '{host}' resolves to {ip}.")
+    return sorted(addresses)
+
+
+def post_pinned(client, url, payload, address):
+    """
+    POSTs to `address` instead of letting httpx resolve the host a second time, when it could get an internal
+    address back. The Host header and TLS SNI (so the certificate check) still use the URL's own host name.
+    """
+    if address is None:
+        return client.post(url, json=payload)
+    target = httpx.URL(url)
+    return client.post(target.copy_with(host=address), json=payload, headers={"Host": target.netloc.decode("ascii")},
+                       extensions={"sni_hostname": target.raw_host.decode("ascii")})
+
+
+def send_webhook(url, payload):
+    """POSTs the job status to the client's callback URL. Returns a short delivery status for the job record."""
+    # Checked again at delivery: the host may resolve somewhere else by now (redirects are not followed)
+    try:
+        addresses = validate_callback_url(url)
+    except CallbackURLError as e:
+        print(f"WARN: Webhook to {url} blocked: {e}", file=sys.stderr)
+        return "blocked"
+    with httpx.Client(timeout=WEBHOOK_TIMEOUT) as client:
+        for attempt in range(WEBHOOK_RETRIES):
+            if attempt:
+                time.sleep(random.uniform(0, 0.5 * (2 ** attempt)))
+            try:
+                # Retries move on to the host's next checked address
+                response = post_pinned(client, url, payload, addresses[attempt % len(addresses)] if addresses else None)
+                if response.status_code < 500:
+                    return f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                print(f"WARN: Webhook to {url} failed (attempt {attempt + 1}): {e}", file=sys.stderr)
+    return "failed"
+
+
+# ==============================================================================
+# Built-in tasks (imports stay inside so worker processes load only what they run)
+# ==============================================================================
+def analyze_area_task(geojson, start_date, end_date, progress=None):
+    from backend.gee_utils import analyze_area
+    start_map, end_map_overlay, stats = analyze_area(geojson, start_date, end_date)
+    return {"start_map": start_map, "end_map_overlay": end_map_overlay, "stats": stats}
+
+
+def ghg_emissions_task(bounds, date, progress=None):
+    from backend.ghg_detector import analyze_no2_for_area
+    return analyze_no2_for_area(bounds=bounds, date_str=date)
+
+
+def generate_report_task(stats, start_map, end_map, start_date, end_date, progress=None):
+    from backend.pdf_report import get_or_create_pdf_report
+    pdf = get_or_create_pdf_report(stats, start_map, end_map, start_date, end_date)
+    return {"artifact_bytes": pdf, "artifact_suffix": ".pdf", "media_type": "application/pdf"}
+
+
+job_runner = JobRunner(JobStore())
@@ -0,0 +1,92 @@
+# backend/lazy.py
+#
+# Lazy, thread-safe accessors for heavy dependencies (ML models, Earth Engine session, API clients).
+# Nothing is loaded at import time; the first caller pays the cost and everyone else reuses the result.
+
+import asyncio
+import sys
+import threading
+import time
+
+from backend.metrics import span
+
+_REGISTRY = {}
+
+
+class LazyResource:
+    """
+    Loads a value on first use with double-checked locking.
+    A failed load is remembered (for /health/ready) and retried on the next call.
+    """
+
+    def __init__(self, name, loader, register=True):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self._load_seconds = None
+        self._error = None
+        if register:
+            _REGISTRY[name] = self
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    with span(f"load.{self.name}"):
+                        self._value = self._loader()
+                except Exception as e:
+                    self._error = f"{type(e).__name__}: {e}"
+                    raise
+                self._load_seconds = round(time.perf_counter() - start, 3)
+                self._error = None
+                self._loaded = True
+        return self._value
+
+    async def aget(self):
+        """Same as get(), but a cold load runs in a worker thread instead of blocking the event loop."""
+        if self._loaded:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._loaded = False
+            self._load_seconds = None
+
+    def status(self):
+        return {"loaded": self._loaded, "load_seconds": self._load_seconds, "error": self._error}
+
+
+def readiness():
+    """Status of every registered resource, keyed by name."""
+    return {name: resource.status() for name, resource in _REGISTRY.items()}
+
+
+def warm_up(names=None):
+    """Loads the named resources (all registered ones if names is None). Errors are logged, not raised."""
+    for name in names if names is not None else list(_REGISTRY):
+        resource = _REGISTRY.get(name)
+        if resource is None:
+            print(f"WARN: Unknown resource '{name}' requested for warm-up.", file=sys.stderr)
+            continue
+        try:
+            resource.get()
+            print(f"INFO: Warmed up '{name}' in {resource.status()['load_seconds']}s.")
+        except Exception as e:
+            print(f"ERROR: Warm-up of '{name}' failed: {e}", file=sys.stderr)
+
+
+def start_background_warm_up(names=None):
+    thread = threading.Thread(target=warm_up, args=(names,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
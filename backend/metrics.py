@@ -0,0 +1,207 @@
+# backend/metrics.py
+#
+# Request-level timing in Prometheus text format (served at /metrics), without a client library.
+#   - MetricsMiddleware (pure ASGI, so streaming responses pass straight through): per-route latency
+#     histogram, in-flight gauge, request and error counters. Routes are labelled by their path template
+#     ("/jobs/{job_id}"), never the raw path, so label cardinality stays bounded.
+#   - span(name): times a named block (EE getInfo, upstream HTTP, image decode, PDF phases, ...) into a
+#     histogram. Spans finished before the response starts are also returned in a Server-Timing header
+#     when METRICS_SERVER_TIMING=1 or the request sends "X-Server-Timing: 1".
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.routing import Match
+
+METRICS_PREFIX = "bitclimate"
+SERVER_TIMING_ALWAYS = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+# Seconds; the long tail covers Earth Engine reductions and report rendering
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+UNMATCHED_ROUTE = "<unmatched>"
+
+_request_spans = ContextVar("request_spans", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(f"{name}_total", help_text, labelnames)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def add(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, ([*counts], total, n)) for k, (counts, total, n) in self._values.items())
+        lines = self._header()
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {n}")
+        return lines
+
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Request latency by route.", ("method", "route"))
+REQUESTS = Counter("http_requests", "Requests by route and status code.", ("method", "route", "status"))
+REQUEST_ERRORS = Counter("http_request_errors", "5xx responses and unhandled exceptions by route.", ("method", "route", "kind"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.", ("method", "route"))
+SPAN_DURATION = Histogram("span_duration_seconds", "Time spent in named spans inside requests and jobs.", ("span",))
+SPAN_ERRORS = Counter("span_errors", "Spans that exited with an exception.", ("span",))
+REGISTRY = [REQUEST_DURATION, REQUESTS, REQUEST_ERRORS, IN_FLIGHT, SPAN_DURATION, SPAN_ERRORS]
+
+
+def render_metrics():
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+@contextmanager
+def span(name):
+    """Times the block as `name`. Works in threads too (the Server-Timing part only within the request's context)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_DURATION.observe(elapsed, name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+
+def server_timing_header(spans, total):
+    """Aggregates spans by name: `name;dur=<ms>[;desc="<n>x"]`, plus the whole request as `app`."""
+    totals = {}
+    for name, seconds in spans:
+        entry = totals.setdefault(_TOKEN_UNSAFE.sub("_", name), [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [f'{name};dur={seconds * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else "")
+             for name, (seconds, count) in totals.items()]
+    return ", ".join(parts + [f"app;dur={total * 1000:.1f}"])
+
+
+def route_label(scope):
+    """Path template of the route that will handle the request (matched up front, as the router would)."""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_label(scope)
+        wants_timing = SERVER_TIMING_ALWAYS or (b"x-server-timing", b"1") in scope.get("headers", [])
+        spans = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_timing:
+                    header = server_timing_header(spans, time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        IN_FLIGHT.add(method, route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            REQUEST_ERRORS.inc(method, route, "exception")
+            raise
+        finally:
+            IN_FLIGHT.add(method, route, amount=-1)
+            _request_spans.reset(token)
+            REQUEST_DURATION.observe(time.perf_counter() - start, method, route)
+            REQUESTS.inc(method, route, str(status))
+            if status >= 500:
+                REQUEST_ERRORS.inc(method, route, "5xx")
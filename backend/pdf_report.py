@@ -2,84 +2,158 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RL
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
+import hashlib
+import io
+import os
 import tempfile
-import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def create_pdf_report(stats, start_map, end_map, start_date, end_date):
-    pdf_path = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf").name
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+import httpx
+
+from backend.disk_cache import DiskLRU
+from backend.metrics import span
+
+IMAGE_TIMEOUT = 20
+
+# Finished PDFs by content hash; size-bounded, so repeated reports never grow the disk without limit
+report_cache = DiskLRU(
+    os.getenv("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bitclimate_reports")),
+    max_bytes=int(os.getenv("REPORT_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+)
+
+
+def report_key(stats, start_map, end_map, start_date, end_date):
+    """Content hash of everything that goes into a report."""
+    stats_dict = json.loads(stats) if isinstance(stats, str) else stats
+    canonical = json.dumps([stats_dict, start_map, end_map, start_date, end_date], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def download_image(url, client=None):
+    """PNG bytes of a thumbnail, or None if it could not be fetched."""
+    try:
+        get = client.get if client is not None else httpx.get
+        resp = get(url, timeout=IMAGE_TIMEOUT, follow_redirects=True)
+        if resp.is_success:
+            return resp.content
+    except Exception as e:
+        print(f"Failed to download image: {e}")
+    return None
+
+
+def download_images(start_map, end_map):
+    """Both thumbnails, fetched concurrently."""
+    with span("pdf.fetch_images"), ThreadPoolExecutor(max_workers=2) as pool:
+        return tuple(pool.map(download_image, (start_map, end_map)))
+
+
+def get_or_create_pdf_report(stats, start_map, end_map, start_date, end_date, images=None):
+    """
+    create_pdf_report through the content-hash report cache. Returns the PDF bytes.
+    A report missing a thumbnail (failed download) is returned but not cached, so the next request retries.
+    """
+    key = report_key(stats, start_map, end_map, start_date, end_date)
+    pdf = report_cache.get(key)
+    if pdf is None:
+        if images is None:
+            images = download_images(start_map, end_map)
+        pdf = create_pdf_report(stats, start_map, end_map, start_date, end_date, images=images)
+        if all(images):
+            report_cache.set(key, pdf)
+    return pdf
+
+
+# --- Styles: built once per process and shared by every report ---
+def _build_styles():
     styles = getSampleStyleSheet()
-    
-    # --- Custom Styles ---
-    title_style = ParagraphStyle("TitleStyle", parent=styles["Title"], alignment=1, fontSize=24, spaceAfter=12)
-    header_style = ParagraphStyle("HeaderStyle", parent=styles["h2"], alignment=0, fontSize=14, spaceBefore=12, spaceAfter=6)
-    normal_center = ParagraphStyle("NormalCenter", parent=styles["Normal"], alignment=1, spaceAfter=12)
-    footer_style = ParagraphStyle("Footer", parent=styles["Normal"], alignment=1, fontSize=8, textColor=colors.grey)
-    image_label_style = ParagraphStyle("ImageLabel", parent=styles["Normal"], alignment=1, fontSize=9)
-    # ---------------------
+    return {
+        "title": ParagraphStyle("TitleStyle", parent=styles["Title"], alignment=1, fontSize=24, spaceAfter=12),
+        "header": ParagraphStyle("HeaderStyle", parent=styles["h2"], alignment=0, fontSize=14, spaceBefore=12, spaceAfter=6),
+        "normal_center": ParagraphStyle("NormalCenter", parent=styles["Normal"], alignment=1, spaceAfter=12),
+        "footer": ParagraphStyle("Footer", parent=styles["Normal"], alignment=1, fontSize=8, textColor=colors.grey),
+        "image_label": ParagraphStyle("ImageLabel", parent=styles["Normal"], alignment=1, fontSize=9),
+        "normal": styles["Normal"],
+    }
+
+
+STYLES = _build_styles()
+STATS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#34495E")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+IMAGE_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0,0), (-1,-1), 'TOP'),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER')
+])
+DOC_MARGINS = dict(rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
 
+def report_elements(stats, start_date, end_date, images, title="Deforestation Analysis Report", title_style=None):
+    """Flowables for one region's report. `images` is a (start_png_bytes, end_png_bytes) pair (None entries allowed)."""
     elements = []
-    
+
     # --- Header ---
-    elements.append(Paragraph("Deforestation Analysis Report", title_style))
-    elements.append(Paragraph(f"Analysis Period: {start_date} to {end_date}", normal_center))
+    elements.append(Paragraph(title, title_style or STYLES["title"]))
+    elements.append(Paragraph(f"Analysis Period: {start_date} to {end_date}", STYLES["normal_center"]))
     elements.append(Spacer(1, 24))
-    
+
     # --- Statistics Table ---
-    elements.append(Paragraph("Summary Statistics", header_style))
+    elements.append(Paragraph("Summary Statistics", STYLES["header"]))
     stats_dict = json.loads(stats) if isinstance(stats, str) else stats
     data = [["Metric", "Value"]]
     for k, v in stats_dict.items():
         data.append([str(k), str(v)])
 
     table = Table(data, hAlign="LEFT", colWidths=[200, 100])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#34495E")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    table.setStyle(STATS_TABLE_STYLE)
     elements.append(table)
     elements.append(Spacer(1, 24))
 
     # --- Imagery Section ---
-    elements.append(Paragraph("Visual Comparison", header_style))
-
-    def download_image(url):
-        try:
-            resp = requests.get(url, timeout=20)
-            if resp.ok:
-                tmp_img = tempfile.NamedTemporaryFile(delete=False, suffix=".png").name
-                with open(tmp_img, "wb") as f: f.write(resp.content)
-                return tmp_img
-        except Exception as e: 
-            print(f"Failed to download image: {e}")
-            return None
-
-    start_img_path = download_image(start_map)
-    end_img_path = download_image(end_map)
-
-    if start_img_path and end_img_path:
+    elements.append(Paragraph("Visual Comparison", STYLES["header"]))
+
+    start_img, end_img = (io.BytesIO(img) if img else None for img in images)
+    if start_img and end_img:
         # Create a table to hold images and their labels
-        img1 = RLImage(start_img_path, width=220, height=220)
-        label1 = Paragraph(f"Before: {start_date}", image_label_style)
-        img2 = RLImage(end_img_path, width=220, height=220)
-        label2 = Paragraph(f"After: {end_date} (with overlay)", image_label_style)
-        
+        img1 = RLImage(start_img, width=220, height=220)
+        label1 = Paragraph(f"Before: {start_date}", STYLES["image_label"])
+        img2 = RLImage(end_img, width=220, height=220)
+        label2 = Paragraph(f"After: {end_date} (with overlay)", STYLES["image_label"])
+
         image_table = Table([[ (img1, label1), (img2, label2) ]], colWidths=[240, 240])
-        image_table.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER')
-        ]))
+        image_table.setStyle(IMAGE_TABLE_STYLE)
         elements.append(image_table)
-    
+
     elements.append(Spacer(1, 48))
-    elements.append(Paragraph(f"Report generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", footer_style))
-    
-    doc.build(elements)
-    return pdf_path
\ No newline at end of file
+    elements.append(Paragraph(f"Report generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", STYLES["footer"]))
+    return elements
+
+
+def render_pdf(elements):
+    """Builds flowables into an in-memory PDF. Returns (pdf_bytes, page_count)."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, **DOC_MARGINS)
+    with span("pdf.render"):
+        doc.build(elements)
+    return buffer.getvalue(), doc.page
+
+
+def create_pdf_report(stats, start_map, end_map, start_date, end_date, images=None, title="Deforestation Analysis Report"):
+    """
+    Builds the deforestation PDF in memory and returns its bytes. Nothing is written to disk.
+    `images` is an optional (start_png_bytes, end_png_bytes) pair that the caller already
+    downloaded (None for a failed download); without it the thumbnails are fetched here.
+    """
+    if images is None:
+        images = download_images(start_map, end_map)
+    with span("pdf.elements"):
+        elements = report_elements(stats, start_date, end_date, images, title=title)
+    pdf, _ = render_pdf(elements)
+    return pdf
@@ -0,0 +1,218 @@
+# backend/profiler.py
+#
+# On-demand statistical profiler for production workers (admin only, see POST /admin/profile).
+# While a session runs, a daemon thread snapshots every thread's stack with sys._current_frames()
+# every PROFILER_INTERVAL_MS and counts the collapsed stacks. Nothing runs between sessions: the
+# sampler thread only exists during a session and the middleware is a single attribute check.
+#   - time mode:     sample everything for N seconds
+#   - requests mode: sample only while one of the next N requests to a route is in flight
+# Output is collapsed stacks (flamegraph.pl / speedscope import) or the speedscope JSON format.
+# The event loop runs on the main thread, so a blocking call shows up under "MainThread".
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from backend.metrics import route_label
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_MAX_WAIT_SECONDS = float(os.getenv("PROFILER_MAX_WAIT_SECONDS", "300"))  # requests mode
+PROFILER_MAX_DEPTH = 128
+OUTPUT_FORMATS = ("collapsed", "speedscope")
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+def admin_enabled():
+    return bool(os.getenv("ADMIN_TOKEN"))
+
+
+def check_admin_token(token):
+    """True if `token` matches ADMIN_TOKEN. Always False when no ADMIN_TOKEN is configured."""
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def _frame_label(code):
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    def __init__(self, interval, route=None, max_requests=None):
+        self.interval = interval
+        self.route = route
+        self.max_requests = max_requests
+        self.started_requests = 0
+        self.finished_requests = 0
+        self.active_requests = 0
+        self.stacks = Counter()   # (thread name, frame labels root-first) -> samples
+        self.samples = 0
+        self.started_at = time.time()
+        self.sampling_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._done = None
+
+    # --- requests mode: called by ProfilerMiddleware on the event loop ---
+    def try_enter(self):
+        if self.started_requests >= self.max_requests:
+            return False
+        self.started_requests += 1
+        self.active_requests += 1
+        return True
+
+    def exit(self):
+        self.active_requests -= 1
+        self.finished_requests += 1
+        if self.finished_requests >= self.max_requests:
+            self._done.set()
+
+    # --- sampler thread ---
+    def _should_sample(self):
+        return self.route is None or self.active_requests > 0
+
+    def _run(self):
+        own = threading.get_ident()
+        code_labels = {}
+        while not self._stop.wait(self.interval):
+            if not self._should_sample():
+                continue
+            start = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < PROFILER_MAX_DEPTH:
+                    code = frame.f_code
+                    label = code_labels.get(code)
+                    if label is None:
+                        label = code_labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                self.stacks[(names.get(ident, f"thread-{ident}"), tuple(reversed(stack)))] += 1
+            self.samples += 1
+            self.sampling_seconds += time.perf_counter() - start
+
+    def start(self):
+        self._done = asyncio.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)  # one sample at most; the stacks are read right after
+
+    def summary(self):
+        return {"samples": self.samples, "interval_ms": self.interval * 1000, "route": self.route,
+                "requests": self.finished_requests if self.route else None,
+                "seconds": round(time.time() - self.started_at, 3),
+                "sampler_overhead_ms": round(self.sampling_seconds * 1000, 1)}
+
+
+class Profiler:
+    """One session at a time; `session` is None whenever the profiler is idle."""
+
+    def __init__(self):
+        self.session = None
+
+    def _begin(self, session):
+        if self.session is not None:
+            raise ProfilerBusyError("A profiling session is already running.")
+        self.session = session
+        session.start()
+
+    def _end(self, session):
+        session.stop()
+        self.session = None
+
+    async def profile_for(self, seconds, interval_ms=PROFILER_INTERVAL_MS):
+        if not 0 < seconds <= PROFILER_MAX_SECONDS:
+            raise ValueError(f"seconds must be in (0, {PROFILER_MAX_SECONDS:g}].")
+        session = ProfileSession(interval_ms / 1000)
+        self._begin(session)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._end(session)
+        return session
+
+    async def profile_requests(self, route, count, interval_ms=PROFILER_INTERVAL_MS, timeout=PROFILER_MAX_WAIT_SECONDS):
+        """Samples while any of the next `count` requests to `route` is in flight. Returns early on timeout."""
+        if count < 1:
+            raise ValueError("requests must be at least 1.")
+        session = ProfileSession(interval_ms / 1000, route=route, max_requests=count)
+        self._begin(session)
+        try:
+            await asyncio.wait_for(session._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._end(session)
+        return session
+
+
+profiler = Profiler()
+
+
+class ProfilerMiddleware:
+    """Marks requests to the profiled route as in flight (requests mode). Idle cost: one attribute check."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        if session is None or session.route is None or scope["type"] != "http" or route_label(scope) != session.route \
+                or not session.try_enter():
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.exit()
+
+
+# ==============================================================================
+# Output
+# ==============================================================================
+def to_collapsed(session):
+    """Brendan Gregg's folded format: `thread;outer;...;inner <samples>` per line."""
+    lines = [";".join((thread,) + stack) + f" {count}" for (thread, stack), count in session.stacks.most_common()]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(session, name="bitclimate"):
+    """speedscope file format: one sampled profile per thread, weights in milliseconds."""
+    frames, frame_index, by_thread = [], {}, {}
+    for (thread, stack), count in session.stacks.items():
+        indices = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(frame_index[label])
+        samples, weights = by_thread.setdefault(thread, ([], []))
+        samples.append(indices)
+        weights.append(count * session.interval * 1000)
+
+    profiles = [{
+        "type": "sampled", "name": thread, "unit": "milliseconds", "startValue": 0,
+        "endValue": sum(weights), "samples": samples, "weights": weights,
+    } for thread, (samples, weights) in sorted(by_thread.items())]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "bitclimate-profiler",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "activeProfileIndex": 0,
+    }
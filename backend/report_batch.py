@@ -0,0 +1,221 @@
+# backend/report_batch.py
+#
+# Batch deforestation reports for many regions (run as the "generate_report_batch" job).
+#   1. every thumbnail is prefetched once through a bounded thread pool sharing one HTTP client
+#   2. regions render independently in a process pool (REPORT_RENDER_WORKERS, one per core by default),
+#      reusing the precompiled styles in pdf_report; cached regions skip rendering entirely, and regions
+#      whose thumbnails failed to download are rendered without them but never cached. The pool is started
+#      with "spawn": batches run on job threads (or in a JobRunner worker process), and forking a threaded
+#      process can copy a held lock into the child and hang it
+#   3. output is a zip of per-region PDFs, or one combined PDF with a table of contents
+#      (merged with `pypdf`; where it is not installed the combined PDF is built in one process)
+
+import io
+import multiprocessing
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import httpx
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import BaseDocTemplate, Frame, PageBreak, PageTemplate, Paragraph, Spacer, Table
+from reportlab.platypus.tableofcontents import TableOfContents
+
+from backend.pdf_report import (
+    DOC_MARGINS, STATS_TABLE_STYLE, STYLES, download_image, render_pdf, report_cache, report_elements, report_key,
+)
+
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", str(os.cpu_count() or 1)))
+REPORT_FETCH_WORKERS = int(os.getenv("REPORT_FETCH_WORKERS", "16"))
+REPORT_BATCH_MAX_REGIONS = int(os.getenv("REPORT_BATCH_MAX_REGIONS", "500"))
+OUTPUT_FORMATS = ("zip", "pdf")
+_PAGE_MARKER = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def region_title(record, index):
+    return record.get("region") or f"Region {index + 1}"
+
+
+def validate_records(records, output):
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_FORMATS)}.")
+    if not records:
+        raise ValueError("No regions given.")
+    if len(records) > REPORT_BATCH_MAX_REGIONS:
+        raise ValueError(f"Too many regions: {len(records)} (max {REPORT_BATCH_MAX_REGIONS}).")
+    required = ("stats", "start_map", "end_map", "start_date", "end_date")
+    for i, record in enumerate(records):
+        missing = [key for key in required if record.get(key) in (None, "")]
+        if missing:
+            raise ValueError(f"Region {i + 1} is missing: {', '.join(missing)}.")
+
+
+def prefetch_images(records, workers=REPORT_FETCH_WORKERS):
+    """Downloads every distinct thumbnail URL once. Returns {url: bytes or None}."""
+    urls = sorted({record[key] for record in records for key in ("start_map", "end_map")})
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    with httpx.Client(limits=limits) as client, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-fetch") as pool:
+        return dict(zip(urls, pool.map(lambda url: download_image(url, client), urls)))
+
+
+def regions_missing_images(records, images_by_url):
+    """Titles of the regions with a thumbnail that could not be downloaded."""
+    return [region_title(record, i) for i, record in enumerate(records)
+            if images_by_url.get(record["start_map"]) is None or images_by_url.get(record["end_map"]) is None]
+
+
+def count_pages(pdf):
+    return len(_PAGE_MARKER.findall(pdf))
+
+
+def _render_region(record, images, title):
+    """Worker-process entry point: one region's standalone PDF."""
+    return render_pdf(report_elements(record["stats"], record["start_date"], record["end_date"], images, title=title))
+
+
+def render_regions(records, images_by_url, workers=REPORT_RENDER_WORKERS, progress=None):
+    """Returns [(pdf_bytes, pages)] in record order, rendering cache misses in parallel."""
+    results = [None] * len(records)
+    todo = []
+    for i, record in enumerate(records):
+        title = f"Deforestation Analysis Report: {region_title(record, i)}"
+        key = report_key(record["stats"], record["start_map"], record["end_map"], record["start_date"], record["end_date"]) + ":" + title
+        cached = report_cache.get(key)
+        if cached is not None:
+            results[i] = (cached, count_pages(cached))
+        else:
+            images = (images_by_url.get(record["start_map"]), images_by_url.get(record["end_map"]))
+            # An incomplete report is not cached, so the next batch retries the download
+            todo.append((i, key if all(images) else None, (record, images, title)))
+
+    done = len(records) - len(todo)
+    if progress:
+        progress(done, len(records))
+
+    def finish(i, key, rendered):
+        nonlocal done
+        results[i] = rendered
+        if key is not None:
+            report_cache.set(key, rendered[0])
+        done += 1
+        if progress:
+            progress(done, len(records))
+
+    if workers <= 1 or len(todo) <= 1:
+        for i, key, args in todo:
+            finish(i, key, _render_region(*args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_render_region, *args): (i, key) for i, key, args in todo}
+            for future in as_completed(futures):
+                finish(*futures[future], future.result())
+    return results
+
+
+# ==============================================================================
+# Output
+# ==============================================================================
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")[:60] or "region"
+
+
+def build_zip(records, rendered):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, (record, (pdf, _)) in enumerate(zip(records, rendered)):
+            zf.writestr(f"{i + 1:03d}_{_slug(region_title(record, i))}.pdf", pdf)
+    return buffer.getvalue()
+
+
+def _toc_pdf(entries):
+    """TOC pages from (title, period, first_page) rows. Returns (pdf_bytes, pages)."""
+    rows = [["Region", "Analysis Period", "Page"]] + [[Paragraph(title, STYLES["normal"]), period, str(page)] for title, period, page in entries]
+    table = Table(rows, colWidths=[250, 140, 60], repeatRows=1, hAlign="LEFT")
+    table.setStyle(STATS_TABLE_STYLE)
+    return render_pdf([Paragraph("Deforestation Reports: Table of Contents", STYLES["title"]), Spacer(1, 12), table])
+
+
+def build_combined(records, rendered):
+    """Table of contents followed by every region's report, with a PDF bookmark per region."""
+    from pypdf import PdfReader, PdfWriter
+
+    titles = [region_title(record, i) for i, record in enumerate(records)]
+    periods = [f"{record['start_date']} to {record['end_date']}" for record in records]
+
+    def entries(offset):
+        first_pages, page = [], offset + 1
+        for _, pages in rendered:
+            first_pages.append(page)
+            page += pages
+        return list(zip(titles, periods, first_pages))
+
+    # The TOC length depends only on the number of rows, so one dry run gives the page offset
+    _, toc_pages = _toc_pdf(entries(0))
+    toc_rows = entries(toc_pages)
+    toc, _ = _toc_pdf(toc_rows)
+
+    writer = PdfWriter()
+    writer.append(PdfReader(io.BytesIO(toc)))
+    for (title, _, first_page), (pdf, _) in zip(toc_rows, rendered):
+        writer.append(PdfReader(io.BytesIO(pdf)))
+        writer.add_outline_item(title, first_page - 1)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class _TocDocTemplate(BaseDocTemplate):
+    def __init__(self, buffer):
+        super().__init__(buffer, pagesize=A4, **DOC_MARGINS)
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id="normal")
+        self.addPageTemplates([PageTemplate(id="page", frames=[frame])])
+
+    def afterFlowable(self, flowable):
+        if isinstance(flowable, Paragraph) and flowable.style.name == "RegionTitle":
+            self.notify("TOCEntry", (0, flowable.getPlainText(), self.page))
+
+
+def build_combined_single_process(records, images_by_url):
+    """Fallback without pypdf: one ReportLab document, TOC resolved by multiBuild (no parallel rendering)."""
+    region_style = ParagraphStyle("RegionTitle", parent=STYLES["title"])
+    toc = TableOfContents()
+    elements = [Paragraph("Deforestation Reports: Table of Contents", STYLES["title"]), toc]
+    for i, record in enumerate(records):
+        images = (images_by_url.get(record["start_map"]), images_by_url.get(record["end_map"]))
+        elements.append(PageBreak())
+        elements += report_elements(record["stats"], record["start_date"], record["end_date"], images,
+                                    title=region_title(record, i), title_style=region_style)
+    buffer = io.BytesIO()
+    _TocDocTemplate(buffer).multiBuild(elements)
+    return buffer.getvalue()
+
+
+def generate_report_batch(regions, output="zip", progress=None):
+    """Job task: renders every region and returns the zip / combined PDF as the job artifact."""
+    validate_records(regions, output)
+    images_by_url = prefetch_images(regions)
+    missing = sum(1 for img in images_by_url.values() if img is None)
+    summary = {"regions": len(regions), "missing_images": missing,
+               "regions_missing_images": regions_missing_images(regions, images_by_url)}
+
+    if output == "pdf":
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            print("WARN: pypdf is not installed; building the combined report in a single process.", file=sys.stderr)
+            if progress:
+                progress(0, len(regions))
+            data = build_combined_single_process(regions, images_by_url)
+            if progress:
+                progress(len(regions), len(regions))
+            return {"artifact_bytes": data, "artifact_suffix": ".pdf", "media_type": "application/pdf", **summary}
+
+    rendered = render_regions(regions, images_by_url, progress=progress)
+    if output == "pdf":
+        data, suffix, media_type = build_combined(regions, rendered), ".pdf", "application/pdf"
+    else:
+        data, suffix, media_type = build_zip(regions, rendered), ".zip", "application/zip"
+    return {"artifact_bytes": data, "artifact_suffix": suffix, "media_type": media_type, **summary}
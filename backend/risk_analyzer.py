@@ -1,8 +1,17 @@
 import json
 import math
+import re
+import difflib
+import unicodedata
 from datetime import datetime
 import random
 
+import numpy as np
+
+from backend.lazy import LazyResource
+
+EARTH_RADIUS_KM = 6371
+
 def load_city_data():
     """city_data.json se shehron ka data load karta hai."""
     try:
@@ -17,13 +26,53 @@ def load_city_data():
 
 CITY_DATA = load_city_data()
 
+# Purane / vaikalpik naam -> city_data.json wala naam
+CITY_ALIASES = {
+    "bengaluru": "bangalore", "gurugram": "gurgaon", "bombay": "mumbai", "calcutta": "kolkata",
+    "madras": "chennai", "mysuru": "mysore", "pondicherry": "puducherry", "thiruvananthapuram": "trivandrum",
+    "vizag": "visakhapatnam", "prayagraj": "allahabad", "benares": "varanasi", "banaras": "varanasi",
+    "baroda": "vadodara", "poona": "pune", "cochin": "kochi", "mangaluru": "mangalore", "belagavi": "belgaum",
+    "gauhati": "guwahati", "simla": "shimla", "trichy": "tiruchirappalli", "hubballi": "hubli",
+    "kalaburagi": "gulbarga", "ballari": "bellary", "vijayapura": "bijapur", "calicut": "kozhikode",
+    "quilon": "kollam", "trichur": "thrissur", "tuticorin": "thoothukudi", "tanjore": "thanjavur",
+    "bhubaneshwar": "bhubaneswar", "jubbulpore": "jabalpur", "nasik": "nashik", "sholapur": "solapur",
+    "ahilyanagar": "ahmednagar", "chhatrapati sambhajinagar": "aurangabad", "dharashiv": "osmanabad",
+    "new delhi": "delhi",
+}
+FUZZY_MATCH_CUTOFF = 0.8
+
+def normalize_city_name(name: str) -> str:
+    """Case, accents, hyphens/dots aur extra spaces hata kar ek standard key banata hai."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[-_.,']", " ", name.lower()).split())
+
+class CityIndex:
+    """Normalized name -> city record, with alias and fuzzy (difflib) fallback. Built once at load time."""
+
+    def __init__(self, cities):
+        self.by_name = {}
+        for city_info in cities:
+            # Duplicate names: pehla entry jeetta hai (purane linear scan jaisa)
+            self.by_name.setdefault(normalize_city_name(city_info["city"]), city_info)
+        self.aliases = {alias: target for alias, target in CITY_ALIASES.items() if target in self.by_name}
+        self.names = list(self.by_name)
+
+    def lookup(self, city_name: str):
+        key = normalize_city_name(city_name)
+        key = self.aliases.get(key, key)
+        city_info = self.by_name.get(key)
+        if city_info is None:
+            close = difflib.get_close_matches(key, self.names, n=1, cutoff=FUZZY_MATCH_CUTOFF)
+            city_info = self.by_name[close[0]] if close else None
+        return city_info
+
+CITY_INDEX = CityIndex(CITY_DATA)
+
 def get_coords_from_city(city_name: str):
     """Shehar ke naam se uske Latitude aur Longitude nikaalta hai (local database se)."""
-    # Shehar ke naam ko case-insensitive banayein aur extra space hatayein
-    city_name_lower = city_name.lower().strip()
-    for city_info in CITY_DATA:
-        if city_info["city"].lower() == city_name_lower:
-            return city_info['lat'], city_info['lon']
+    city_info = CITY_INDEX.lookup(city_name)
+    if city_info is not None:
+        return city_info['lat'], city_info['lon']
     
     # Agar shehar nahi milta hai, toh error dein
     raise ValueError(f"Could not find coordinates for city: '{city_name}'. Please enter a major Indian city name.")
@@ -52,6 +101,58 @@ def load_river_data():
 
 RIVER_STATIONS = load_river_data()
 
+class StationIndex:
+    """BallTree (haversine metric) over river stations for k-nearest and radius queries."""
+
+    def __init__(self, stations):
+        from sklearn.neighbors import BallTree  # sklearn is heavy, so only imported when the index is built
+        if not stations:
+            raise ValueError("River station data could not be loaded.")
+        self.stations = stations
+        self.coords_rad = np.radians([[s['lat'], s['lon']] for s in stations])
+        self.names = np.array([s['station_name'] for s in stations], dtype=object)
+        self.warning_levels = np.array([s['warning_level'] for s in stations], dtype=float)
+        self.danger_levels = np.array([s['danger_level'] for s in stations], dtype=float)
+        self.tree = BallTree(self.coords_rad, metric="haversine")
+
+    def nearest(self, lats, lons, k=1):
+        """Vectorized k-nearest query. Returns (distances_km, indices), each of shape (n_points, k)."""
+        points = np.radians(np.column_stack([np.atleast_1d(lats), np.atleast_1d(lons)]))
+        distances, indices = self.tree.query(points, k=min(k, len(self.stations)))
+        return distances * EARTH_RADIUS_KM, indices
+
+    def within(self, lat, lon, radius_km):
+        """Indices and distances (km) of stations within radius_km, nearest first."""
+        indices, distances = self.tree.query_radius(
+            np.radians([[lat, lon]]), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+        )
+        return distances[0] * EARTH_RADIUS_KM, indices[0]
+
+# Built once, on first use (keeps sklearn out of app startup)
+station_index = LazyResource("river_station_index", lambda: StationIndex(RIVER_STATIONS))
+
+def _with_distance(station, distance_km):
+    return {**station, "distance_km": round(float(distance_km), 2)}
+
+def nearest_stations(lat: float, lon: float, k: int = 1):
+    """Diye gaye point ke sabse nazdeek k river stations (distance_km ke saath), nearest first."""
+    index = station_index.get()
+    distances, indices = index.nearest(lat, lon, k)
+    return [_with_distance(index.stations[i], d) for d, i in zip(distances[0], indices[0])]
+
+def stations_within(lat: float, lon: float, radius_km: float):
+    """radius_km ke andar aane waale saare river stations, nearest first."""
+    index = station_index.get()
+    distances, indices = index.within(lat, lon, radius_km)
+    return [_with_distance(index.stations[i], d) for d, i in zip(distances, indices)]
+
+RISK_RECOMMENDATIONS = {
+    "High Flood Risk": "Evacuate low-lying areas immediately. Follow instructions from local authorities and monitor news alerts.",
+    "Moderate Flood Risk": "Be prepared to move to a safer location. Keep emergency kits ready and stay informed about weather updates.",
+    "Potential Drought Condition": "Conserve water. Practice rainwater harvesting and use water-efficient appliances. Check for government advisories on water usage.",
+    "Low Risk": "Continue to monitor water levels and use water responsibly. No immediate threat detected.",
+}
+
 def get_risk_prediction_by_city(city: str):
     """Shehar ke naam ke aadhar par Flood/Drought ka risk batata hai."""
     if not RIVER_STATIONS:
@@ -62,11 +163,10 @@ def get_risk_prediction_by_city(city: str):
     # Step 1: Shehar ke naam se coordinates nikalo (local data se)
     user_lat, user_lon = get_coords_from_city(city)
     
-    # Step 2: Sabse nazdeek waala river station dhoondho
-    nearest_station = min(
-        RIVER_STATIONS,
-        key=lambda station: haversine(user_lat, user_lon, station['lat'], station['lon'])
-    )
+    # Step 2: Sabse nazdeek waala river station dhoondho (spatial index se)
+    index = station_index.get()
+    _, nearest_idx = index.nearest(user_lat, user_lon, k=1)
+    nearest_station = index.stations[nearest_idx[0][0]]
 
     # Step 3: Paani ka level mausam ke hisab se anumanit (simulate) karo
     current_month = datetime.now().month
@@ -87,24 +187,20 @@ def get_risk_prediction_by_city(city: str):
     if simulated_level > danger_level:
         risk = "High Flood Risk"
         reason = f"The simulated water level at {nearest_station['station_name']} is {simulated_level}m, which is above the danger mark of {danger_level}m for this region during this season."
-        recommendation = "Evacuate low-lying areas immediately. Follow instructions from local authorities and monitor news alerts."
     elif simulated_level > warning_level:
         risk = "Moderate Flood Risk"
         reason = f"The water level ({simulated_level}m) has crossed the warning level of {warning_level}m at {nearest_station['station_name']}. This is unusual for the season and indicates a potential flood situation."
-        recommendation = "Be prepared to move to a safer location. Keep emergency kits ready and stay informed about weather updates."
     elif simulated_level < base_level * 0.7:
         risk = "Potential Drought Condition"
         reason = f"Water level ({simulated_level}m) is significantly below the normal seasonal level at {nearest_station['station_name']}. This indicates a lack of rainfall."
-        recommendation = "Conserve water. Practice rainwater harvesting and use water-efficient appliances. Check for government advisories on water usage."
     else:
         risk = "Low Risk"
         reason = f"The water level at {nearest_station['station_name']} is {simulated_level}m, which is within the safe zone for this time of year."
-        recommendation = "Continue to monitor water levels and use water responsibly. No immediate threat detected."
 
     return {
         "risk_level": risk,
         "reason": reason,
-        "recommendation": recommendation,
+        "recommendation": RISK_RECOMMENDATIONS[risk],
         "station_info": {
             "name": nearest_station['station_name'],
             "current_level": simulated_level,
@@ -113,3 +209,80 @@ def get_risk_prediction_by_city(city: str):
         }
     }
 
+class CityStationTable:
+    """
+    Columnar, precomputed city -> nearest station table. Cities and stations are static, so the
+    spatial join runs once (one vectorized BallTree query) and bulk scoring becomes pure array math.
+    """
+
+    def __init__(self, city_index, stations):
+        self.records = list(city_index.by_name.values())
+        self.row_of = {id(info): row for row, info in enumerate(self.records)}
+        self.cities = np.array([c['city'] for c in self.records], dtype=object)
+        self.lats = np.array([c['lat'] for c in self.records], dtype=float)
+        self.lons = np.array([c['lon'] for c in self.records], dtype=float)
+        distances, nearest_idx = stations.nearest(self.lats, self.lons, k=1)
+        self.distance_km = np.round(distances[:, 0], 2)
+        self.station = stations.names[nearest_idx[:, 0]]
+        self.warning_levels = stations.warning_levels[nearest_idx[:, 0]]
+        self.danger_levels = stations.danger_levels[nearest_idx[:, 0]]
+
+city_station_table = LazyResource(
+    "city_station_table", lambda: CityStationTable(CITY_INDEX, station_index.get())
+)
+
+def score_many(cities=None, month=None, seed=None):
+    """
+    Vectorized flood/drought scoring for many cities in one pass (default: every unique city in city_data.json).
+    Uses the precomputed city -> station table, simulates levels with a NumPy Generator
+    (pass `seed` for reproducible output) and classifies them with np.select.
+    Returns columnar results: {"count", "columns": {name: list}, "unmatched": [...], "recommendations": {...}}.
+    """
+    if not RIVER_STATIONS:
+        raise ValueError("River station data could not be loaded.")
+    if not CITY_DATA:
+        raise ValueError("City data could not be loaded.")
+
+    table = city_station_table.get()
+    if cities is None:
+        rows, unmatched = np.arange(len(table.records)), []
+    else:
+        resolved = [(name, CITY_INDEX.lookup(name)) for name in cities]
+        rows = np.array([table.row_of[id(info)] for _, info in resolved if info is not None], dtype=int)
+        unmatched = [name for name, info in resolved if info is None]
+
+    # Step 1: Har shehar ka nazdeeki station (precomputed)
+    warning = table.warning_levels[rows]
+    danger = table.danger_levels[rows]
+    base = warning * 0.8
+
+    # Step 2: Mausam ke hisab se level simulate karo (same ranges as get_risk_prediction_by_city)
+    month = month or datetime.now().month
+    if 6 <= month <= 9:  # Monsoon season
+        low, high = base, danger * 1.05
+    elif 4 <= month <= 5:  # Summer/Dry season
+        low, high = base * 0.6, base * 0.9
+    else:  # Other months
+        low, high = base * 0.8, warning * 0.95
+    rng = np.random.default_rng(seed)
+    simulated = np.round(low + (high - low) * rng.random(len(rows)), 2)
+
+    # Step 3: Risk classification, vectorized
+    risk = np.select(
+        [simulated > danger, simulated > warning, simulated < base * 0.7],
+        ["High Flood Risk", "Moderate Flood Risk", "Potential Drought Condition"],
+        default="Low Risk",
+    )
+
+    columns = {
+        "city": table.cities[rows].tolist(),
+        "lat": table.lats[rows].tolist(),
+        "lon": table.lons[rows].tolist(),
+        "station": table.station[rows].tolist(),
+        "distance_km": table.distance_km[rows].tolist(),
+        "current_level": simulated.tolist(),
+        "warning_level": warning.tolist(),
+        "danger_level": danger.tolist(),
+        "risk_level": risk.tolist(),
+    }
+    return {"count": len(rows), "columns": columns, "unmatched": unmatched, "recommendations": RISK_RECOMMENDATIONS}
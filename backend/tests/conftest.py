@@ -0,0 +1,40 @@
+# backend/tests/conftest.py
+#
+# Shared fixtures. Everything runs offline on the stand-ins in backend/benchmarks/standins.py
+# (fake Earth Engine, local AQICN / OpenWeather / Groq stub, random-weight ResNet-50, tiny water model).
+# Caches, the job store and artifacts live in a per-session temp directory.
+#
+#   python -m pytest -q backend/tests      (from the repository root)
+
+import tempfile
+
+import pytest
+
+from backend.benchmarks.suite import configure_environment
+
+# Before any backend module is imported: module-level stores read their paths from the environment
+WORKDIR = tempfile.mkdtemp(prefix="bitclimate-tests-")
+configure_environment(WORKDIR, "http://127.0.0.1:9")
+
+
+@pytest.fixture(scope="session")
+def offline():
+    """(backend.main, counters) with every external dependency patched to a stand-in."""
+    from backend.benchmarks.suite import offline_backend
+    with offline_backend(WORKDIR, ee_latency_s=0, upstream_latency_s=0) as env:
+        yield env
+
+
+@pytest.fixture(scope="session")
+def client(offline):
+    """TestClient for the offline app; the lifespan (job runner, AQI grid) runs for the whole session."""
+    from fastapi.testclient import TestClient
+    main, _ = offline
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def jpeg():
+    from backend.benchmarks.suite import synthetic_jpeg
+    return synthetic_jpeg(640, 480)
@@ -0,0 +1,251 @@
+# ResponseCache (backend/cache.py): TTL and stale-while-revalidate windows, request coalescing on both
+# APIs, cancellation of the first caller, and the Redis backend against a dict-based fake client (kept off the
+# event loop by the async API).
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import cache as cache_module
+from backend.cache import CachePolicy, MemoryBackend, RedisBackend, ResponseCache
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeRedis:
+    """get / set(ex=) / delete over a dict; `ex` is recorded and honoured against the fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    def get(self, key):
+        item = self.data.get(key)
+        if item is None or item[1] < self.clock.time():
+            return None
+        return item[0]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value.encode(), self.clock.time() + ex)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+def make_cache(backend=None):
+    return ResponseCache(backend or MemoryBackend(), policies={"src": CachePolicy(ttl=10, stale_ttl=5)})
+
+
+def counting_fetch(values, delay=0.0):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return values[len(calls) - 1]
+    return fetch, calls
+
+
+# ==============================================================================
+# TTL and stale-while-revalidate
+# ==============================================================================
+def test_fresh_hit_then_expiry(clock):
+    cache = make_cache()
+    fetch, calls = counting_fetch(["a", "b"])
+
+    async def scenario():
+        assert await cache.aget_or_fetch("src", "k", fetch) == "a"
+        clock.advance(9)
+        assert await cache.aget_or_fetch("src", "k", fetch) == "a"
+        clock.advance(7)  # past ttl + stale_ttl: a plain miss
+        assert await cache.aget_or_fetch("src", "k", fetch) == "b"
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert cache.stats()["src"]["hits"] == 1
+
+
+def test_stale_value_is_served_while_one_refresh_runs(clock):
+    cache = make_cache()
+    fetch, calls = counting_fetch(["old", "new"], delay=0.01)
+
+    async def scenario():
+        await cache.aget_or_fetch("src", "k", fetch)
+        clock.advance(12)  # inside the stale window
+        stale = await asyncio.gather(*(cache.aget_or_fetch("src", "k", fetch) for _ in range(5)))
+        assert stale == ["old"] * 5
+        while cache._background:
+            await asyncio.sleep(0.01)
+        assert await cache.aget_or_fetch("src", "k", fetch) == "new"
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    stats = cache.stats()["src"]
+    assert stats["stale_hits"] == 5 and stats["refreshes"] == 1
+
+
+def test_background_refresh_tasks_are_referenced_until_done(clock):
+    cache = make_cache()
+    fetch, _ = counting_fetch(["old", "new"], delay=0.05)
+
+    async def scenario():
+        await cache.aget_or_fetch("src", "k", fetch)
+        clock.advance(12)
+        await cache.aget_or_fetch("src", "k", fetch)
+        assert len(cache._background) == 1
+        await asyncio.gather(*cache._background)
+        await asyncio.sleep(0)
+        assert not cache._background
+    asyncio.run(scenario())
+
+
+def test_failed_refresh_keeps_the_stale_value(clock):
+    cache = make_cache()
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        await cache.aget_or_fetch("src", "k", counting_fetch(["old"])[0])
+        clock.advance(12)
+        assert await cache.aget_or_fetch("src", "k", failing) == "old"
+        await asyncio.sleep(0.01)
+        assert await cache.aget_or_fetch("src", "k", failing) == "old"
+    asyncio.run(scenario())
+    assert cache.stats()["src"]["errors"] == 2  # each stale hit after a failure retries once
+
+
+# ==============================================================================
+# Coalescing
+# ==============================================================================
+def test_concurrent_misses_share_one_fetch(clock):
+    cache = make_cache()
+    fetch, calls = counting_fetch(["v"], delay=0.02)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.aget_or_fetch("src", "k", fetch) for _ in range(10)))
+    assert asyncio.run(scenario()) == ["v"] * 10
+    assert len(calls) == 1
+    assert cache.stats()["src"]["coalesced"] == 9
+
+
+def test_fetch_errors_reach_every_waiter_and_are_not_cached(clock):
+    cache = make_cache()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.aget_or_fetch("src", "k", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await cache.aget_or_fetch("src", "k", counting_fetch(["ok"])[0]) == "ok"
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_cancelled_first_caller_does_not_cancel_the_others(clock):
+    cache = make_cache()
+    fetch, calls = counting_fetch(["v"], delay=0.05)
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.aget_or_fetch("src", "k", fetch))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(cache.aget_or_fetch("src", "k", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await asyncio.gather(*followers) == ["v"] * 3
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert cache.peek("src", "k") == "v"  # the shared fetch still completed and was cached
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_sync_misses_share_one_fetch(clock):
+    cache = make_cache()
+    calls, gate = [], threading.Event()
+
+    def fetch():
+        calls.append(1)
+        gate.wait(1)
+        return "v"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("src", "k", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["v"] * 5
+    assert len(calls) == 1
+
+
+# ==============================================================================
+# Backends
+# ==============================================================================
+def test_memory_backend_is_bounded_lru(clock):
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1, 60)
+    backend.set("b", 2, 60)
+    backend.get("a")
+    backend.set("c", 3, 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1 and backend.get("c") == 3
+
+
+def test_redis_backend_round_trip_and_expiry(clock):
+    client = FakeRedis(clock)
+    cache = make_cache(RedisBackend(client, prefix="t:"))
+    fetch, calls = counting_fetch([{"aqi": 42}, {"aqi": 43}])
+
+    async def scenario():
+        assert await cache.aget_or_fetch("src", "k", fetch) == {"aqi": 42}
+        assert await cache.aget_or_fetch("src", "k", fetch) == {"aqi": 42}
+        assert list(client.data) == ["t:src:k"]
+        clock.advance(16)  # Redis expiry is ttl + stale_ttl
+        assert await cache.aget_or_fetch("src", "k", fetch) == {"aqi": 43}
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    cache.invalidate("src", "k")
+    assert client.data == {}
+
+
+def test_async_api_keeps_redis_calls_off_the_event_loop(clock):
+    client = FakeRedis(clock)
+    calls = []
+    for name in ("get", "set"):
+        def record(*args, _real=getattr(client, name), _name=name, **kwargs):
+            calls.append((_name, threading.current_thread() is threading.main_thread()))
+            return _real(*args, **kwargs)
+        setattr(client, name, record)
+    cache = make_cache(RedisBackend(client, prefix="t:"))
+    fetch, _ = counting_fetch([1, 2])
+
+    async def scenario():
+        assert await cache.aget_or_fetch("src", "k", fetch) == 1
+        assert await cache.aget_or_fetch("src", "k", fetch) == 1
+        await cache.aput("src", "other", 3)
+    asyncio.run(scenario())  # the loop runs on the main thread
+    assert [name for name, _ in calls] == ["get", "set", "get", "set"]
+    assert not any(on_loop for _, on_loop in calls)
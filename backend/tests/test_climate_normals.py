@@ -0,0 +1,43 @@
+# Monthly climate normals (backend/climate_normals.py) and their use in /recommend_crop_from_photo:
+# hill stations are not blended out of the plains, unknown places fall back to the default values.
+
+import pytest
+
+from backend.climate_normals import CLIMATE_NORMALS, DEFAULT_CLIMATE
+
+
+@pytest.mark.parametrize("location, month, low, high", [
+    ("Shillong", "July", 19.0, 23.0),
+    ("Meghalaya", "jul", 19.0, 23.0),   # state -> representative city
+    ("Darjeeling", "1", 3.0, 8.0),
+    ("Nagpur", "May", 33.0, 37.0),
+])
+def test_known_places_have_plausible_temperatures(location, month, low, high):
+    climate = CLIMATE_NORMALS.lookup(location, month)
+    assert low <= climate["avg_temp"] <= high
+    assert climate["confidence"] == "high"
+
+
+def test_unknown_location_falls_back_to_the_default():
+    climate = CLIMATE_NORMALS.lookup("Atlantis", "July")
+    assert {key: climate[key] for key in DEFAULT_CLIMATE} == DEFAULT_CLIMATE
+    assert climate["confidence"] == "default" and climate["month"] == "July"
+
+
+def test_unrecognized_month_uses_the_annual_mean_with_low_confidence():
+    climate = CLIMATE_NORMALS.lookup("Nagpur", "Smarch")
+    assert climate["month"] is None and climate["confidence"] == "low"
+    months = [CLIMATE_NORMALS.lookup("Nagpur", str(m))["avg_temp"] for m in range(1, 13)]
+    assert min(months) < climate["avg_temp"] < max(months)
+
+
+def test_cities_far_from_every_station_are_low_confidence():
+    far = [name for name, km in zip(CLIMATE_NORMALS.names, CLIMATE_NORMALS.nearest_km) if km > 1000]
+    assert far and CLIMATE_NORMALS.lookup(far[0], "July")["confidence"] == "low"
+
+
+def test_recommendation_for_an_unknown_location_still_answers(client, jpeg):
+    response = client.post("/recommend_crop_from_photo", files={"file": ("soil.jpg", jpeg, "image/jpeg")},
+                           data={"month": "July", "location": "Atlantis"})
+    assert response.status_code == 200
+    assert response.json()["estimated_climate"]["confidence"] == "default"
@@ -0,0 +1,71 @@
+# Large-region analysis jobs (backend/gee_tiling.py) on the fake Earth Engine: tiled mode (only tiles that overlap
+# the polygon), and the export mode, whose sums are merged into the job result and whose task and asset never leak.
+
+import pytest
+
+from backend.benchmarks.suite import polygon_geojson
+
+
+@pytest.fixture
+def gee_tiling(offline):
+    from backend import gee_tiling
+    return gee_tiling
+
+
+def square(lat, lon, size_deg):
+    ring = [[lon, lat], [lon + size_deg, lat], [lon + size_deg, lat + size_deg], [lon, lat + size_deg], [lon, lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def test_tiled_mode_returns_stats(gee_tiling):
+    import json
+    result = gee_tiling.run_large_analysis(json.loads(polygon_geojson(9001)), "2020-01-01", "2023-01-01")
+    assert result["mode"] == "tiled"
+    assert result["stats"] and result["start_map"] and result["end_map_overlay"]
+
+
+def test_tiles_outside_the_polygon_are_skipped(gee_tiling):
+    # A right triangle over a 3x3 grid: the three tiles beyond its hypotenuse are never reduced
+    triangle = {"type": "Polygon", "coordinates": [[[78.0, 21.0], [78.6, 21.0], [78.0, 21.6], [78.0, 21.0]]]}
+    grid = gee_tiling.tile_grid(gee_tiling.geojson_bbox(triangle), 0.2)
+    kept = gee_tiling.tiles_touching(triangle, grid)
+    assert len(grid) == 9 and len(kept) == 6
+    assert all(west + south < 78.0 + 21.6 for west, south, _, _ in kept)
+
+    # Tiles fully inside the polygon (no edge crosses them) are kept
+    big = square(21.0, 78.0, 1.0)
+    grid = gee_tiling.tile_grid(gee_tiling.geojson_bbox(big), 0.2)
+    assert gee_tiling.tiles_touching(big, grid) == grid
+
+
+def test_export_mode_merges_the_exported_sums(gee_tiling, monkeypatch):
+    monkeypatch.setattr(gee_tiling, "EXPORT_REGION_HA", 1.0)
+    fake_ee = gee_tiling.ee
+    progress = []
+    result = gee_tiling.run_large_analysis(square(21.0, 78.0, 0.3), "2020-01-01", "2023-01-01", progress=lambda *p: progress.append(p))
+
+    assert result["mode"] == "export" and result["export_task_id"] in fake_ee.tasks
+    expected = gee_tiling.stats_from_sums(fake_ee.EXPORT_SUMS["deforested"], fake_ee.EXPORT_SUMS["initial_forest"])
+    assert result["stats"] == expected
+    assert result["start_map"] and result["end_map_overlay"]
+    assert progress == [(0, 1), (1, 1)]
+    assert not fake_ee.assets  # the temporary asset was deleted after reading
+
+
+def test_failed_export_fails_the_job(gee_tiling, monkeypatch):
+    monkeypatch.setattr(gee_tiling, "EXPORT_REGION_HA", 1.0)
+    monkeypatch.setattr(gee_tiling, "export_status", lambda task_id: {"state": "FAILED", "error_message": "quota"})
+    with pytest.raises(ValueError, match="quota"):
+        gee_tiling.run_large_analysis(square(22.0, 79.0, 0.3), "2020-01-01", "2023-01-01")
+    assert not gee_tiling.ee.assets
+
+
+def test_stuck_export_is_cancelled_and_its_asset_deleted(gee_tiling, monkeypatch):
+    monkeypatch.setattr(gee_tiling, "EXPORT_REGION_HA", 1.0)
+    monkeypatch.setattr(gee_tiling, "EXPORT_TIMEOUT_SECONDS", 0)
+    fake_ee = gee_tiling.ee
+    monkeypatch.setattr(fake_ee, "export_state", "RUNNING")
+    with pytest.raises(ValueError, match="did not finish"):
+        gee_tiling.run_large_analysis(square(23.0, 80.0, 0.3), "2020-01-01", "2023-01-01")
+    assert [task["state"] for task in fake_ee.tasks.values()][-1] == "CANCELLED"
+    assert not fake_ee.assets
@@ -0,0 +1,91 @@
+# NO2 layers (backend/ghg_detector.py) on the fake Earth Engine: map credentials and proxied tiles of a recent
+# week expire on the short 'ee_mapid_recent' TTL, settled weeks keep the long one.
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import cache as cache_module
+
+BOUNDS = [[28.4, 77.0], [28.9, 77.4]]
+
+
+class FakeClock:
+    def __init__(self, now=2_000_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def ghg(offline, monkeypatch):
+    from backend import ghg_detector
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    monkeypatch.setattr(ghg_detector, "time", clock)
+    return ghg_detector, clock
+
+
+def layer_of(result):
+    return result["tileProxyTemplate"].split("/")[4]
+
+
+def test_recent_week_is_reminted_on_the_short_ttl(ghg):
+    ghg_detector, clock = ghg
+    fake_ee = ghg_detector.ee
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    layer = layer_of(ghg_detector.analyze_no2_for_area(BOUNDS, today))
+    minted = fake_ee.round_trips["getMapId"]
+    key, max_age = ghg_detector.tile_cache_key(layer, 5, 10, 12)
+
+    recent_ttl = cache_module.response_cache.policy("ee_mapid_recent").ttl
+    clock.now += recent_ttl + 1
+    ghg_detector.no2_map_layer(layer)
+    assert fake_ee.round_trips["getMapId"] == minted + 1
+    assert max_age == int(recent_ttl)
+    assert ghg_detector.tile_cache_key(layer, 5, 10, 12)[0] != key  # cached tiles of the old map are not reused
+
+
+def test_settled_week_keeps_its_map(ghg):
+    ghg_detector, clock = ghg
+    fake_ee = ghg_detector.ee
+    settled = (datetime.utcnow() - timedelta(days=60)).strftime("%Y-%m-%d")
+    layer = layer_of(ghg_detector.analyze_no2_for_area(BOUNDS, settled))
+    minted = fake_ee.round_trips["getMapId"]
+    key = ghg_detector.tile_cache_key(layer, 5, 10, 12)
+
+    clock.now += cache_module.response_cache.policy("ee_mapid_recent").ttl + 1
+    ghg_detector.no2_map_layer(layer)
+    assert fake_ee.round_trips["getMapId"] == minted
+    assert ghg_detector.tile_cache_key(layer, 5, 10, 12) == key == (f"{layer}/5/10/12", 86400)
+
+
+def test_layer_ids_are_self_describing(ghg):
+    ghg_detector, _ = ghg
+    snapped = ghg_detector.snap_bounds(BOUNDS)
+    result = ghg_detector.analyze_no2_for_area(BOUNDS, "2024-03-08")
+    assert result["bounds"] == snapped
+
+    # A worker that never saw the analysis (no shared cache) can still mint the layer from the id alone
+    layer = ghg_detector.layer_key(snapped, "2024-03-01", "2024-03-08")
+    assert layer == layer_of(result)
+    cache_module.response_cache.invalidate("ee_mapid", layer)
+    assert ghg_detector.parse_layer_key(layer) == (snapped, "2024-03-01", "2024-03-08")
+    assert ghg_detector.no2_map_layer(layer)["urlTemplate"]
+
+
+@pytest.mark.parametrize("params", [
+    ([[28.41, 77.0], [28.9, 77.4]], "2024-03-01", "2024-03-08"),   # not on the snapping grid
+    ([[28.4, 77.0], [28.9, 77.4]], "2024-01-01", "2024-03-08"),    # not a 7-day week
+    ([[28.9, 77.0], [28.4, 77.4]], "2024-03-01", "2024-03-08"),    # south above north
+])
+def test_layer_ids_the_api_never_issues_are_rejected(ghg, params):
+    ghg_detector, _ = ghg
+    assert ghg_detector.no2_map_layer(ghg_detector.layer_key(*params)) is None
+    assert ghg_detector.parse_layer_key("not-a-layer") is None
+    assert ghg_detector.parse_layer_key(ghg_detector.layer_key(*params, viz_params={"min": 1})) is None
+
+
+def test_tile_proxy_rejects_an_invalid_layer(client):
+    assert client.get("/air/ghg_emissions/tiles/bm90LWEtbGF5ZXI.deadbeef/3/4/5.png").status_code == 404
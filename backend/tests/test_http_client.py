@@ -0,0 +1,127 @@
+# UpstreamClient (backend/http_client.py) over httpx.MockTransport: retries, and the per-host circuit
+# breaker's closed -> open -> half-open -> closed cycle, including trials that raise or are cancelled.
+
+import asyncio
+
+import httpx
+import pytest
+
+from backend import http_client as http_client_module
+from backend.http_client import CircuitOpenError, UpstreamClient, UpstreamError
+
+URL = "https://api.example.com/feed"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(http_client_module, "time", fake)
+    return fake
+
+
+class Upstream:
+    """Scripted handler: each request pops the next outcome (an exception class, a status code or a coroutine)."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, type) and issubclass(outcome, Exception):
+            raise outcome("scripted", request=request) if issubclass(outcome, httpx.RequestError) else outcome("scripted")
+        if callable(outcome):
+            await outcome()
+            outcome = 200
+        return httpx.Response(outcome, json={"ok": True})
+
+
+def make_client(upstream, **kwargs):
+    options = dict(retries=0, backoff_base=0, breaker_threshold=2, breaker_reset=30)
+    return UpstreamClient(transport=httpx.MockTransport(upstream), **{**options, **kwargs})
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def outcome_of(client):
+    try:
+        await client.get_json(URL)
+        return "ok"
+    except CircuitOpenError:
+        return "open"
+    except UpstreamError:
+        return "error"
+
+
+def test_retries_transient_errors():
+    upstream = Upstream(httpx.ConnectError, 503, 200)
+    client = make_client(upstream, retries=2)
+    assert run(client.get_json(URL)) == {"ok": True}
+    assert upstream.calls == 3
+
+
+def test_open_half_open_closed(clock):
+    upstream = Upstream(httpx.ConnectError, httpx.ConnectError)
+    client = make_client(upstream)
+
+    async def scenario():
+        assert [await outcome_of(client) for _ in range(3)] == ["error", "error", "open"]
+        assert upstream.calls == 2  # the open circuit did not call the upstream
+        clock.now += 31
+        assert client.breaker_states() == {"api.example.com": "half-open"}
+        assert await outcome_of(client) == "ok"
+        assert client.breaker_states() == {"api.example.com": "closed"}
+    run(scenario())
+
+
+def test_failed_trial_reopens(clock):
+    client = make_client(Upstream(httpx.ConnectError, httpx.ConnectError, 502))
+
+    async def scenario():
+        await outcome_of(client), await outcome_of(client)
+        clock.now += 31
+        assert await outcome_of(client) == "error"
+        assert await outcome_of(client) == "open"
+    run(scenario())
+
+
+@pytest.mark.parametrize("trial_error", [httpx.DecodingError, httpx.TooManyRedirects, RuntimeError])
+def test_trial_that_raises_does_not_wedge_the_breaker(clock, trial_error):
+    client = make_client(Upstream(httpx.ConnectError, httpx.ConnectError, trial_error))
+
+    async def scenario():
+        await outcome_of(client), await outcome_of(client)
+        clock.now += 31
+        with pytest.raises(Exception):
+            await client.get_json(URL)
+        assert await outcome_of(client) == "open"  # counted as a failed trial
+        clock.now += 31
+        assert await outcome_of(client) == "ok"    # the upstream recovered and the next trial gets through
+    run(scenario())
+
+
+def test_cancelled_trial_frees_the_slot(clock):
+    client = make_client(Upstream(httpx.ConnectError, httpx.ConnectError, lambda: asyncio.sleep(10)))
+
+    async def scenario():
+        await outcome_of(client), await outcome_of(client)
+        clock.now += 31
+        trial = asyncio.ensure_future(client.get_json(URL))
+        await asyncio.sleep(0.01)
+        assert await outcome_of(client) == "open"  # one trial at a time
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert await outcome_of(client) == "ok"
+    run(scenario())
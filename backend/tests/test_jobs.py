@@ -0,0 +1,230 @@
+# Background jobs (backend/jobs.py) against a fake broker: submit / dedupe / run / fail, webhooks and the
+# callback_url SSRF check, lease-based recovery when several workers share one database, and retention.
+
+import json
+import os
+import sqlite3
+import time
+
+import httpx
+import pytest
+
+from backend import jobs
+from backend.jobs import CallbackURLError, JobRunner, JobStore, send_webhook, validate_callback_url
+
+REAL_RESOLVE_HOST = jobs.resolve_host
+
+
+class FakeBroker(jobs.Broker):
+    """Records queued ids; the test decides when a worker picks one up."""
+
+    def __init__(self):
+        self.queued = []
+
+    def put(self, job_id):
+        self.queued.append(job_id)
+
+    def get(self, timeout):
+        return self.queued.pop(0) if self.queued else None
+
+
+def echo_task(value, progress=None):
+    if progress:
+        progress(1, 1)
+    return {"echo": value, "artifact_bytes": b"%PDF-1.4 test", "artifact_suffix": ".pdf"}
+
+
+def failing_task(progress=None):
+    raise RuntimeError("Earth Engine quota exceeded")
+
+
+@pytest.fixture(autouse=True)
+def test_tasks(monkeypatch):
+    monkeypatch.setitem(jobs.TASKS, "echo", "backend.tests.test_jobs:echo_task")
+    monkeypatch.setitem(jobs.TASKS, "boom", "backend.tests.test_jobs:failing_task")
+    monkeypatch.setattr(jobs, "resolve_host", lambda host, port: {"93.184.216.34"})
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    """Every webhook request as (URL connected to, Host header, TLS SNI name, JSON payload); answered with 204."""
+    posted = []
+
+    def handler(request):
+        posted.append((str(request.url), request.headers["host"], request.extensions.get("sni_hostname"), json.loads(request.content)))
+        return httpx.Response(204)
+    real_client = httpx.Client
+    monkeypatch.setattr(jobs.httpx, "Client", lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+    return posted
+
+
+@pytest.fixture
+def make_runner(tmp_path):
+    runners = []
+
+    def make(**kwargs):
+        # workers=0: no dispatcher threads, jobs run when the test calls _run
+        runner = JobRunner(JobStore(str(tmp_path / "jobs.sqlite")), FakeBroker(), workers=0,
+                           artifact_dir=str(tmp_path / "artifacts"), **kwargs)
+        runners.append(runner)
+        return runner
+    yield make
+    for runner in runners:
+        runner.stop()
+
+
+def run_queued(runner):
+    while runner.broker.queued:
+        runner._run(runner.broker.get(timeout=0))
+
+
+# ==============================================================================
+# Submit / dedupe / run / fail
+# ==============================================================================
+def test_submit_run_and_artifact(make_runner):
+    runner = make_runner()
+    job, created = runner.submit("echo", {"value": 7})
+    assert created and job["state"] == "queued" and runner.broker.queued == [job["id"]]
+
+    run_queued(runner)
+    status = runner.status(job["id"])
+    assert status["state"] == "succeeded" and status["progress"] == {"done": 1, "total": 1}
+    assert status["result"]["echo"] == 7
+    with open(runner.artifact_path(job["id"]), "rb") as f:
+        assert f.read() == b"%PDF-1.4 test"
+
+
+def test_identical_active_jobs_are_deduplicated(make_runner):
+    runner = make_runner()
+    first, _ = runner.submit("echo", {"value": 1})
+    second, created = runner.submit("echo", {"value": 1})
+    assert not created and second["id"] == first["id"]
+    assert runner.broker.queued == [first["id"]]
+
+    run_queued(runner)
+    third, created = runner.submit("echo", {"value": 1})  # finished jobs are not joined
+    assert created and third["id"] != first["id"]
+
+
+def test_every_deduplicated_submitter_gets_its_webhook(make_runner, webhooks):
+    runner = make_runner()
+    first, _ = runner.submit("echo", {"value": 4}, callback_url="https://a.example.com/hook")
+    for url in ("https://b.example.com/hook", "https://b.example.com/hook", None):
+        joined, created = runner.submit("echo", {"value": 4}, callback_url=url)
+        assert not created and joined["id"] == first["id"]
+
+    run_queued(runner)
+    assert [host for _, host, _, _ in webhooks] == ["a.example.com", "b.example.com"]
+    assert all(payload["state"] == "succeeded" and "callback_status" not in payload for *_, payload in webhooks)
+
+
+def test_failed_task_is_recorded(make_runner):
+    runner = make_runner()
+    job, _ = runner.submit("boom", {})
+    run_queued(runner)
+    status = runner.status(job["id"])
+    assert status["state"] == "failed" and "quota" in status["error"]
+
+
+def test_a_job_is_claimed_once(make_runner):
+    a, b = make_runner(), make_runner()
+    job, _ = a.submit("echo", {"value": 2})
+    b._run(job["id"])
+    a._run(job["id"])  # already claimed by b: skipped
+    assert b.store.get(job["id"])["owner"] == b.owner
+
+
+# ==============================================================================
+# Webhooks
+# ==============================================================================
+def test_webhook_receives_the_final_status(make_runner, webhooks):
+    runner = make_runner()
+    job, _ = runner.submit("echo", {"value": 3}, callback_url="https://hooks.example.com/done")
+    run_queued(runner)
+    # Sent to the address that passed the check, not re-resolved (DNS rebinding), under the original host name
+    assert webhooks[0][:3] == ("https://93.184.216.34/done", "hooks.example.com", "hooks.example.com")
+    assert webhooks[0][3]["state"] == "succeeded"
+    assert runner.status(job["id"])["callback_status"] == "HTTP 204"
+
+
+def test_allow_listed_webhook_is_sent_by_name(monkeypatch, webhooks):
+    monkeypatch.setattr(jobs, "WEBHOOK_ALLOWED_HOSTS", {"hooks.internal"})
+    assert send_webhook("http://hooks.internal:8080/done", {"state": "succeeded"}) == "HTTP 204"
+    assert webhooks[0][:2] == ("http://hooks.internal:8080/done", "hooks.internal:8080")
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "192.168.1.1", "169.254.169.254", "::1", "fd00::1", "224.0.0.1"])
+def test_callbacks_to_non_public_addresses_are_rejected(monkeypatch, address):
+    monkeypatch.setattr(jobs, "resolve_host", lambda host, port: {"93.184.216.34", address})
+    with pytest.raises(CallbackURLError):
+        validate_callback_url("http://hooks.example.com/done")
+
+
+def test_callback_allow_list(monkeypatch):
+    monkeypatch.setattr(jobs, "WEBHOOK_ALLOWED_HOSTS", {"hooks.internal"})
+    validate_callback_url("http://hooks.internal:8080/done")
+    with pytest.raises(CallbackURLError):
+        validate_callback_url("https://hooks.example.com/done")
+
+
+def test_webhook_is_checked_again_at_delivery(monkeypatch, webhooks):
+    monkeypatch.setattr(jobs, "resolve_host", lambda host, port: {"10.1.2.3"})  # re-resolved to a private address
+    assert send_webhook("https://hooks.example.com/done", {}) == "blocked"
+    assert webhooks == []
+
+
+def test_submit_endpoint_rejects_internal_callback(client, monkeypatch):
+    monkeypatch.setattr(jobs, "resolve_host", REAL_RESOLVE_HOST)  # an IP literal resolves without DNS
+    response = client.post("/jobs/ghg_emissions", json={
+        "bounds": [[28.0, 77.0], [28.5, 77.5]], "date": "2024-01-01", "callback_url": "http://169.254.169.254/latest/meta-data",
+    })
+    assert response.status_code == 400 and "public address" in response.json()["detail"]
+
+
+# ==============================================================================
+# Recovery and retention
+# ==============================================================================
+def test_restart_only_fails_jobs_whose_worker_died(make_runner):
+    alive, dead = make_runner(lease_seconds=60), make_runner(lease_seconds=60)
+    running, _ = alive.submit("echo", {"value": "alive"})
+    alive.store.claim(running["id"], alive.owner, time.time() + 60)
+    orphan, _ = dead.submit("echo", {"value": "dead"})
+    dead.store.update(orphan["id"], lease_expires_at=time.time() - 1)  # its worker stopped renewing
+
+    restarted = make_runner()
+    restarted.start()
+    assert restarted.store.get(running["id"])["state"] == "running"
+    assert restarted.store.get(orphan["id"])["state"] == "failed"
+
+    alive.maintain()  # a live worker keeps its lease fresh
+    assert alive.store.get(running["id"])["lease_expires_at"] > time.time() + 30
+
+
+def test_database_without_lease_columns_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, dedup_key TEXT NOT NULL,"
+        " state TEXT NOT NULL, progress TEXT, result TEXT, error TEXT, callback_url TEXT, callback_status TEXT,"
+        " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    conn.execute("INSERT INTO jobs (id, kind, params, dedup_key, state, created_at) VALUES ('old', 'echo', '{}', 'k', 'running', 0)")
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    assert store.fail_stale() == 1
+    assert store.get("old")["state"] == "failed"
+
+
+def test_finished_jobs_and_artifacts_expire(make_runner):
+    runner = make_runner(retention_seconds=3600)
+    old, _ = runner.submit("echo", {"value": "old"})
+    recent, _ = runner.submit("echo", {"value": "recent"})
+    run_queued(runner)
+    old_artifact = runner.artifact_path(old["id"])
+    runner.store.update(old["id"], finished_at=time.time() - 7200)
+
+    runner.maintain()
+    assert runner.store.get(old["id"]) is None and not os.path.exists(old_artifact)
+    assert runner.status(recent["id"])["state"] == "succeeded" and runner.artifact_path(recent["id"])
@@ -0,0 +1,68 @@
+# Deforestation PDFs (backend/pdf_report.py and /generate_report): a report whose thumbnail failed to
+# download is still returned, but never cached under the report's content key.
+
+import io
+import json
+
+import pytest
+
+from backend.http_client import UpstreamError
+
+START_MAP = "https://earthengine.googleapis.com/v1/thumbnails/t/cache-start.png"
+END_MAP = "https://earthengine.googleapis.com/v1/thumbnails/t/cache-end.png"
+
+
+def _png():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "green").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+PNG = _png()
+
+
+def report_args(region):
+    return json.dumps({"Region": region, "Deforested Area (ha)": 1.5}), START_MAP, END_MAP, "2020-01-01", "2023-01-01"
+
+
+@pytest.fixture
+def pdf_report(offline):
+    from backend import pdf_report
+    return pdf_report
+
+
+@pytest.mark.parametrize("failing", [START_MAP, END_MAP])
+def test_endpoint_does_not_cache_a_report_missing_an_image(client, monkeypatch, pdf_report, failing):
+    from backend import main
+
+    async def get_bytes(url, **kwargs):
+        if url == failing:
+            raise UpstreamError("thumbnail timed out")
+        return PNG
+    monkeypatch.setattr(main.app.state.http, "get_bytes", get_bytes)
+
+    stats, start_map, end_map, start_date, end_date = args = report_args(f"endpoint {failing}")
+    form = {"stats": stats, "start_map": start_map, "end_map": end_map, "start_date": start_date, "end_date": end_date}
+    response = client.post("/generate_report", data=form)
+    assert response.status_code == 200 and response.content.startswith(b"%PDF")
+    assert pdf_report.report_cache.get(pdf_report.report_key(*args)) is None
+
+    monkeypatch.setattr(main.app.state.http, "get_bytes", lambda url, **kwargs: _async(PNG))
+    assert client.post("/generate_report", data=form).status_code == 200
+    assert pdf_report.report_cache.get(pdf_report.report_key(*args)) is not None
+
+
+async def _async(value):
+    return value
+
+
+def test_get_or_create_skips_the_cache_when_a_download_fails(monkeypatch, pdf_report):
+    monkeypatch.setattr(pdf_report, "download_image", lambda url, client=None: None if url == END_MAP else PNG)
+    args = report_args("job")
+    assert pdf_report.get_or_create_pdf_report(*args).startswith(b"%PDF")
+    assert pdf_report.report_cache.get(pdf_report.report_key(*args)) is None
+
+    monkeypatch.setattr(pdf_report, "download_image", lambda url, client=None: PNG)
+    pdf = pdf_report.get_or_create_pdf_report(*args)
+    assert pdf_report.report_cache.get(pdf_report.report_key(*args)) == pdf
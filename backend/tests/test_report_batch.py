@@ -0,0 +1,61 @@
+# Batch reports (backend/report_batch.py): regions whose thumbnails failed to download are rendered without
+# them, listed in the job result, and kept out of the report cache; several regions render in worker processes.
+
+import io
+import json
+import zipfile
+
+import pytest
+
+OK_START = "https://earthengine.googleapis.com/v1/thumbnails/t/batch-ok-start.png"
+OK_END = "https://earthengine.googleapis.com/v1/thumbnails/t/batch-ok-end.png"
+BROKEN_END = "https://earthengine.googleapis.com/v1/thumbnails/t/batch-broken-end.png"
+
+
+def _png():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "green").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def report_batch(offline, monkeypatch):
+    from backend import report_batch
+    png = _png()
+    monkeypatch.setattr(report_batch, "prefetch_images",
+                        lambda records: {OK_START: png, OK_END: png, BROKEN_END: None})
+    return report_batch
+
+
+def region(name, end_map):
+    return {"region": name, "stats": json.dumps({"Region": name, "Deforested Area (ha)": 2.0}), "start_map": OK_START,
+            "end_map": end_map, "start_date": "2020-01-01", "end_date": "2023-01-01"}
+
+
+def cache_key(report_batch, record):
+    title = f"Deforestation Analysis Report: {record['region']}"
+    return report_batch.report_key(record["stats"], record["start_map"], record["end_map"], record["start_date"], record["end_date"]) + ":" + title
+
+
+@pytest.mark.parametrize("output", ["zip", "pdf"])
+def test_regions_missing_images_are_listed_and_not_cached(report_batch, output):
+    regions = [region(f"Complete {output}", OK_END), region(f"Broken {output}", BROKEN_END)]
+    result = report_batch.generate_report_batch(regions, output=output)
+
+    assert result["regions"] == 2 and result["missing_images"] == 1
+    assert result["regions_missing_images"] == [f"Broken {output}"]
+    assert report_batch.report_cache.get(cache_key(report_batch, regions[0])) is not None
+    assert report_batch.report_cache.get(cache_key(report_batch, regions[1])) is None
+    if output == "zip":
+        assert len(zipfile.ZipFile(io.BytesIO(result["artifact_bytes"])).namelist()) == 2
+    else:
+        assert result["artifact_bytes"].startswith(b"%PDF")
+
+
+def test_regions_render_in_worker_processes(report_batch):
+    records = [region(f"Parallel {i}", OK_END) for i in range(3)]
+    images = report_batch.prefetch_images(records)
+    rendered = report_batch.render_regions(records, images, workers=2)  # from a pytest thread: must not fork
+    assert [pdf.startswith(b"%PDF") and pages >= 1 for pdf, pages in rendered] == [True] * 3
+    assert [report_batch.report_cache.get(cache_key(report_batch, record)) for record in records] == [pdf for pdf, _ in rendered]
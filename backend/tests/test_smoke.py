@@ -0,0 +1,124 @@
+# Every benchmark scenario (backend/benchmarks/suite.py) once through the offline app: catches endpoints that
+# stop answering, plus a few response-shape checks for the main features.
+
+import json
+
+import pytest
+
+from backend.benchmarks.suite import build_scenarios, synthetic_jpeg
+
+SCENARIOS = build_scenarios(synthetic_jpeg(640, 480))
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_scenario_answers(client, name):
+    import random
+    _, method, path, build = SCENARIOS[name]
+    rng = random.Random(name)
+    response = client.request(method, path(0, rng) if callable(path) else path, **build(0, rng))
+    assert response.status_code < 400, response.text[:300]
+
+
+def test_health_ready_lists_resources(client):
+    body = client.get("/health/ready").json()
+    assert "crop_disease_model" in json.dumps(body)
+
+
+def test_crop_disease_prediction_is_a_known_class(client, jpeg):
+    from backend.crop_disease.predictor import class_names
+    response = client.post("/predict_crop_disease", files={"file": ("leaf.jpg", jpeg, "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json()["predicted_disease"] in class_names
+
+
+def test_crop_disease_rejects_non_images(client):
+    response = client.post("/predict_crop_disease", files={"file": ("leaf.jpg", b"not an image", "image/jpeg")})
+    assert response.status_code == 400
+
+
+def test_generate_report_returns_a_pdf(client):
+    form = {"stats": json.dumps({"Deforested Area (ha)": 1.5}), "start_map": "https://earthengine.googleapis.com/v1/thumbnails/t/smoke-start.png",
+            "end_map": "https://earthengine.googleapis.com/v1/thumbnails/t/smoke-end.png", "start_date": "2020-01-01", "end_date": "2023-01-01"}
+    response = client.post("/generate_report", data=form)
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+
+
+def test_flood_drought_bulk_is_columnar(client):
+    body = client.post("/predict/flood_drought/bulk", json={"seed": 1}).json()
+    assert body["count"] > 800
+    assert {len(column) for column in body["columns"].values()} == {body["count"]}
+
+
+@pytest.mark.parametrize("output", ["arrow", "parquet"])
+def test_columnar_output_without_pyarrow_is_501(client, monkeypatch, output):
+    monkeypatch.setitem(__import__("sys").modules, "pyarrow", None)  # import fails even where pyarrow is installed
+    response = client.post("/predict/flood_drought/bulk", json={"seed": 1, "format": output})
+    assert response.status_code == 501
+
+
+def test_water_batch_field_names_are_case_insensitive_in_every_format(client):
+    rows = [{"DO": 6.5, "pH": 7.2, " Conductivity": 300, "BOD": 2.0}, {"DO": 4.0, "pH": 8.1, " Conductivity": 900, "BOD": 6.0}]
+    csv = "DO,pH, Conductivity,BOD\n" + "\n".join(",".join(str(v) for v in row.values()) for row in rows)
+    from_json = client.post("/predict/water_quality/batch", json=rows)
+    from_csv = client.post("/predict/water_quality/batch", content=csv.encode(), headers={"content-type": "text/csv"})
+    assert from_json.status_code == from_csv.status_code == 200
+    assert from_json.content == from_csv.content  # NDJSON: one line per row
+
+
+def test_parquet_upload_without_pyarrow_is_501(client, monkeypatch):
+    monkeypatch.setitem(__import__("sys").modules, "pyarrow", None)
+    monkeypatch.setitem(__import__("sys").modules, "pyarrow.parquet", None)
+    response = client.post("/predict/water_quality/batch", content=b"PAR1" + b"\0" * 16,
+                           headers={"content-type": "application/vnd.apache.parquet"})
+    assert response.status_code == 501
+
+
+def test_analyze_area_runs_off_the_event_loop(client, monkeypatch):
+    import asyncio
+    from backend import main
+    from backend.benchmarks.suite import polygon_geojson
+    on_loop = []
+
+    def spy(*args):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return real(*args)
+    real = main.analyze_area
+    monkeypatch.setattr(main, "analyze_area", spy)
+    response = client.post("/analyze_area", data={"geojson": polygon_geojson(4242), "start_date": "2020-01-01", "end_date": "2023-01-01"})
+    assert response.status_code == 200
+    assert on_loop == [False]
+
+
+def test_soil_type_comes_from_the_colour_heuristic_without_a_head(client, jpeg, monkeypatch):
+    from backend import main
+    from backend.crop_disease import predictor
+
+    async def no_model():
+        raise AssertionError("the colour heuristic must not load the crop disease model")
+    monkeypatch.setattr(main.crop_disease_model, "aget", no_model)
+    monkeypatch.setattr(predictor.crop_model, "aget", no_model)
+    response = client.post("/recommend_crop_from_photo", files={"file": ("soil.jpg", jpeg, "image/jpeg")},
+                           data={"month": "July", "location": "Nagpur"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["soil_model"] == "color" and body["soil_confidence"] is None
+
+
+def test_local_earth_engine_without_credentials_fails_fast(monkeypatch):
+    from types import SimpleNamespace
+    from backend import gee_utils
+    prompted = []
+
+    def initialize(**kwargs):
+        raise gee_utils.google_auth_exceptions.DefaultCredentialsError("no default credentials")
+    monkeypatch.delenv(gee_utils.CREDENTIALS_ENV_VAR, raising=False)
+    monkeypatch.setattr(gee_utils, "ee", SimpleNamespace(EEException=Exception, Initialize=initialize,
+                                                         Authenticate=lambda **kwargs: prompted.append(kwargs)))
+    with pytest.raises(RuntimeError, match="earthengine authenticate"):
+        gee_utils.initialize_earth_engine()
+    assert prompted == []  # never the interactive flow on a request thread
@@ -0,0 +1,186 @@
+# backend/water_quality.py
+#
+# Batch water-quality prediction helpers: parse JSON / CSV / Parquet uploads into float columns,
+# validate them column by column, and predict in chunks through plain NumPy arrays
+# (no per-row pandas DataFrame).
+
+import csv
+import io
+import json
+import math
+import os
+import warnings
+
+import numpy as np
+
+# Every field the API accepts, with its valid range. The model only uses model.feature_names_in_;
+# anything else (currently `coliform`) is accepted but reported back as unused instead of being dropped silently.
+FIELD_RANGES = {
+    "do": (0.0, None),
+    "ph": (0.0, 14.0),
+    "conductivity": (0.0, None),
+    "bod": (0.0, None),
+    "coliform": (0.0, None),
+}
+CHUNK_SIZE = int(os.getenv("WATER_BATCH_CHUNK_SIZE", "5000"))
+MAX_ROWS = int(os.getenv("WATER_BATCH_MAX_ROWS", "200000"))
+MAX_ERRORS_PER_COLUMN = 10
+
+
+class BatchValidationError(ValueError):
+    """Raised with a list of per-column problems when an upload fails validation."""
+
+    def __init__(self, errors):
+        super().__init__("Input failed validation.")
+        self.errors = errors
+
+
+class FormatUnavailableError(RuntimeError):
+    """A supported upload format whose optional dependency is not installed on this server (HTTP 501)."""
+
+
+def model_features(model):
+    """Feature order the model was trained with."""
+    return [str(name) for name in getattr(model, "feature_names_in_", ["do", "ph", "conductivity", "bod"])]
+
+
+def unused_fields(model):
+    features = set(model_features(model))
+    return [name for name in FIELD_RANGES if name not in features]
+
+
+# ==============================================================================
+# Parsing: everything becomes {column_name: list_of_raw_values}
+# ==============================================================================
+def column_name(name):
+    """Field names match case-insensitively in every format ("pH" in a JSON body is the same column as "ph")."""
+    return str(name).strip().lower()
+
+
+def columns_from_records(records):
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise BatchValidationError([{"column": None, "reason": "Body must be a JSON array of objects."}])
+    records = [{column_name(key): value for key, value in record.items()} for record in records]
+    names = {key for record in records for key in record}
+    return {name: [record.get(name) for record in records] for name in names}
+
+
+def columns_from_csv(data: bytes):
+    reader = csv.reader(io.StringIO(data.decode("utf-8-sig")))
+    try:
+        header = [column_name(name) for name in next(reader)]
+    except StopIteration:
+        raise BatchValidationError([{"column": None, "reason": "CSV file is empty."}])
+    rows = [row for row in reader if row]
+    columns = {name: [] for name in header}
+    for row in rows:
+        for name, value in zip(header, row):
+            columns[name].append(value.strip())
+        for name in header[len(row):]:
+            columns[name].append(None)
+    return columns
+
+
+def columns_from_parquet(data: bytes):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise FormatUnavailableError("Parquet uploads need the pyarrow package on the server.")
+    table = pq.read_table(io.BytesIO(data))
+    return {column_name(name): table.column(name).to_pylist() for name in table.column_names}
+
+
+def parse_upload(filename: str, data: bytes):
+    name = (filename or "").lower()
+    if name.endswith(".parquet") or data[:4] == b"PAR1":
+        return columns_from_parquet(data)
+    if name.endswith(".json"):
+        return columns_from_records(json.loads(data))
+    return columns_from_csv(data)
+
+
+# ==============================================================================
+# Validation: column by column, collecting every problem instead of stopping at the first
+# ==============================================================================
+def _to_float(value):
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def validate_columns(columns, model):
+    """
+    Converts the raw columns needed by the model into a (n_rows, n_features) float64 array.
+    Raises BatchValidationError listing missing columns, non-numeric cells and out-of-range values.
+    """
+    features = model_features(model)
+    errors = [{"column": name, "reason": "Missing required column."} for name in features if name not in columns]
+    if errors:
+        raise BatchValidationError(errors)
+
+    n_rows = len(columns[features[0]])
+    if n_rows == 0:
+        raise BatchValidationError([{"column": None, "reason": "No rows to predict."}])
+    if n_rows > MAX_ROWS:
+        raise BatchValidationError([{"column": None, "reason": f"Too many rows: {n_rows} (max {MAX_ROWS})."}])
+
+    matrix = np.empty((n_rows, len(features)), dtype=np.float64)
+    for j, name in enumerate(features):
+        values = np.fromiter((_to_float(v) for v in columns[name]), dtype=np.float64, count=n_rows)
+        bad = np.flatnonzero(~np.isfinite(values))
+        if bad.size:
+            errors.append({"column": name, "reason": "Missing or non-numeric values.",
+                           "rows": bad[:MAX_ERRORS_PER_COLUMN].tolist(), "count": int(bad.size)})
+            continue
+        low, high = FIELD_RANGES.get(name, (None, None))
+        out_of_range = np.zeros(n_rows, dtype=bool)
+        if low is not None:
+            out_of_range |= values < low
+        if high is not None:
+            out_of_range |= values > high
+        bad = np.flatnonzero(out_of_range)
+        if bad.size:
+            errors.append({"column": name, "reason": f"Values outside the valid range [{low}, {high if high is not None else 'inf'}].",
+                           "rows": bad[:MAX_ERRORS_PER_COLUMN].tolist(), "count": int(bad.size)})
+            continue
+        matrix[:, j] = values
+    if errors:
+        raise BatchValidationError(errors)
+    return matrix
+
+
+# ==============================================================================
+# Prediction
+# ==============================================================================
+def predict_proba_array(model, matrix):
+    """predict_proba on a bare ndarray, without sklearn's 'X does not have valid feature names' warning."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return model.predict_proba(matrix)
+
+
+def predict_one(model, features: dict):
+    """Single-row prediction through the same NumPy path as the batch endpoint."""
+    row = np.array([[float(features[name]) for name in model_features(model)]], dtype=np.float64)
+    probabilities = predict_proba_array(model, row)[0]
+    best = int(probabilities.argmax())
+    return str(model.classes_[best]), {str(c): round(float(p), 4) for c, p in zip(model.classes_, probabilities)}
+
+
+def iter_ndjson_predictions(model, matrix, chunk_size=CHUNK_SIZE):
+    """Yields one NDJSON line per row, predicting `chunk_size` rows at a time."""
+    classes = [str(c) for c in model.classes_]
+    for start in range(0, len(matrix), chunk_size):
+        probabilities = predict_proba_array(model, matrix[start:start + chunk_size])
+        labels = probabilities.argmax(axis=1)
+        lines = []
+        for offset, (label, row) in enumerate(zip(labels, np.round(probabilities, 4).tolist())):
+            lines.append(json.dumps({
+                "row": start + offset,
+                "predicted_quality": classes[label],
+                "probabilities": dict(zip(classes, row)),
+            }))
+        yield "\n".join(lines) + "\n"